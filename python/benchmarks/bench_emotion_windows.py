@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+bench_emotion_windows.py
+
+Measures the cost of windowed emotion scoring (emotion_windows.py) against the default stage, which
+classifies only the first 512 characters of every thread, on synthetic threads of mixed length.
+
+Reports tokens covered, wall time and milliseconds per 1k tokens for both modes, and the padding
+overhead of length-sorted packing compared with batching windows in thread order.
+
+Usage:
+    python3 bench_emotion_windows.py --threads 200 --backend int8
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from emotion_windows import (  # noqa: E402
+    WindowedEmotionScorer, make_windows, pack_batches, DEFAULT_WINDOW_TOKENS, DEFAULT_BATCH_TOKENS
+)
+from inference_backend import load_pipeline, BACKENDS, BACKEND_TORCH  # noqa: E402
+
+EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+EMOTION_MAX_CHARS = 512
+
+SENTENCES = [
+    "I can't believe they shipped this update without testing it.",
+    "Honestly the support team was great and fixed it in a day.",
+    "This is the third recall this year, I'm scared to drive it.",
+    "Nobody at corporate cares about the people on the floor.",
+    "Prices went up again and the quality keeps dropping.",
+    "Wow, did not expect the new model to be this good.",
+    "My whole team got laid off by email this morning.",
+    "It's fine, nothing special, does what it says.",
+]
+
+
+def make_threads(n, rng):
+    # Mostly short threads with a long tail of very long ones, like real search results
+    return [" ".join(rng.choice(SENTENCES) for _ in range(int(rng.paretovariate(1.2) * 4)))
+            for _ in range(n)]
+
+
+def padded_tokens(lengths, batches):
+    return sum(max(lengths[i] for i in batch) * len(batch) for batch in batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark windowed emotion scoring.")
+    parser.add_argument('--threads', type=int, default=200)
+    parser.add_argument('--backend', choices=BACKENDS, default=BACKEND_TORCH)
+    parser.add_argument('--window_tokens', type=int, default=DEFAULT_WINDOW_TOKENS)
+    parser.add_argument('--batch_tokens', type=int, default=DEFAULT_BATCH_TOKENS)
+    parser.add_argument('--batch_size', type=int, default=16, help="Texts per batch in truncate mode")
+    args = parser.parse_args()
+
+    threads = make_threads(args.threads, random.Random(42))
+    classifier = load_pipeline("text-classification", EMOTION_MODEL, backend=args.backend, top_k=None)
+    tokenizer = classifier.tokenizer
+    scorer = WindowedEmotionScorer(tokenizer, classifier.model, window_tokens=args.window_tokens,
+                                   max_windows=None, max_batch_tokens=args.batch_tokens)
+    scorer.score(threads[:8])  # Warm-up
+
+    truncated = [thread[:EMOTION_MAX_CHARS] for thread in threads]
+    truncated_tokens = sum(len(ids) for ids in tokenizer(truncated)["input_ids"])
+    start = time.perf_counter()
+    classifier(truncated, batch_size=args.batch_size)
+    truncate_time = time.perf_counter() - start
+
+    total_tokens = sum(len(ids) for ids in tokenizer(threads, add_special_tokens=False)["input_ids"])
+    _, stats = scorer.score(threads)
+
+    print(f"{args.threads} threads, {total_tokens} tokens in total, backend {args.backend}")
+    print(f"{'mode':<10} {'tokens':>9} {'coverage':>9} {'secs':>7} {'ms/1k tok':>10}")
+    for mode, tokens, seconds in (("truncate", truncated_tokens, truncate_time),
+                                  ("windowed", stats.tokens, stats.seconds)):
+        print(f"{mode:<10} {tokens:>9} {min(tokens / total_tokens, 1):>8.1%} {seconds:>7.2f} "
+              f"{seconds / tokens * 1e6:>10.1f}")
+    print(f"windowed: {stats.summary()}")
+
+    # Padding of the same windows batched in thread order versus length-sorted packing
+    lengths = [len(window) + 2 for ids in tokenizer(threads, add_special_tokens=False)["input_ids"]
+               for window in make_windows(ids, scorer.content_tokens, scorer.overlap)]
+    sorted_batches = pack_batches(lengths, args.batch_tokens)
+    per_batch = max(1, sum(map(len, sorted_batches)) // len(sorted_batches))
+    in_order = [list(range(i, min(i + per_batch, len(lengths)))) for i in range(0, len(lengths), per_batch)]
+    print(f"padding overhead: in thread order {padded_tokens(lengths, in_order) / sum(lengths) - 1:.1%}, "
+          f"length-sorted {padded_tokens(lengths, sorted_batches) / sum(lengths) - 1:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+bench_fetch_concurrency.py
+
+Measures the collector's comment fetch stage at different worker counts using stubbed PRAW objects
+whose requests sleep for a fixed latency, and checks that results keep submission order.
+
+Usage:
+    python3 bench_fetch_concurrency.py --submissions 20 --latency 0.1 --levels 1 2 4 8
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reddit_fetch import FetchBudget, fetch_threads  # noqa: E402
+
+
+class StubComment:
+    def __init__(self, body, score, replies=()):
+        self.body = body
+        self.score = score
+        self.replies = list(replies)
+
+
+class MoreComments:
+    """Stub of praw's MoreComments; the class name is what reddit_fetch checks."""
+
+    def __init__(self, latency, bodies):
+        self.latency = latency
+        self.bodies = bodies
+        self.count = len(bodies)
+
+    def comments(self):
+        time.sleep(self.latency)
+        return [StubComment(body, 1) for body in self.bodies]
+
+
+class StubSubmission:
+    def __init__(self, idx, latency, more_links):
+        self.title = f"Submission {idx}"
+        self.selftext = "body"
+        self.latency = latency
+        self._more_links = more_links
+        self.idx = idx
+
+    @property
+    def comments(self):
+        time.sleep(self.latency)  # Initial submission/comment fetch
+        top = [StubComment(f"{self.idx}-top-{i}", 10 - i) for i in range(5)]
+        more = [MoreComments(self.latency, [f"{self.idx}-more-{j}-{k}" for k in range(3)])
+                for j in range(self._more_links)]
+        return top + more
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent comment fetching.")
+    parser.add_argument('--submissions', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.1, help="Seconds per simulated API request")
+    parser.add_argument('--more_links', type=int, default=3, help="'Load more' links per submission")
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    budget = FetchBudget()
+    baseline = None
+    print(f"{'workers':>7} {'wall (s)':>9} {'speedup':>8} {'mean thread (s)':>16}")
+    for level in args.levels:
+        submissions = [StubSubmission(i, args.latency, args.more_links) for i in range(args.submissions)]
+        start = time.perf_counter()
+        results = fetch_threads(submissions, budget, workers=level)
+        elapsed = time.perf_counter() - start
+        assert all(result.text.startswith(f"Submission {i} ") for i, result in enumerate(results))
+        baseline = baseline or elapsed
+        mean_latency = sum(result.latency for result in results) / len(results)
+        print(f"{level:>7} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x {mean_latency:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
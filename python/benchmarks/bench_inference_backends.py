@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+bench_inference_backends.py
+
+Parity check and CPU throughput benchmark of the inference backends in inference_backend.py, for the
+collector's emotion model and zero-shot topic classifier.
+
+Each backend classifies the same texts. The benchmark reports its throughput and how often its top
+label agrees with plain PyTorch, plus the largest difference in any label's score. The script exits
+with status 1 if a backend's agreement falls below --min_agreement, so it can gate a backend change.
+
+Usage:
+    python3 bench_inference_backends.py --backends torch int8 onnx --texts 256
+    python3 bench_inference_backends.py --texts_file threads.txt --models emotion
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from inference_backend import load_pipeline, BACKENDS, BACKEND_TORCH  # noqa: E402
+
+# Same models and labels as collect-reddit-data.py
+EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+TOPIC_CATEGORIES = [
+    "Environment", "Customer Satisfaction", "Legislation", "Competition",
+    "Workplace Conditions", "Product Quality", "Supply Chain", "Technology",
+    "Financial Performance", "Corporate Governance"
+]
+
+SUBJECTS = ["The new update", "Customer service", "The CEO", "Our union", "The recall", "Shipping",
+            "The battery", "Management", "The price increase", "The factory"]
+PREDICATES = ["is honestly the worst thing that happened this year", "made me so happy today",
+              "is terrifying if you think about it", "surprised everyone at work",
+              "was a total disgrace and nobody is accountable", "is fine I guess",
+              "keeps getting delayed and I'm furious", "finally fixed the problems we had",
+              "is polluting the river near my house", "laid off half of my team without warning"]
+
+
+def make_texts(n, rng):
+    return [f"{rng.choice(SUBJECTS)} {rng.choice(PREDICATES)}. {rng.choice(SUBJECTS)} {rng.choice(PREDICATES)}."
+            for _ in range(n)]
+
+
+def run_emotion(classifier, texts, batch_size):
+    outputs = classifier(texts, batch_size=batch_size)
+    return [{item["label"]: item["score"] for item in scores} for scores in outputs]
+
+
+def run_zero_shot(classifier, texts, batch_size):
+    outputs = classifier(texts, candidate_labels=TOPIC_CATEGORIES, batch_size=batch_size)
+    return [dict(zip(output["labels"], output["scores"])) for output in outputs]
+
+
+MODELS = {
+    "emotion": ("text-classification", EMOTION_MODEL, {"top_k": None}, run_emotion),
+    "zero_shot": ("zero-shot-classification", ZERO_SHOT_MODEL, {}, run_zero_shot),
+}
+
+
+def compare(reference, scores):
+    """Returns (fraction of texts with the same top label, largest absolute score difference)."""
+    same = sum(max(ref, key=ref.get) == max(got, key=got.get) for ref, got in zip(reference, scores))
+    max_diff = max(abs(ref[label] - got.get(label, 0.0)) for ref, got in zip(reference, scores) for label in ref)
+    return same / len(reference), max_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends for parity and throughput.")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS)
+    parser.add_argument('--models', nargs='+', choices=list(MODELS), default=list(MODELS))
+    parser.add_argument('--texts', type=int, default=128, help="Number of synthetic texts")
+    parser.add_argument('--texts_file', type=str, help="File with one text per line, used instead of synthetic texts")
+    parser.add_argument('--batch_size', type=int, default=16)
+    parser.add_argument('--min_agreement', type=float, default=0.95,
+                        help="Minimum top-label agreement with torch for a backend to pass")
+    args = parser.parse_args()
+
+    if args.texts_file:
+        texts = [line.strip() for line in open(args.texts_file, encoding="utf-8") if line.strip()]
+    else:
+        texts = make_texts(args.texts, random.Random(42))
+
+    backends = [BACKEND_TORCH] + [b for b in args.backends if b != BACKEND_TORCH]
+    failed = False
+    for model_key in args.models:
+        task, model_name, kwargs, run = MODELS[model_key]
+        print(f"\n{model_key}: {model_name}, {len(texts)} texts, batch size {args.batch_size}")
+        print(f"{'backend':<8} {'load (s)':>9} {'run (s)':>8} {'texts/s':>8} {'agree':>7} {'max diff':>9}  result")
+        reference = None
+        for backend in backends:
+            start = time.perf_counter()
+            classifier = load_pipeline(task, model_name, backend=backend, **kwargs)
+            load_time = time.perf_counter() - start
+            run(classifier, texts[:args.batch_size], args.batch_size)  # Warm-up
+            start = time.perf_counter()
+            scores = run(classifier, texts, args.batch_size)
+            run_time = time.perf_counter() - start
+            if reference is None:
+                reference = scores
+            agreement, max_diff = compare(reference, scores)
+            passed = agreement >= args.min_agreement
+            failed = failed or not passed
+            print(f"{backend:<8} {load_time:>9.1f} {run_time:>8.2f} {len(texts) / run_time:>8.1f} "
+                  f"{agreement:>6.1%} {max_diff:>9.4f}  {'ok' if passed else 'FAIL'}")
+            del classifier
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
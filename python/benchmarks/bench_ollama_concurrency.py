@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+bench_ollama_concurrency.py
+
+Measures wall-clock time of the collector's topic extraction stage at different Ollama concurrency
+levels, against the fake Ollama server so the numbers reflect the client pipeline rather than GPU speed.
+
+Usage:
+    python3 bench_ollama_concurrency.py --threads 32 --latency 0.5 --levels 1 2 4 8
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ollama_pool import OllamaWorkerPool  # noqa: E402
+from fake_ollama_server import start_fake_server  # noqa: E402
+
+
+def run(url, concurrency, prompts):
+    pool = OllamaWorkerPool("deepseek-r1:8b", host=url, concurrency=concurrency, timeout=30, max_retries=0)
+    start = time.perf_counter()
+    results = pool.map(lambda idx_prompt: (idx_prompt[0], pool.generate(idx_prompt[1])), list(enumerate(prompts)))
+    elapsed = time.perf_counter() - start
+    # Results must come back in submission order
+    assert [idx for idx, _ in results] == list(range(len(prompts)))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Ollama extraction concurrency.")
+    parser.add_argument('--threads', type=int, default=32, help="Number of threads (prompts) to extract")
+    parser.add_argument('--latency', type=float, default=0.5, help="Fake server seconds per request")
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    server, url = start_fake_server(latency=args.latency)
+    prompts = [f"Text: thread number {i}" for i in range(args.threads)]
+    try:
+        baseline = None
+        print(f"{'concurrency':>11} {'wall (s)':>9} {'speedup':>8}")
+        for level in args.levels:
+            elapsed = run(url, level, prompts)
+            baseline = baseline or elapsed
+            print(f"{level:>11} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
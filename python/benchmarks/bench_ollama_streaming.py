@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+bench_ollama_streaming.py
+
+Compares full-response and streamed topic extraction against the fake Ollama server, which streams one
+token at a time after a long think block and keeps writing an explanation after the topic line.
+
+For each mode the benchmark reports wall time, time to the topic list, tokens generated and how each
+request stopped, and checks that every mode returns the same topics.
+
+Usage:
+    python3 bench_ollama_streaming.py --requests 16 --think_tokens 600 --token_latency 0.005
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ollama_pool import OllamaWorkerPool, THINK_CLOSE  # noqa: E402
+from fake_ollama_server import start_fake_server, DEFAULT_RESPONSE  # noqa: E402
+
+TRAILER = "\nExplanation: these topics summarise the discussion in the thread above. " * 10
+
+
+def topics_of(answer):
+    return [t.strip() for t in answer.split(THINK_CLOSE)[-1].strip().split("\n")[0].split(",") if t.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streamed Ollama topic extraction.")
+    parser.add_argument('--requests', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--think_tokens', type=int, default=600, help="Extra think tokens per fake response")
+    parser.add_argument('--token_latency', type=float, default=0.005, help="Fake server seconds per token")
+    parser.add_argument('--max_think_tokens', type=int, default=256, help="Think budget of the budgeted mode")
+    args = parser.parse_args()
+
+    server, url = start_fake_server(latency=0.05, token_latency=args.token_latency,
+                                    think_tokens=args.think_tokens, trailer=TRAILER)
+    prompts = [f"Text: thread number {i}" for i in range(args.requests)]
+    expected = topics_of(DEFAULT_RESPONSE)
+    modes = {
+        # Waits for the whole streamed response, like a plain generate call
+        "full": dict(max_think_tokens=None, deadline=None, stop_after_answer_line=False),
+        "streamed": dict(max_think_tokens=None, deadline=None),
+        "budgeted": dict(max_think_tokens=args.max_think_tokens, deadline=None),
+    }
+    try:
+        print(f"{'mode':<9} {'wall (s)':>9} {'first topic (s)':>16} {'tokens/req':>11}  stops")
+        for mode, options in modes.items():
+            pool = OllamaWorkerPool("deepseek-r1:8b", host=url, concurrency=args.concurrency, timeout=60,
+                                    max_retries=0)
+            start = time.perf_counter()
+            results = pool.map(lambda prompt: pool.generate_streaming(prompt, **options), prompts)
+            elapsed = time.perf_counter() - start
+            assert all(topics_of(result["response"]) == expected for result in results), mode
+            first = sum(result["first_token"] for result in results) / len(results)
+            tokens = sum(result["tokens"] for result in results) / len(results)
+            stops = ", ".join(f"{name} {count}" for name, count in sorted(pool.cutoffs.items()))
+            print(f"{mode:<9} {elapsed:>9.2f} {first:>16.2f} {tokens:>11.0f}  {stops}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
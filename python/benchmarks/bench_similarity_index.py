@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+bench_similarity_index.py
+
+Recall and latency of the approximate IVF index in similarity_index.py against exact search, at
+condense_metric_log.py's similarity threshold.
+
+Each query is a topic being condensed. Exact search either matches it to a CondensedTopic (best
+similarity >= threshold) or creates a new one. For each nprobe, the benchmark reports:
+  - recall: how often IVF finds the same best match among the queries exact search matches;
+  - decision agreement: how often IVF makes the same match-or-create decision for the same ID;
+  - the mean and p99 latency of one query.
+
+By default the vectors are synthetic: clustered unit vectors, with a share of queries far from
+every cluster. --store reads the real CondensedTopic embeddings of an embedding store instead, and
+uses perturbed copies of them as queries.
+
+Usage:
+    python3 bench_similarity_index.py --vectors 50000 --queries 2000 --nprobe 1 4 8 16
+    python3 bench_similarity_index.py --store ../condensed_embeddings --model all-MiniLM-L6-v2
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from similarity_index import ExactIndex, IVFIndex, l2_normalize, DEFAULT_NPROBE  # noqa: E402
+from embedding_store import EmbeddingStore  # noqa: E402
+
+# Same as condense_metric_log.py
+SIMILARITY_THRESHOLD = 0.5
+
+
+def synthetic_vectors(n, dim, clusters, rng):
+    centers = l2_normalize(rng.standard_normal((clusters, dim)))
+    members = centers[rng.integers(clusters, size=n)]
+    return l2_normalize(members + rng.standard_normal((n, dim)) * 0.06)
+
+
+def make_queries(base, n, noise, unmatched, rng):
+    """Perturbed copies of base vectors, plus a share of random (mostly unmatched) vectors."""
+    near = base[rng.integers(len(base), size=n)] + rng.standard_normal((n, base.shape[1])) * noise
+    far = rng.random(n) < unmatched
+    near[far] = rng.standard_normal((int(far.sum()), base.shape[1]))
+    return l2_normalize(near)
+
+
+def timed_search(index, queries):
+    results = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(index.search(query))
+        latencies.append(time.perf_counter() - start)
+    return results, np.array(latencies) * 1000
+
+
+def decision(result, threshold):
+    best_id, score = result
+    return best_id if score >= threshold else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark approximate vs exact similarity search.")
+    parser.add_argument('--vectors', type=int, default=50000, help="Synthetic CondensedTopics")
+    parser.add_argument('--dim', type=int, default=384, help="Synthetic embedding dimension (MiniLM: 384)")
+    parser.add_argument('--clusters', type=int, default=2000, help="Synthetic topic clusters")
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--noise', type=float, default=0.04, help="Per-dimension noise added to queries")
+    parser.add_argument('--unmatched', type=float, default=0.2, help="Share of random queries")
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, DEFAULT_NPROBE, 16, 32])
+    parser.add_argument('--threshold', type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument('--store', type=str, help="Embedding store directory to read real embeddings from")
+    parser.add_argument('--model', type=str, default="all-MiniLM-L6-v2", help="Model name of the store")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    if args.store:
+        store = EmbeddingStore(args.store, args.model)
+        ids, base = list(store.ids), np.asarray(store.embeddings)
+        if not ids:
+            sys.exit(f"No embeddings for {args.model} in {args.store}.")
+    else:
+        base = synthetic_vectors(args.vectors, args.dim, args.clusters, rng)
+        ids = list(range(len(base)))
+    queries = make_queries(l2_normalize(base), args.queries, args.noise, args.unmatched, rng)
+
+    exact = ExactIndex()
+    start = time.perf_counter()
+    exact.add(ids, base)
+    exact_build = time.perf_counter() - start
+    expected, exact_ms = timed_search(exact, queries)
+    expected_decisions = [decision(result, args.threshold) for result in expected]
+    matched = [pos for pos, best_id in enumerate(expected_decisions) if best_id is not None]
+
+    ivf = IVFIndex(min_train_size=1)
+    start = time.perf_counter()
+    ivf.add(ids, base)
+    ivf_build = time.perf_counter() - start
+
+    print(f"{len(ids)} vectors of dimension {base.shape[1]}, {len(queries)} queries, threshold "
+          f"{args.threshold}: exact search matches {len(matched)} of them")
+    print(f"{'index':<14} {'build (s)':>9} {'mean ms':>8} {'p99 ms':>7} {'recall':>7} {'decisions':>10}")
+    print(f"{'exact':<14} {exact_build:>9.2f} {exact_ms.mean():>8.3f} {np.percentile(exact_ms, 99):>7.3f} "
+          f"{1:>7.1%} {1:>10.1%}")
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        results, ms = timed_search(ivf, queries)
+        recall = (sum(results[pos][0] == expected[pos][0] for pos in matched) / len(matched)) if matched else 1.0
+        agreement = np.mean([decision(result, args.threshold) == want
+                             for result, want in zip(results, expected_decisions)])
+        label = f"ivf nprobe={nprobe}"
+        print(f"{label:<14} {ivf_build:>9.2f} {ms.mean():>8.3f} {np.percentile(ms, 99):>7.3f} "
+              f"{recall:>7.1%} {agreement:>10.1%}")
+    print(f"ivf: {len(ivf.centroids)} clusters")
+
+
+if __name__ == "__main__":
+    main()
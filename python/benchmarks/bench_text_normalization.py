@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+bench_text_normalization.py
+
+Compares text_normalization.py with the original per-entry implementations of clean_text,
+rephrase_text_mapping and filter_spam on a synthetic comment corpus, and checks the outputs match.
+
+Usage:
+    python3 bench_text_normalization.py --comments 20000
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import text_normalization as tn  # noqa: E402
+
+
+# Original implementations, kept here as the reference for output and speed
+def legacy_clean_text(text):
+    text = re.sub(r'http\S+', '', text)
+    text = re.sub(r'[^A-Za-z\s]', '', text)
+    text = re.sub(r'\d+', '', text)
+    text = text.lower()
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def legacy_rephrase_text_mapping(text, mapping=tn.REPHRASE_MAPPING):
+    for abbr, full in mapping.items():
+        pattern = r'\b' + re.escape(abbr) + r'\b'
+        text = re.sub(pattern, full, text)
+    return text
+
+
+def legacy_filter_spam(text):
+    text_lower = text.lower()
+    spam_indicators = ["free", "trial", "buy", "offer", "discount",
+                       "promo", "sale", "best", "cheap", "guarantee"]
+    for kw in spam_indicators:
+        if kw in text_lower:
+            return True
+    return False
+
+
+WORDS = ["the", "company", "Workers", "union", "strike", "pay", "management", "profit", "quality",
+         "service", "I'm", "don't", "100%", "$5", "2024", "été", "—", "\t", "\n", "!!",
+         "https://example.com/a?b=1", "www.site.org", "FREE", "Sale", "bestie"]
+
+
+def make_corpus(n, rng):
+    slang = list(tn.REPHRASE_MAPPING)
+    corpus = []
+    for _ in range(n):
+        tokens = [rng.choice(WORDS + slang) for _ in range(rng.randint(5, 120))]
+        corpus.append(" ".join(tokens))
+    return corpus
+
+
+def bench(fn, corpus):
+    start = time.perf_counter()
+    out = [fn(text) for text in corpus]
+    return time.perf_counter() - start, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text normalisation.")
+    parser.add_argument('--comments', type=int, default=20000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.comments, random.Random(7))
+    print(f"{args.comments} comments, {sum(map(len, corpus)) / 1e6:.1f}M chars")
+    print(f"{'function':<22} {'legacy (s)':>10} {'new (s)':>8} {'speedup':>8} {'same':>5}")
+    pairs = [
+        ("clean_text", legacy_clean_text, tn.clean_text),
+        ("rephrase_text_mapping", legacy_rephrase_text_mapping, tn.rephrase_text_mapping),
+        ("filter_spam", legacy_filter_spam, tn.filter_spam),
+    ]
+    for name, legacy, new in pairs:
+        legacy_time, legacy_out = bench(legacy, corpus)
+        new_time, new_out = bench(new, corpus)
+        same = "yes" if legacy_out == new_out else "NO"
+        print(f"{name:<22} {legacy_time:>10.2f} {new_time:>8.2f} {legacy_time / new_time:>7.1f}x {same:>5}")
+
+
+if __name__ == "__main__":
+    main()
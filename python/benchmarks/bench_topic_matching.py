@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+bench_topic_matching.py
+
+Compares the original per-topic partial_ratio loop with TopicMatchIndex on synthetic Topic tables,
+checking that both return identical matches.
+
+Usage:
+    python3 bench_topic_matching.py --sizes 10000 100000 1000000 --queries 20
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+from rapidfuzz.fuzz import partial_ratio
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from topic_matcher import TopicMatchIndex  # noqa: E402
+
+WORDS = [
+    "job", "security", "corporate", "culture", "supply", "chain", "pricing", "customer", "service",
+    "layoffs", "strike", "union", "quality", "recall", "emissions", "regulation", "merger", "profit",
+    "warranty", "delivery", "refund", "battery", "software", "update", "privacy", "data", "breach",
+    "management", "salary", "remote", "work", "shipping", "delay", "outage", "pollution", "tariffs",
+]
+
+# Naive loop is skipped above this size because it takes minutes per run
+NAIVE_MAX_SIZE = 100000
+
+
+def make_topics(n, rng):
+    return [" ".join(rng.sample(WORDS, rng.randint(2, 4))).title() + f" {i}" for i in range(n)]
+
+
+def naive_match(topics, existing_topics):
+    matched = []
+    for topic in topics:
+        for existing_topic in existing_topics:
+            if partial_ratio(topic.lower(), existing_topic.lower()) > 80:
+                matched.append(existing_topic)
+                break
+        else:
+            matched.append(topic)
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark topic matching against the Topic table.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=20, help="Extracted topics matched per size")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'topics':>9} {'build (s)':>10} {'index (s)':>10} {'naive (s)':>10} {'same':>5}")
+    for size in args.sizes:
+        existing = make_topics(size, rng)
+        # Mix of novel topics (worst case: every existing topic is scored) and near-duplicates
+        novel = ["".join(rng.choice("qxzjvwk") for _ in range(12)) for _ in range(args.queries // 2)]
+        queries = novel + [rng.choice(existing)[:-1] for _ in range(args.queries - len(novel))]
+
+        start = time.perf_counter()
+        index = TopicMatchIndex(existing)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = index.match_many(queries)
+        indexed_time = time.perf_counter() - start
+
+        if size <= NAIVE_MAX_SIZE:
+            start = time.perf_counter()
+            naive = naive_match(queries, existing)
+            naive_str = f"{time.perf_counter() - start:>10.2f}"
+            same = "yes" if naive == indexed else "NO"
+        else:
+            naive_str, same = f"{'skipped':>10}", "-"
+        print(f"{size:>9} {build:>10.2f} {indexed_time:>10.2f} {naive_str} {same:>5}")
+
+
+if __name__ == "__main__":
+    main()
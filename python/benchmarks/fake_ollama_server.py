@@ -0,0 +1,143 @@
+"""
+fake_ollama_server.py
+
+Minimal stand-in for the Ollama HTTP API, used to benchmark and exercise the collector's Ollama
+client code without a GPU or a real model. It answers POST /api/generate after a fixed delay with a
+DeepSeek-style response (a <think> block followed by a comma-separated topic list).
+
+Streaming requests ("stream": true) get the response as newline-delimited JSON chunks, one token per
+chunk with a fixed per-token delay. The think block can be padded with extra tokens and text can follow
+the topic line, so early cut-offs by the client are visible in time and token counts. Requests with
+"think": false get the topic line without a think block.
+
+Usage (standalone):
+    python3 fake_ollama_server.py --port 11535 --latency 0.5
+    python3 fake_ollama_server.py --token_latency 0.01 --think_tokens 500 --trailer "Explanation: ..."
+    OLLAMA_HOST=http://127.0.0.1:11535 python3 ../collect-reddit-data.py ...
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = "<think>The text is about work.</think>Job Security, Corporate Culture, Cost-Cutting"
+
+# Filler repeated to pad the think block of streamed responses
+THINK_FILLER = " Let me reconsider the main themes of the text."
+
+
+def stream_tokens(text):
+    """Splits text into word-sized tokens (words with their leading whitespace, tags and newlines)."""
+    return re.findall(r"</?think>|\n|\s*[^\s<]+|\s+", text)
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+
+        time.sleep(self.server.latency)
+        if body.get("stream"):
+            self._stream(body)
+            return
+        payload = {
+            "model": body.get("model", ""),
+            "created_at": "1970-01-01T00:00:00Z",
+            "response": self.server.response_text,
+            "done": True,
+            # Rough token counts, so callers that log them have something to report
+            "prompt_eval_count": len(body.get("prompt", "")) // 4,
+            "eval_count": len(self.server.response_text) // 4,
+        }
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, body):
+        think, _, answer = self.server.response_text.rpartition("</think>")
+        think = think.replace("<think>", "")
+        if body.get("think") is False:
+            tokens = stream_tokens(answer.strip() + "\n")
+        else:
+            filler = stream_tokens(THINK_FILLER) * (self.server.think_tokens // len(stream_tokens(THINK_FILLER)) + 1)
+            tokens = (["<think>"] + stream_tokens(think) + filler[:self.server.think_tokens] + ["</think>"]
+                      + stream_tokens(answer.strip() + "\n" + self.server.trailer))
+        num_predict = (body.get("options") or {}).get("num_predict")
+        if num_predict:
+            tokens = tokens[:num_predict]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for token in tokens:
+                time.sleep(self.server.token_latency)
+                chunk = {"model": body.get("model", ""), "created_at": "1970-01-01T00:00:00Z",
+                         "response": token, "done": False}
+                self.wfile.write(json.dumps(chunk).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            self.server.completed_streams += 1
+            done = {"model": body.get("model", ""), "created_at": "1970-01-01T00:00:00Z", "response": "",
+                    "done": True, "prompt_eval_count": len(body.get("prompt", "")) // 4,
+                    "eval_count": len(tokens)}
+            self.wfile.write(json.dumps(done).encode("utf-8") + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.abandoned_streams += 1  # The client stopped reading early
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+
+def start_fake_server(port=0, latency=0.5, response_text=DEFAULT_RESPONSE, token_latency=0.0,
+                      think_tokens=0, trailer=""):
+    """
+    Starts the fake server on a background thread.
+
+    Args:
+        latency (float): Seconds before a response (or its first streamed token) is sent.
+        token_latency (float): Seconds between streamed tokens.
+        think_tokens (int): Extra filler tokens in the think block of streamed responses.
+        trailer (str): Text streamed after the topic line.
+
+    Returns:
+        tuple: (server, base URL). Call server.shutdown() when done.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.response_text = response_text
+    server.token_latency = token_latency
+    server.think_tokens = think_tokens
+    server.trailer = trailer
+    server.completed_streams = 0
+    server.abandoned_streams = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server.")
+    parser.add_argument('--port', type=int, default=11535)
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds per generate request")
+    parser.add_argument('--token_latency', type=float, default=0.0, help="Seconds per streamed token")
+    parser.add_argument('--think_tokens', type=int, default=0, help="Extra think tokens in streamed responses")
+    parser.add_argument('--trailer', type=str, default="", help="Text streamed after the topic line")
+    args = parser.parse_args()
+    server, url = start_fake_server(args.port, args.latency, token_latency=args.token_latency,
+                                    think_tokens=args.think_tokens, trailer=args.trailer)
+    print(f"Fake Ollama server listening on {url} (latency {args.latency}s). Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
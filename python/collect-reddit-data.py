@@ -1,37 +1,56 @@
 import os
-import praw
-import datetime
+import sys
 import time
+
+# Recorded before any other import so cold-start time covers library imports too
+PROCESS_START_TIME = time.time()
+
+import datetime
 import re
 import string
 import hashlib
 import json
-from rapidfuzz.fuzz import partial_ratio
-from rapidfuzz.fuzz import token_sort_ratio
-import torch
+import signal
+import socket
+import tempfile
+import threading
 import ollama  # For interacting with DeepSeek-R1:8B
-
-import nltk
-nltk.download('punkt', quiet=True)
-from nltk.tokenize import sent_tokenize
-
-import spacy
-from transformers import (
-    AutoTokenizer, 
-    AutoModelForSequenceClassification, 
-    pipeline, 
-    T5ForConditionalGeneration, 
-    T5Tokenizer
+from ollama_pool import (
+    OllamaWorkerPool, DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, DEFAULT_MAX_RETRIES, DEFAULT_MAX_THINK_TOKENS,
+    DEFAULT_STREAM_DEADLINE, CUTOFF_DEADLINE
+)
+from llm_cache import TopicExtractionCache, DEFAULT_TTL_DAYS
+from topic_matcher import TopicMatchIndex
+from text_normalization import filter_spam
+from dimension_resolver import DimensionResolver
+from emotion_windows import (
+    WindowedEmotionScorer, DEFAULT_WINDOW_TOKENS, DEFAULT_WINDOW_OVERLAP, DEFAULT_MAX_WINDOWS, DEFAULT_BATCH_TOKENS
+)
+from prompt_chunking import split_into_chunks, merge_topics, estimate_tokens, DEFAULT_CHUNK_TOKENS
+from inference_backend import load_pipeline, BACKENDS, BACKEND_TORCH
+from mention_detection import OrganisationMentionDetector
+from seen_index import SeenSubmissionIndex, entity_key
+from stage_spool import (
+    StageSpool, make_run_id, STAGE_SEARCH, STAGE_THREAD, STAGE_EMOTION, STAGE_TOPICS, STAGE_CATEGORIES
+)
+from job_queue import JobQueue, DEFAULT_QUEUE_PATH, HEARTBEAT_INTERVAL
+from rate_limiter import TokenBucketRateLimiter, make_rate_limited_requestor
+from reddit_fetch import (
+    FetchBudget, iter_thread_text, fetch_threads, DEFAULT_MAX_COMMENTS, DEFAULT_MAX_BYTES,
+    DEFAULT_MAX_REQUESTS, DEFAULT_FETCH_WORKERS, RANK_BY_SCORE, RANK_BY_DEPTH,
+    WindowScan, iter_date_window, DEFAULT_MAX_SCANNED
 )
 
 import mysql.connector
 
-from rake_nltk import Rake
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 from dotenv import load_dotenv  # NEW: Import dotenv to load .env variables
 from pathlib import Path            # NEW: Import Path for path manipulations
 
+# NOTE: torch, transformers, spaCy, NLTK, RAKE and PRAW are imported inside the loaders
+# registered below, so a run that finds no submissions never pays for them.
+
 # ---------------------------------------------------
 # 0) Setup
 # ---------------------------------------------------
@@ -67,31 +86,173 @@ missing_vars = [var for var in required_vars if os.getenv(var) is None]
 if missing_vars:
     raise EnvironmentError(f"Missing environment variables: {', '.join(missing_vars)}")
 
-# Load spaCy model
-nlp = spacy.load("en_core_web_sm")
+class LazyRegistry:
+    """
+    Registry of expensive resources (NLP models, API clients, DB connections).
 
-# Initialise RAKE with NLTK's default stopwords
-rake_extractor = Rake()
+    Each resource is built by its loader the first time it is requested and memoised
+    for the rest of the process, so code paths that never need a model never load it.
+    """
 
-# Load emotion analysis model
+    def __init__(self):
+        self._loaders = {}
+        self._instances = {}
+        self._load_times = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, loader):
+        """Registers a zero-argument loader under the given name."""
+        self._loaders[name] = loader
+
+    def get(self, name):
+        """Returns the named resource, loading it on first use."""
+        if name in self._instances:
+            return self._instances[name]
+        with self._lock:
+            if name not in self._instances:
+                start = time.perf_counter()
+                self._instances[name] = self._loaders[name]()
+                self._load_times[name] = time.perf_counter() - start
+                print(f"[{datetime.datetime.now()}] Loaded '{name}' in {self._load_times[name]:.2f}s.")
+        return self._instances[name]
+
+    def lazy(self, name):
+        """Returns a callable that forwards to the named resource, loading it only when first called."""
+        return lambda *args, **kwargs: self.get(name)(*args, **kwargs)
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+    def load_times(self):
+        """Returns a dict of resource name -> seconds spent loading it."""
+        return dict(self._load_times)
+
+# Emotion analysis model
 MODEL_NAME = "j-hartmann/emotion-english-distilroberta-base"
-emotion_tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-emotion_model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
-emotion_pipeline = pipeline(
-    "text-classification",
-    model=emotion_model,
-    tokenizer=emotion_tokenizer,
-    top_k=None  # Get all classification scores
-)
 
-# Initialise T5 tokeniser and model for paraphrasing (if needed)
+# T5 model for paraphrasing (if needed)
 paraphrase_model_name = "t5-small"  # Change to "t5-base" or "t5-large" if needed
-paraphrase_tokenizer = T5Tokenizer.from_pretrained(paraphrase_model_name)
-paraphrase_model = T5ForConditionalGeneration.from_pretrained(paraphrase_model_name)
-paraphrase_model.eval()  # Set to evaluation mode
+
+# Zero-shot classification model used to categorise topics
+ZERO_SHOT_MODEL_NAME = "facebook/bart-large-mnli"
+
+# Inference backend of the emotion and zero-shot models: torch, int8 or onnx (see inference_backend.py)
+INFERENCE_BACKEND = os.getenv("COLLECTOR_INFERENCE_BACKEND", BACKEND_TORCH)
+
+def _load_spacy():
+    import spacy
+    return spacy.load("en_core_web_sm")
+
+def _load_sent_tokenize():
+    import nltk
+    nltk.download('punkt', quiet=True)
+    from nltk.tokenize import sent_tokenize
+    return sent_tokenize
+
+def _load_rake():
+    # Initialise RAKE with NLTK's default stopwords
+    import nltk
+    nltk.download('stopwords', quiet=True)
+    nltk.download('punkt', quiet=True)
+    from rake_nltk import Rake
+    return Rake()
+
+def _load_emotion_pipeline():
+    return load_pipeline(
+        "text-classification",
+        MODEL_NAME,
+        backend=INFERENCE_BACKEND,
+        top_k=None  # Get all classification scores
+    )
+
+def _load_paraphraser():
+    from transformers import T5ForConditionalGeneration, T5Tokenizer
+    paraphrase_tokenizer = T5Tokenizer.from_pretrained(paraphrase_model_name)
+    paraphrase_model = T5ForConditionalGeneration.from_pretrained(paraphrase_model_name)
+    paraphrase_model.eval()  # Set to evaluation mode
+    return paraphrase_tokenizer, paraphrase_model
+
+def _load_zero_shot_classifier():
+    return load_pipeline(
+        "zero-shot-classification",
+        ZERO_SHOT_MODEL_NAME,
+        backend=INFERENCE_BACKEND
+    )
+
+def _connect_reddit():
+    import praw
+    return praw.Reddit(
+        client_id=REDDIT_CLIENT_ID,         # UPDATED: Use environment variable
+        client_secret=REDDIT_CLIENT_SECRET, # UPDATED: Use environment variable
+        user_agent=REDDIT_USER_AGENT,       # UPDATED: Use environment variable
+        check_for_async=False,
+        requestor_class=make_rate_limited_requestor(registry.get("rate_limiter"))
+    )
+
+def _connect_db():
+    db_connection = mysql.connector.connect(
+        host=DB_HOST,           # UPDATED: Use environment variable
+        user=DB_USER,           # UPDATED: Use environment variable
+        password=DB_PASSWORD,   # UPDATED: Use environment variable
+        database=DB_NAME        # UPDATED: Use environment variable
+    )
+    return db_connection, db_connection.cursor()
+
+registry = LazyRegistry()
+registry.register("nlp", _load_spacy)
+registry.register("sent_tokenize", _load_sent_tokenize)
+registry.register("rake", _load_rake)
+registry.register("emotion_pipeline", _load_emotion_pipeline)
+registry.register("paraphraser", _load_paraphraser)
+registry.register("zero_shot_classifier", _load_zero_shot_classifier)
+registry.register("reddit", _connect_reddit)
+registry.register("db", _connect_db)
+registry.register("dimensions", lambda: DimensionResolver(*get_db()).preload())
+
+def get_db():
+    """Returns the (connection, cursor) pair, connecting on first use."""
+    return registry.get("db")
+
+def get_peak_rss_mb():
+    """Returns the peak resident set size of this process in MB, or None if unavailable."""
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def report_run_stats():
+    """Prints wall-clock time since process start, peak RSS and the resources that were loaded."""
+    elapsed = time.time() - PROCESS_START_TIME
+    peak_rss = get_peak_rss_mb()
+    peak_str = f"{peak_rss:.1f} MB" if peak_rss is not None else "n/a"
+    loaded = registry.load_times()
+    loaded_str = ", ".join(f"{name} ({secs:.2f}s)" for name, secs in loaded.items()) or "none"
+    print(f"[{datetime.datetime.now()}] Run stats: wall time {elapsed:.2f}s, peak RSS {peak_str}, "
+          f"loaded resources: {loaded_str}.")
 
 # Initialise Ollama for DeepSeek-R1:8B
 OLLAMA_MODEL = "deepseek-r1:8b"
+OLLAMA_HOST = os.getenv("OLLAMA_HOST")  # None falls back to the ollama library default
+
+# SQLite file holding cached DeepSeek extractions (see llm_cache.py)
+LLM_CACHE_PATH = script_path.parent / 'llm_topic_cache.sqlite3'
+
+# Resources a worker loads before taking its first job
+WORKER_WARM_RESOURCES = ["db", "dimensions", "reddit", "emotion_pipeline", "zero_shot_classifier", "nlp"]
+
+# Seconds a worker waits between queue polls while the queue is empty
+WORKER_POLL_INTERVAL = 2.0
+
+# SQLite file recording which submissions were already processed per entity (see seen_index.py)
+SEEN_INDEX_PATH = script_path.parent / 'seen_submissions.sqlite3'
+
+# SQLite file holding each run's checkpointed stage results (see stage_spool.py)
+SPOOL_PATH = script_path.parent / 'collector_spool.sqlite3'
 
 # Predefined categories for topics
 TOPIC_CATEGORIES = [
@@ -100,122 +261,128 @@ TOPIC_CATEGORIES = [
     "Financial Performance", "Corporate Governance"
 ]
 
-# Initialise Few-Shot Classification pipeline
-zero_shot_classifier = pipeline(
-    "zero-shot-classification", 
-    model="facebook/bart-large-mnli"
-)
+# Confidence threshold below which a topic is categorised as 'Miscellaneous'
+CATEGORY_THRESHOLD = 0.3
 
-# Initialise a cache dictionary
-topic_name_cache = {}
+# Upper bound on the number of topics kept in the persistent category cache
+TOPIC_CACHE_MAX_ENTRIES = 50000
 
-def load_topic_name_cache(filepath='topic_name_cache.json'):
-    global topic_name_cache
-    try:
-        with open(filepath, 'r') as f:
-            topic_name_cache = json.load(f)
-    except FileNotFoundError:
-        topic_name_cache = {}
+class TopicCategoryCache:
+    """
+    Persistent, size-bounded cache of topic -> category assignments.
 
-def save_topic_name_cache(filepath='topic_name_cache.json'):
-    with open(filepath, 'w') as f:
-        json.dump(topic_name_cache, f)
+    Keys are normalised (lowercased, whitespace collapsed, surrounding punctuation removed),
+    entries are evicted least-recently-used first once max_entries is exceeded, and the file
+    is written atomically. The file also records the classifier, labels and threshold that
+    produced the entries; if any of them change, the stale entries are discarded on load.
+    """
+
+    def __init__(self, filepath, signature, max_entries=TOPIC_CACHE_MAX_ENTRIES):
+        self.filepath = Path(filepath)
+        self.signature = signature
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalise(topic):
+        return " ".join(topic.lower().split()).strip(string.punctuation + " ")
+
+    def load(self):
+        try:
+            with open(self.filepath, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        except json.JSONDecodeError as e:
+            print(f"Ignoring unreadable topic cache '{self.filepath}': {e}")
+            data = {}
+
+        if data.get("signature") == self.signature:
+            self.entries = OrderedDict(data.get("entries", {}))
+        else:
+            self.entries = OrderedDict()
+            self._dirty = bool(data)
+        self._evict()
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {"signature": self.signature, "entries": self.entries}
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.filepath.parent, prefix=f".{self.filepath.name}.", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(payload, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.filepath)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._dirty = False
+
+    def get(self, topic):
+        key = self.normalise(topic)
+        with self._lock:
+            category = self.entries.get(key)
+            if category is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return category
+
+    def put(self, topic, category):
+        key = self.normalise(topic)
+        if not key:
+            return
+        with self._lock:
+            self.entries[key] = category
+            self.entries.move_to_end(key)
+            self._dirty = True
+            self._evict()
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self._dirty = True
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = (self.hits / lookups * 100) if lookups else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate), {len(self.entries)} entries"
+
+topic_category_cache = TopicCategoryCache(
+    script_path.parent / 'topic_name_cache.json',
+    signature={
+        "model": ZERO_SHOT_MODEL_NAME,
+        "labels": TOPIC_CATEGORIES,
+        "threshold": CATEGORY_THRESHOLD,
+    }
+)
 
 # ---------------------------------------------------
 # 1) Reddit Setup
 # ---------------------------------------------------
-reddit = praw.Reddit(
-    client_id=REDDIT_CLIENT_ID,         # UPDATED: Use environment variable
-    client_secret=REDDIT_CLIENT_SECRET, # UPDATED: Use environment variable
-    user_agent=REDDIT_USER_AGENT,       # UPDATED: Use environment variable
-    check_for_async=False
-)
-
-request_count = 0
-last_checked_time = time.time()
+# Every request PRAW makes waits on this token bucket (see rate_limiter.py). Setting
+# REDDIT_RATE_LIMIT_STATE (or --rate_limit_state) to a file shares the bucket between processes.
+RATE_LIMIT_STATE_PATH = os.getenv("REDDIT_RATE_LIMIT_STATE")
 
-def rate_limiter():
-    global request_count, last_checked_time
-    current_time = time.time()
-    if current_time - last_checked_time > 60:
-        request_count = 0
-        last_checked_time = current_time
+def _load_rate_limiter():
+    return TokenBucketRateLimiter(state_path=RATE_LIMIT_STATE_PATH)
 
-    if request_count >= 100:
-        sleep_time = 60 - (current_time - last_checked_time)
-        print(f"Rate limit approached, sleeping for {sleep_time:.2f} seconds.")
-        time.sleep(sleep_time + 1)
-        last_checked_time = time.time()
-        request_count = 0
+registry.register("rate_limiter", _load_rate_limiter)
 
 # ---------------------------------------------------
 # 2) DB Setup
 # ---------------------------------------------------
-db_connection = mysql.connector.connect(
-    host=DB_HOST,           # UPDATED: Use environment variable
-    user=DB_USER,           # UPDATED: Use environment variable
-    password=DB_PASSWORD,   # UPDATED: Use environment variable
-    database=DB_NAME        # UPDATED: Use environment variable
-)
-db_cursor = db_connection.cursor()
-
-# Define a dictionary for rephrasing internet abbreviations and slang
-REPHRASE_MAPPING = {
-    "u": "you",
-    "ur": "your",
-    "r": "are",
-    "lol": "laughing out loud",
-    "idk": "I do not know",
-    "imho": "in my humble opinion",
-    "btw": "by the way",
-    "tbh": "to be honest",
-    "omg": "oh my god",
-    "thx": "thanks",
-    "pls": "please",
-    "plz": "please",
-    "gr8": "great",
-    "b4": "before",
-    "lmao": "laughing my ass off",
-    "rofl": "rolling on the floor laughing",
-    "brb": "be right back",
-    "afk": "away from keyboard",
-    "smh": "shaking my head",
-    "nvm": "never mind",
-    "ttyl": "talk to you later",
-    "fyi": "for your information",
-    "jk": "just kidding",
-    "wtf": "what the fuck",
-    "bff": "best friends forever",
-    "ftw": "for the win",
-    "tmi": "too much information",
-    "sry": "sorry",
-    "omw": "on my way",
-    "bae": "before anyone else",
-    "goat": "greatest of all time",
-    "lit": "exciting",
-    "salty": "bitter",
-    "savage": "fierce",
-    "sksksk": "laughter or excitement",
-    "stan": "an extremely devoted fan",
-    # Add more mappings as needed
-}
-
-def clean_text(text):
-    """
-    Cleans the input text by removing URLs, punctuation, numbers, special characters, and extra whitespace.
-    Converts text to lowercase.
-    """
-    # Remove URLs
-    text = re.sub(r'http\S+', '', text)
-    # Remove special characters and punctuation
-    text = re.sub(r'[^A-Za-z\s]', '', text)
-    # Remove numbers
-    text = re.sub(r'\d+', '', text)
-    # Convert to lowercase
-    text = text.lower()
-    # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+# The MySQL connection is opened lazily through get_db() (see the registry above).
 
 def paraphrase_text(text, max_length=100):
     """
@@ -228,6 +395,9 @@ def paraphrase_text(text, max_length=100):
     Returns:
         str: The paraphrased text.
     """
+    import torch
+    paraphrase_tokenizer, paraphrase_model = registry.get("paraphraser")
+
     # Prepare the text for T5
     preprocessed_text = "paraphrase: " + text + " </s>"
     encoding = paraphrase_tokenizer.encode_plus(
@@ -258,97 +428,21 @@ def paraphrase_text(text, max_length=100):
     
     return paraphrased_text
 
-def rephrase_text_mapping(text, mapping=REPHRASE_MAPPING):
-    """
-    Rephrases the input text by expanding internet abbreviations and slang based on a predefined mapping.
-    
-    Args:
-        text (str): The input text to rephrase.
-        mapping (dict): A dictionary mapping abbreviations/slang to their standard forms.
-        
-    Returns:
-        str: The rephrased text.
-    """
-    # Iterate over the mapping and replace whole words only
-    for abbr, full in mapping.items():
-        pattern = r'\b' + re.escape(abbr) + r'\b'
-        text = re.sub(pattern, full, text)
-    
-    return text
-
-def filter_spam(text):
-    text_lower = text.lower()
-    spam_indicators = ["free", "trial", "buy", "offer", "discount",
-                       "promo", "sale", "best", "cheap", "guarantee"]
-    for kw in spam_indicators:
-        if kw in text_lower:
-            return True
-    return False
+def get_dimensions():
+    """Returns the run's DimensionResolver, preloading the dimension tables on first use."""
+    return registry.get("dimensions")
 
 def get_or_create_tracked_entity(entity_type, entity_name):
-    MAX_NAME_LEN = 50
-    if len(entity_name) > MAX_NAME_LEN:
-        entity_name = entity_name[:MAX_NAME_LEN]
-
-    sel_q = """
-        SELECT setID FROM TrackedEntity
-        WHERE entityType = %s AND name = %s
-        LIMIT 1
-    """
-    db_cursor.execute(sel_q, (entity_type, entity_name))
-    row = db_cursor.fetchone()
-    if row:
-        return row[0]
-
-    ins_q = """INSERT INTO TrackedEntity (entityType, name) VALUES (%s, %s)"""
-    db_cursor.execute(ins_q, (entity_type, entity_name))
-    db_connection.commit()
-    return db_cursor.lastrowid
+    return get_dimensions().resolve_tracked_entity(entity_type, entity_name)
 
 def get_or_create_topic(topic_word, category="Extracted"):
-    topic_word = topic_word.strip()
-    if not topic_word:
-        return None
-    if len(topic_word) > 50:
-        print(f"Skipping topic '{topic_word}' (exceeds 50 chars).")
-        return None
-
-    sel_q = "SELECT topicID FROM Topic WHERE topic = %s LIMIT 1"
-    db_cursor.execute(sel_q, (topic_word,))
-    row = db_cursor.fetchone()
-    if row:
-        # Update category if it's different
-        topic_id = row[0]
-        upd_q = "UPDATE Topic SET category = %s WHERE topicID = %s"
-        db_cursor.execute(upd_q, (category, topic_id))
-        db_connection.commit()
-        return topic_id
-
-    ins_q = "INSERT INTO Topic (topic, category) VALUES (%s, %s)"
-    db_cursor.execute(ins_q, (topic_word, category))
-    db_connection.commit()
-    return db_cursor.lastrowid
+    return get_dimensions().resolve_topics([(topic_word, category)])[topic_word]
 
 def get_or_create_adjective(adjective_word, sentiment_label="emotion"):
-    adjective_word = adjective_word.strip()
-    if not adjective_word:
-        return None
-    if len(adjective_word) > 50:
-        print(f"Skipping adjective '{adjective_word}' (exceeds 50 characters).")
-        return None
-
-    sel_q = "SELECT adjectiveID FROM Adjective WHERE adjective = %s LIMIT 1"
-    db_cursor.execute(sel_q, (adjective_word,))
-    row = db_cursor.fetchone()
-    if row:
-        return row[0]
-
-    ins_q = "INSERT INTO Adjective (adjective, sentiment) VALUES (%s, %s)"
-    db_cursor.execute(ins_q, (adjective_word, sentiment_label))
-    db_connection.commit()
-    return db_cursor.lastrowid
+    return get_dimensions().resolve_adjectives([adjective_word], sentiment_label)[adjective_word]
 
 def insert_metric_log(setID, topicID, adjectiveID, impressions, date_str, severity, explanation):
+    db_connection, db_cursor = get_db()
     try:
         if topicID is None or adjectiveID is None:
             return
@@ -363,69 +457,155 @@ def insert_metric_log(setID, topicID, adjectiveID, impressions, date_str, severi
         print(f"Error: {err}")
         db_connection.rollback()
 
-def gather_full_thread_text(submission):
-    submission.comments.replace_more(limit=None)
-    all_comments = submission.comments.list()
-    comment_bodies = [c.body for c in all_comments]
-    full_text = (submission.title or "") + " " + (submission.selftext or "") + " " + " ".join(comment_bodies)
-    return full_text
+def gather_full_thread_text(submission, budget=None):
+    """
+    Returns the title, body and comments of a thread as one string.
+
+    The comment tree is read best-first within the given FetchBudget (see reddit_fetch.py),
+    so viral threads cost a bounded number of requests and bytes.
+    """
+    return " ".join(iter_thread_text(submission, budget))
+
+# Number of leading characters of a thread that the emotion model sees
+EMOTION_MAX_CHARS = 512
+
+# Default number of texts per emotion pipeline forward pass
+EMOTION_BATCH_SIZE = 16
+
+# Emotion modes: classify the first EMOTION_MAX_CHARS characters, or the whole thread in token windows
+EMOTION_MODE_TRUNCATE = "truncate"
+EMOTION_MODE_WINDOWED = "windowed"
+
+# Cache of content hash -> top emotion label, shared by every emotion call in the process
+emotion_cache = {}
+
+def _content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def get_top_emotions(texts, batch_size=EMOTION_BATCH_SIZE):
+    """
+    Classifies the top emotion of many texts using batched emotion pipeline calls.
+
+    Each text is truncated to EMOTION_MAX_CHARS before classification. Results are cached
+    by a hash of the truncated text, so duplicate texts (within a run or across runs in
+    the same process) are only classified once.
+
+    Args:
+        texts (list): The texts to classify.
+        batch_size (int): Number of texts per pipeline forward pass.
+
+    Returns:
+        list: The top emotion label for each text (None for empty texts), in input order.
+    """
+    labels = [None] * len(texts)
+    pending = {}  # content hash -> (truncated text, indices waiting on it)
+    for idx, text in enumerate(texts):
+        text = text.strip()
+        if not text:
+            continue
+        truncated = text[:EMOTION_MAX_CHARS]
+        key = _content_hash(truncated)
+        if key in emotion_cache:
+            labels[idx] = emotion_cache[key]
+            continue
+        pending.setdefault(key, (truncated, []))[1].append(idx)
+
+    if pending:
+        keys = list(pending)
+        outputs = registry.get("emotion_pipeline")(
+            [pending[key][0] for key in keys],
+            batch_size=batch_size
+        )
+        for key, all_scores in zip(keys, outputs):
+            best = max(all_scores, key=lambda x: x["score"])
+            emotion_cache[key] = best["label"]
+            for idx in pending[key][1]:
+                labels[idx] = best["label"]
+
+    return labels
+
+def get_top_emotions_windowed(texts, window_tokens=DEFAULT_WINDOW_TOKENS, overlap=DEFAULT_WINDOW_OVERLAP,
+                              max_windows=DEFAULT_MAX_WINDOWS, max_batch_tokens=DEFAULT_BATCH_TOKENS):
+    """
+    Classifies the top emotion of many full texts through sliding token windows (see emotion_windows.py).
+
+    Unlike get_top_emotions(), every window of a thread (up to max_windows) is scored, and the thread's
+    label is the top label of the length-weighted mean of its window scores. Results are cached by a
+    hash of the full text and the window settings.
+
+    Returns:
+        list: The top emotion label for each text (None for empty texts), in input order.
+    """
+    labels = [None] * len(texts)
+    settings = f"windowed:{window_tokens}:{overlap}:{max_windows}:"
+    pending = {}  # content hash -> (text, indices waiting on it)
+    for idx, text in enumerate(texts):
+        text = text.strip()
+        if not text:
+            continue
+        key = _content_hash(settings + text)
+        if key in emotion_cache:
+            labels[idx] = emotion_cache[key]
+            continue
+        pending.setdefault(key, (text, []))[1].append(idx)
+
+    if pending:
+        emotion_pipeline = registry.get("emotion_pipeline")
+        scorer = WindowedEmotionScorer(
+            emotion_pipeline.tokenizer, emotion_pipeline.model, window_tokens=window_tokens,
+            overlap=overlap, max_windows=max_windows, max_batch_tokens=max_batch_tokens
+        )
+        keys = list(pending)
+        scores, stats = scorer.score([pending[key][0] for key in keys])
+        print(f"[{datetime.datetime.now()}] Windowed emotion scoring: {stats.summary()}.")
+        for key, thread_scores in zip(keys, scores):
+            if thread_scores is None:
+                continue
+            best = max(thread_scores, key=thread_scores.get)
+            emotion_cache[key] = best
+            for idx in pending[key][1]:
+                labels[idx] = best
+
+    return labels
 
 def get_top_emotion(text):
-    text = text.strip()
-    if not text:
-        return None
-    outputs = emotion_pipeline(text[:512])
-    all_scores = outputs[0]
-    best = max(all_scores, key=lambda x: x["score"])
-    return best["label"]
+    return get_top_emotions([text])[0]
+
+def get_mention_detector(organization_name):
+    """Returns an OrganisationMentionDetector whose spaCy model and tokenizer load only when needed."""
+    return OrganisationMentionDetector(
+        organization_name,
+        get_nlp=lambda: registry.get("nlp"),
+        get_sent_tokenize=lambda: registry.get("sent_tokenize")
+    )
 
 def is_organization_mentioned(text, organization_name):
     """
     Checks if the organisation name is mentioned in a meaningful way in the cleaned text.
     
     This function employs:
-      1. A regex pattern that requires all tokens in the organisation name to appear (in any order).
+      1. A regex pattern that requires all tokens in the organisation name to appear as whole words.
       2. spaCy NER with fuzzy matching to compare recognised ORG/GPE entities against the organisation name.
       3. A fallback sentence-level fuzzy match ensuring context (at least one noun and one verb).
     
-    Assumes that the text is already cleaned (lowercase, punctuation removed, etc.).
+    To check many posts, use get_mention_detector(...).detect_many(), which batches the spaCy work.
     """
-    org_lower = organization_name.lower()
-    text_lower = text.lower()
-    
-    # 1. Regex-based whole-word matching for all tokens in any order
-    org_tokens = org_lower.split()
-    pattern = r'\b' + r'\b.*\b'.join(re.escape(token) for token in org_tokens) + r'\b'
-    if re.search(pattern, text_lower):
-        return True
+    return get_mention_detector(organization_name).is_mentioned(text)
 
-    # 2. Use spaCy's NER to detect entities and compare them with fuzzy matching.
-    doc = nlp(text)  # Assumes nlp (spaCy model) is already loaded.
-    for ent in doc.ents:
-        if ent.label_ in ["ORG", "GPE"]:
-            # Use token_sort_ratio for fuzzy comparison.
-            if token_sort_ratio(org_lower, ent.text.lower()) > 80:
-                return True
-
-    # 3. Fallback: Sentence-level fuzzy matching with contextual check.
-    for sentence in sent_tokenize(text):
-        if token_sort_ratio(org_lower, sentence.lower()) > 80:
-            doc_sentence = nlp(sentence)
-            has_verb = any(token.pos_ == "VERB" for token in doc_sentence)
-            has_noun = any(token.pos_ == "NOUN" for token in doc_sentence)
-            if has_verb and has_noun:
-                return True
-
-    return False
-
-def search_posts(entity_type, entity_name, date_str=None, limit=100):
+def search_posts(entity_type, entity_name, date_str=None, limit=100, max_scanned=DEFAULT_MAX_SCANNED, scan=None):
     """
     If entity_type == 'subreddit', search that sub. For 'Industry', search for "<entity_name> industry".
     Otherwise (e.g., Organisation), search 'all' with the entity_name.
-    We do a specified window by date_str. You can remove the date check to get older posts.
-    """
-    global request_count
+    We do a specified window by date_str.
+
+    Results are read newest first, page by page, and paging stops at the first post older than the
+    window, so a past date does not spend requests on posts that can never be kept.
 
+    Args:
+        limit (int): Maximum number of posts inside the window to consider.
+        max_scanned (int): Maximum number of search results fetched while looking for them.
+        scan (WindowScan): Optional counters of fetched, in-window and kept results.
+    """
     now = datetime.datetime.now(datetime.timezone.utc)
     if date_str:
         try:
@@ -437,58 +617,70 @@ def search_posts(entity_type, entity_name, date_str=None, limit=100):
     else:
         end_dt = now
         start_dt = now - datetime.timedelta(days=1)
+    scan = scan if scan is not None else WindowScan()
 
     # Build the appropriate search query based on entity_type
+    reddit = registry.get("reddit")
     if entity_type.lower() == 'subreddit':
         sub_obj = reddit.subreddit(entity_name.replace("r/", ""))
-        posts_source = sub_obj.search("*", sort='new', limit=limit)
+        listing = sub_obj.search("*", sort='new', limit=max_scanned)
     elif entity_type.lower() == 'industry':
         # Append ' industry' to narrow the query
         query = f"{entity_name} industry"
-        posts_source = reddit.subreddit('all').search(query, sort='new', limit=limit)
+        listing = reddit.subreddit('all').search(query, sort='new', limit=max_scanned)
     else:
-        posts_source = reddit.subreddit('all').search(entity_name, sort='new', limit=limit)
+        listing = reddit.subreddit('all').search(entity_name, sort='new', limit=max_scanned)
+    posts_source = iter_date_window(listing, start_dt.timestamp(), end_dt.timestamp(), max_results=limit, scan=scan)
 
-    results = []
+    candidates = []  # (submission, title + body)
     for submission in posts_source:
-        request_count += 1
-        rate_limiter()
-
-        post_time = datetime.datetime.fromtimestamp(submission.created_utc, datetime.timezone.utc)
-        # If you want older posts, remove or adjust the next check
-        if not (start_dt <= post_time < end_dt):
-            continue
-
         # Quick spam check
         text_content = (submission.title or "") + " " + (submission.selftext or "")
         if filter_spam(text_content):
             continue
 
-        # For non-subreddit entity types (excluding organisations) perform the organisation check.
-        if entity_type.lower() not in ['subreddit', 'organisation']:
-            if not is_organization_mentioned(text_content, entity_name):
-                print(f"Skipping post: '{submission.title}' (no meaningful mention of {entity_name})")
-                continue
+        candidates.append((submission, text_content))
+
+    # For non-subreddit entity types (excluding organisations) perform the organisation check,
+    # batched over every candidate post.
+    if entity_type.lower() not in ['subreddit', 'organisation'] and candidates:
+        mentioned = get_mention_detector(entity_name).detect_many([text for _, text in candidates])
+    else:
+        mentioned = [True] * len(candidates)
 
+    results = []
+    for (submission, _), is_mentioned in zip(candidates, mentioned):
+        if not is_mentioned:
+            print(f"Skipping post: '{submission.title}' (no meaningful mention of {entity_name})")
+            continue
         results.append(submission)
 
+    scan.kept = len(results)
+    print(f"Search for {entity_type} '{entity_name}': {scan.summary()}.")
     return results
 
 
-def extract_topics_deepseek(text, existing_topics):
-    """
-    Extracts topics from text using DeepSeek-R1:8B via Ollama.
-    Matches extracted topics with existing topics in the database.
+# Topic extraction tiers, recorded in every MetricLog row's explanation
+TOPIC_TIER_LLM = "llm"
+TOPIC_TIER_RAKE = "rake"
 
-    Args:
-        text (str): The input text to extract topics from.
-        existing_topics (list): List of existing topics from the database.
+# Maximum number of topics, and of words per topic, taken from RAKE's keyphrases
+RAKE_MAX_TOPICS = 5
+RAKE_MAX_WORDS = 3
 
-    Returns:
-        list: A list of extracted topics.
-    """
-    # Prepare the prompt for DeepSeek
-    prompt = f"""
+# Tiered extraction defaults: threads shorter than this many characters, or with fewer comments
+# plus upvotes than this, use RAKE; so does every thread while DeepSeek's latency is above the budget
+FAST_PATH_MAX_CHARS = 400
+FAST_PATH_MIN_ENGAGEMENT = 5
+LLM_LATENCY_BUDGET = 120.0
+
+# While DeepSeek is over its latency budget, one thread per this many seconds still goes to DeepSeek,
+# so its latency keeps being measured and DeepSeek is used again once it recovers
+LLM_PROBE_INTERVAL = 60.0
+
+# Prompt used for DeepSeek topic extraction; {text} is replaced with the thread text.
+# Changing it invalidates the LLM extraction cache.
+TOPIC_PROMPT_TEMPLATE = """
 Based on the entire text below, please identify all thematically relevant "abstractive" topics that best capture its core themes. Focus on deeper, context-based aspects rather than trivial or generic words (e.g., "great", "nice"). Avoid speculation beyond what the text provides. Return only the topics, separated by commas.
 
 Example 1:
@@ -507,31 +699,198 @@ Now, based on the text below, return only the topics as a comma-separated list:
 
 Text: {text}
 """
-    # Query DeepSeek-R1:8B
-    response = ollama.generate(model=OLLAMA_MODEL, prompt=prompt)
-    extracted_topics_raw = response["response"].strip()
 
+def parse_topic_response(extracted_topics_raw):
+    """Removes DeepSeek's <think> block from a response and splits the remaining comma-separated topics."""
     # **Remove <think> tags and their content**
     extracted_topics_cleaned = re.sub(r'<think>.*?</think>', '', extracted_topics_raw, flags=re.DOTALL)
 
     # Split the extracted topics
-    extracted_topics = [t.strip() for t in extracted_topics_cleaned.split(",") if t.strip()]
+    return [t.strip() for t in extracted_topics_cleaned.split(",") if t.strip()]
+
+def match_existing_topics(extracted_topics, existing_topics):
+    """
+    Replaces each extracted topic with the first existing topic it fuzzy-matches (score > 80).
+
+    Args:
+        extracted_topics (list): Topics returned by the LLM.
+        existing_topics (TopicMatchIndex or list): Existing topics; pass an index built once per
+            run to avoid rebuilding it on every call.
+    """
+    if not isinstance(existing_topics, TopicMatchIndex):
+        existing_topics = TopicMatchIndex(existing_topics)
+    topics = [t.strip() for t in extracted_topics if t.strip()]
+    return existing_topics.match_many(topics)
+
+def query_topics(text, pool=None, cache=None, stream=None):
+    """
+    Asks DeepSeek-R1:8B for the topics of one prompt's worth of text.
+
+    Args:
+        stream (dict): Optional keyword arguments for OllamaWorkerPool.generate_streaming()
+            (max_think_tokens, deadline); if given, the response is streamed and cut off early.
+
+    Returns:
+        tuple: (raw topic list, request details from OllamaWorkerPool.generate_detailed() or
+        generate_streaming(), or None if the topics came from the cache or no pool was given).
+    """
+    extracted_topics = cache.get(text) if cache is not None else None
+    if extracted_topics is not None:
+        return extracted_topics, None
+
+    # Prepare the prompt for DeepSeek
+    prompt = TOPIC_PROMPT_TEMPLATE.format(text=text)
+
+    # Query DeepSeek-R1:8B
+    details = None
+    if pool is not None and stream is not None:
+        details = pool.generate_streaming(prompt, **stream)
+        extracted_topics_raw = details["response"].strip()
+    elif pool is not None:
+        details = pool.generate_detailed(prompt)
+        extracted_topics_raw = details["response"].strip()
+    else:
+        response = ollama.generate(model=OLLAMA_MODEL, prompt=prompt)
+        extracted_topics_raw = response["response"].strip()
+
+    extracted_topics = parse_topic_response(extracted_topics_raw)
+    # An answer cut short by the deadline only holds the topics that were complete (possibly none), so
+    # it is used for this run but not cached
+    if cache is not None and not (details and details.get("cutoff") == CUTOFF_DEADLINE):
+        cache.put(text, extracted_topics_raw, extracted_topics)
+    return extracted_topics, details
+
+def extract_topics_deepseek(text, existing_topics, pool=None, cache=None, chunk_tokens=None, stream=None):
+    """
+    Extracts topics from text using DeepSeek-R1:8B via Ollama.
+    Matches extracted topics with existing topics in the database.
+
+    If chunk_tokens is set and the text is longer than that (estimated) many tokens, the text is split
+    into chunks that are sent to DeepSeek in parallel (map), and their topics are merged and
+    deduplicated without another LLM call (reduce); see prompt_chunking.py.
+
+    Args:
+        text (str): The input text to extract topics from.
+        existing_topics (TopicMatchIndex or list): Existing topics from the database.
+        pool (OllamaWorkerPool): Optional pool providing timeouts and retries for the request.
+        cache (TopicExtractionCache): Optional cache checked before, and filled after, the Ollama call.
+        chunk_tokens (int): Optional maximum estimated tokens of text per prompt.
+        stream (dict): Optional streaming options for the pool (see query_topics()).
+
+    Returns:
+        list: A list of extracted topics.
+    """
+    if not chunk_tokens or estimate_tokens(text) <= chunk_tokens:
+        extracted_topics, _ = query_topics(text, pool=pool, cache=cache, stream=stream)
+        # Clean and match topics
+        return match_existing_topics(extracted_topics, existing_topics)
+
+    chunks = split_into_chunks(text, chunk_tokens)
+    if pool is not None:
+        results = pool.map(lambda chunk: query_topics(chunk, pool=pool, cache=cache, stream=stream), chunks)
+    else:
+        results = [query_topics(chunk, cache=cache) for chunk in chunks]
+    extracted_topics = merge_topics([topics for topics, _ in results])
+
+    # Logged so the chunk size can be tuned against prompt size and latency
+    prompt_tokens = [details.get("prompt_eval_count") if details else "cached" for _, details in results]
+    latencies = [f"{details['latency']:.1f}s" if details else "-" for _, details in results]
+    print(f"Map-reduce extraction: {len(chunks)} chunks of ~{chunk_tokens} tokens, prompt tokens {prompt_tokens}, "
+          f"latency {latencies}; {sum(len(topics) for topics, _ in results)} chunk topics merged into "
+          f"{len(extracted_topics)}.")
 
     # Clean and match topics
-    matched_topics = []
-    for topic in extracted_topics:
-        topic = topic.strip()
-        if not topic:
+    return match_existing_topics(extracted_topics, existing_topics)
+
+# RAKE is stateful, so fast-path extractions from pool threads take turns
+_rake_lock = threading.Lock()
+
+def extract_topics_rake(text, existing_topics, max_topics=RAKE_MAX_TOPICS):
+    """
+    Extracts topics cheaply as RAKE keyphrases (the fast path of tiered extraction).
+
+    The highest-ranked phrases of 1 to RAKE_MAX_WORDS alphabetic words are title-cased, like DeepSeek's
+    topics, and matched against existing topics.
+
+    Returns:
+        list: Up to max_topics topics.
+    """
+    with _rake_lock:
+        rake = registry.get("rake")
+        rake.extract_keywords_from_text(text)
+        phrases = rake.get_ranked_phrases()
+
+    topics = []
+    for phrase in phrases:
+        words = phrase.split()
+        if not 1 <= len(words) <= RAKE_MAX_WORDS or not all(word.isalpha() for word in words):
             continue
-        # Check if the topic matches any existing topic
-        for existing_topic in existing_topics:
-            if partial_ratio(topic.lower(), existing_topic.lower()) > 80:  # Fuzzy match
-                matched_topics.append(existing_topic)
-                break
-        else:
-            matched_topics.append(topic)
+        topic = " ".join(words).title()
+        if topic not in topics:
+            topics.append(topic)
+        if len(topics) >= max_topics:
+            break
+    return match_existing_topics(topics, existing_topics)
+
+def extract_topics_for_threads(texts, existing_topics, pool, cache=None, on_result=None, fast_path=None,
+                               latency_budget=None, chunk_tokens=None, stream=None):
+    """
+    Extracts topics from many threads concurrently through the Ollama worker pool.
+
+    With tiered extraction, threads flagged in fast_path get RAKE keyphrases instead of DeepSeek
+    topics, and so does every thread that starts while the pool's recent request latency is above
+    latency_budget, except for one probe thread every LLM_PROBE_INTERVAL seconds. The probes keep
+    the latency up to date (the pool outlives the job), so DeepSeek is used again once it recovers.
+
+    Args:
+        texts (list): Full thread texts.
+        existing_topics (TopicMatchIndex or list): Existing topics from the database.
+        pool (OllamaWorkerPool): Pool bounding the number of in-flight requests.
+        cache (TopicExtractionCache): Optional cache of previous extractions.
+        on_result (callable): Called with (index, topics, tier) as soon as a thread's extraction succeeds.
+        fast_path (list): Optional flag per text; True sends the text to the RAKE tier.
+        latency_budget (float): Optional latency in seconds above which DeepSeek is bypassed.
+        chunk_tokens (int): Optional prompt size above which threads are extracted map-reduce style.
+        stream (dict): Optional streaming options for DeepSeek requests (see query_topics()).
 
-    return matched_topics
+    Returns:
+        list: One list of topics per input text, in input order. A thread whose extraction
+        still fails after all retries gets an empty list so the rest of the run can continue.
+    """
+    tier_stats = {}  # tier -> [threads, seconds]
+    stats_lock = threading.Lock()
+
+    def _extract(indexed_text):
+        idx, text = indexed_text
+        start = time.perf_counter()
+        over_budget = latency_budget is not None and (pool.recent_latency() or 0.0) > latency_budget
+        if fast_path and fast_path[idx]:
+            tier = TOPIC_TIER_RAKE
+        elif over_budget and not pool.claim_probe(LLM_PROBE_INTERVAL):
+            tier = TOPIC_TIER_RAKE
+        else:
+            tier = TOPIC_TIER_LLM
+        try:
+            if tier == TOPIC_TIER_RAKE:
+                topics = extract_topics_rake(text, existing_topics)
+            else:
+                topics = extract_topics_deepseek(text, existing_topics, pool=pool, cache=cache,
+                                                 chunk_tokens=chunk_tokens, stream=stream)
+        except Exception as e:
+            print(f"Topic extraction failed for post #{idx}: {e}")
+            return []
+        with stats_lock:
+            counts = tier_stats.setdefault(tier, [0, 0.0])
+            counts[0] += 1
+            counts[1] += time.perf_counter() - start
+        if on_result is not None:
+            on_result(idx, topics, tier)
+        return topics
+
+    results = pool.map(_extract, list(enumerate(texts)))
+    for tier, (threads, seconds) in sorted(tier_stats.items()):
+        print(f"Topic tier '{tier}': {threads} threads, {seconds / threads:.2f}s per thread.")
+    return results
 
 def load_existing_topics():
     """
@@ -540,10 +899,7 @@ def load_existing_topics():
     Returns:
         list: A list of existing topics.
     """
-    sel_q = "SELECT topic FROM Topic"
-    db_cursor.execute(sel_q)
-    rows = db_cursor.fetchall()
-    return [row[0] for row in rows]
+    return list(get_dimensions().topic_names)
 
 def batch_insert_metric_logs(metric_logs):
     """
@@ -551,6 +907,10 @@ def batch_insert_metric_logs(metric_logs):
 
     Args:
         metric_logs (list of tuples): Each tuple contains (setID, topicID, adjectiveID, impressions, date_str, severity, explanation)
+
+    Raises:
+        mysql.connector.Error: If the insert fails (after rolling it back), so the caller does not mark
+            the threads as processed.
     """
     if not metric_logs:
         return
@@ -560,14 +920,16 @@ def batch_insert_metric_logs(metric_logs):
         (setID, topicID, adjectiveID, impressions, date, severity, explanation)
         VALUES (%s, %s, %s, %s, %s, %s, %s)
     """
+    db_connection, db_cursor = get_db()
     try:
         db_cursor.executemany(ins_q, metric_logs)
         db_connection.commit()
     except mysql.connector.Error as err:
         print(f"Error during batch insertion: {err}")
         db_connection.rollback()
+        raise
 
-def assign_category_zero_shot(topic, classifier, candidate_labels, threshold=0.3):
+def assign_category_zero_shot(topic, classifier, candidate_labels, threshold=CATEGORY_THRESHOLD, cache=None):
     """
     Assigns a category to a topic using zero-shot classification.
 
@@ -576,6 +938,7 @@ def assign_category_zero_shot(topic, classifier, candidate_labels, threshold=0.3
         classifier (pipeline): The zero-shot classification pipeline.
         candidate_labels (list): List of predefined categories.
         threshold (float): Confidence threshold to assign 'Miscellaneous' if no category meets the threshold.
+        cache (TopicCategoryCache): Optional cache consulted before, and updated after, classification.
 
     Returns:
         str: Assigned category.
@@ -583,6 +946,11 @@ def assign_category_zero_shot(topic, classifier, candidate_labels, threshold=0.3
     if not topic.strip():
         return "Miscellaneous"
 
+    if cache is not None:
+        cached_category = cache.get(topic)
+        if cached_category is not None:
+            return cached_category
+
     try:
         # Perform zero-shot classification
         classification = classifier(
@@ -596,33 +964,40 @@ def assign_category_zero_shot(topic, classifier, candidate_labels, threshold=0.3
         top_score = classification['scores'][0]
         
         # Assign 'Miscellaneous' if confidence is below the threshold
-        if top_score < threshold:
-            return "Miscellaneous"
-        
-        return top_category
+        category = "Miscellaneous" if top_score < threshold else top_category
     except Exception as e:
+        # Not cached, so the topic is retried on the next run
         print(f"Error during classification of topic '{topic}': {e}")
         return "Miscellaneous"
 
+    if cache is not None:
+        cache.put(topic, category)
+    return category
+
 # ---------------------------------------------------
 # MAIN
 # ---------------------------------------------------
 import argparse
-import datetime
+import csv
+
+ENTITY_TYPES = ['Industry', 'Subreddit', 'Organisation']
+
+VALID_INDUSTRIES = ["Agriculture", "Food", "Forestry", "Mining", "Oil and Gas", "Metal Production", "Chemical", 
+                    "Mechanical and Electrical Engineering", "Transport Equipment Manufacturing", "Clothing", "Commerce", 
+                    "Finance", "Tourism", "Media", "Telecommunications", "Postal", "Construction", "Education", "Healthcare", 
+                    "Public Service", "Utilities", "Waterway", "Transport", "Social Care", "Construction"]
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Process submissions and extract topics based on entity type.")
     parser.add_argument(
         '--entity_type',
         type=str,
-        required=True,
-        choices=['Industry', 'Subreddit', 'Organisation'],
-        help="Type of entity (Industry, Subreddit, or Organisation)"
+        choices=ENTITY_TYPES,
+        help="Type of entity (Industry, Subreddit, or Organisation). Required unless running a batch."
     )
     parser.add_argument(
         '--entity_name',
         type=str,
-        required=True,
         help="The name of the entity (e.g., the name of the industry, subreddit, or organisation)"
     )
     parser.add_argument(
@@ -631,117 +1006,590 @@ def parse_args():
         default="",
         help="Date in YYYY-MM-DD format, or leave blank for the last 24 hours"
     )
+    parser.add_argument(
+        '--jobs_file',
+        type=str,
+        help="Batch mode: CSV of entity_type,entity_name[,date] jobs processed in this one process"
+    )
+    parser.add_argument(
+        '--from_tracked_entities',
+        action='store_true',
+        help="Batch mode: run every TrackedEntity for each date in --start_date..--end_date (or --date)"
+    )
+    parser.add_argument(
+        '--start_date',
+        type=str,
+        default="",
+        help="Batch mode: first date (YYYY-MM-DD) of the range to collect"
+    )
+    parser.add_argument(
+        '--end_date',
+        type=str,
+        default="",
+        help="Batch mode: last date (YYYY-MM-DD, inclusive) of the range to collect"
+    )
     parser.add_argument(
         '--limit',
         type=int,
         default=10,
-        help="Number of posts to fetch (default: 10)"
+        help="Maximum number of posts inside the date window to collect (default: 10)"
+    )
+    parser.add_argument(
+        '--max_scanned',
+        type=int,
+        default=DEFAULT_MAX_SCANNED,
+        help=f"Maximum number of search results fetched while looking for posts in the window (default: {DEFAULT_MAX_SCANNED})"
+    )
+    parser.add_argument(
+        '--rate_limit_state',
+        type=str,
+        default=RATE_LIMIT_STATE_PATH,
+        help="SQLite file used to share the Reddit rate limit between collector processes"
+    )
+    parser.add_argument(
+        '--fetch_workers',
+        type=int,
+        default=DEFAULT_FETCH_WORKERS,
+        help=f"Number of submissions whose comments are fetched concurrently (default: {DEFAULT_FETCH_WORKERS})"
+    )
+    parser.add_argument(
+        '--max_comments',
+        type=int,
+        default=DEFAULT_MAX_COMMENTS,
+        help=f"Maximum comments read per thread (default: {DEFAULT_MAX_COMMENTS})"
+    )
+    parser.add_argument(
+        '--max_thread_bytes',
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help=f"Maximum bytes of text read per thread (default: {DEFAULT_MAX_BYTES})"
+    )
+    parser.add_argument(
+        '--max_comment_requests',
+        type=int,
+        default=DEFAULT_MAX_REQUESTS,
+        help=f"Maximum 'load more comments' requests per thread (default: {DEFAULT_MAX_REQUESTS})"
+    )
+    parser.add_argument(
+        '--comment_rank',
+        type=str,
+        default=RANK_BY_SCORE,
+        choices=[RANK_BY_SCORE, RANK_BY_DEPTH],
+        help="Read highest-scoring comments first, or top-level comments first (default: score)"
+    )
+    parser.add_argument(
+        '--chunk_tokens',
+        type=int,
+        default=0,
+        help=f"Split threads longer than this many (estimated) tokens into chunks whose topics are extracted "
+             f"in parallel and merged; 0 sends every thread as one prompt (suggested: {DEFAULT_CHUNK_TOKENS})"
+    )
+    parser.add_argument(
+        '--ollama_stream',
+        action='store_true',
+        help="Stream DeepSeek responses and stop each one as soon as its topic list is complete"
+    )
+    parser.add_argument(
+        '--max_think_tokens',
+        type=int,
+        default=DEFAULT_MAX_THINK_TOKENS,
+        help=f"Streaming: tokens DeepSeek may spend thinking before it is asked again without thinking; "
+             f"0 for no limit (default: {DEFAULT_MAX_THINK_TOKENS})"
+    )
+    parser.add_argument(
+        '--stream_deadline',
+        type=float,
+        default=DEFAULT_STREAM_DEADLINE,
+        help=f"Streaming: seconds after which a response is cut off; 0 for no limit "
+             f"(default: {DEFAULT_STREAM_DEADLINE:.0f})"
+    )
+    parser.add_argument(
+        '--tiered_topics',
+        action='store_true',
+        help="Use cheap RAKE keyphrases instead of DeepSeek for short or low-engagement threads, and for "
+             "every thread while DeepSeek's latency is over budget"
+    )
+    parser.add_argument(
+        '--fast_path_max_chars',
+        type=int,
+        default=FAST_PATH_MAX_CHARS,
+        help=f"Tiered topics: threads shorter than this use RAKE (default: {FAST_PATH_MAX_CHARS})"
+    )
+    parser.add_argument(
+        '--fast_path_min_engagement',
+        type=int,
+        default=FAST_PATH_MIN_ENGAGEMENT,
+        help=f"Tiered topics: threads with fewer comments plus upvotes use RAKE (default: {FAST_PATH_MIN_ENGAGEMENT})"
+    )
+    parser.add_argument(
+        '--llm_latency_budget',
+        type=float,
+        default=LLM_LATENCY_BUDGET,
+        help=f"Tiered topics: seconds of recent DeepSeek latency above which threads use RAKE "
+             f"(default: {LLM_LATENCY_BUDGET:.0f})"
+    )
+    parser.add_argument(
+        '--emotion_mode',
+        type=str,
+        choices=[EMOTION_MODE_TRUNCATE, EMOTION_MODE_WINDOWED],
+        default=EMOTION_MODE_TRUNCATE,
+        help=f"'{EMOTION_MODE_TRUNCATE}' classifies the first {EMOTION_MAX_CHARS} characters of a thread; "
+             f"'{EMOTION_MODE_WINDOWED}' scores the whole thread in token windows"
+    )
+    parser.add_argument(
+        '--emotion_window_tokens',
+        type=int,
+        default=DEFAULT_WINDOW_TOKENS,
+        help=f"Windowed emotion mode: tokens per window (default: {DEFAULT_WINDOW_TOKENS})"
+    )
+    parser.add_argument(
+        '--emotion_max_windows',
+        type=int,
+        default=DEFAULT_MAX_WINDOWS,
+        help=f"Windowed emotion mode: maximum windows scored per thread (default: {DEFAULT_MAX_WINDOWS})"
+    )
+    parser.add_argument(
+        '--emotion_batch_tokens',
+        type=int,
+        default=DEFAULT_BATCH_TOKENS,
+        help=f"Windowed emotion mode: padded tokens per forward pass (default: {DEFAULT_BATCH_TOKENS})"
+    )
+    parser.add_argument(
+        '--inference_backend',
+        type=str,
+        choices=BACKENDS,
+        default=INFERENCE_BACKEND,
+        help="Backend for the emotion and zero-shot models: plain PyTorch, int8-quantized PyTorch or "
+             "ONNX Runtime (also settable via COLLECTOR_INFERENCE_BACKEND)"
+    )
+    parser.add_argument(
+        '--emotion_batch_size',
+        type=int,
+        default=EMOTION_BATCH_SIZE,
+        help=f"Number of threads per emotion model forward pass (default: {EMOTION_BATCH_SIZE})"
+    )
+    parser.add_argument(
+        '--ollama_concurrency',
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Maximum number of concurrent Ollama topic extraction requests (default: {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        '--ollama_timeout',
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f"Per-request Ollama timeout in seconds (default: {DEFAULT_TIMEOUT:.0f})"
+    )
+    parser.add_argument(
+        '--ollama_retries',
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+        help=f"Retries for a failed Ollama request, with exponential backoff (default: {DEFAULT_MAX_RETRIES})"
+    )
+    parser.add_argument(
+        '--llm_cache_ttl_days',
+        type=float,
+        default=DEFAULT_TTL_DAYS,
+        help=f"Days a cached DeepSeek extraction stays valid (default: {DEFAULT_TTL_DAYS})"
+    )
+    parser.add_argument(
+        '--no_llm_cache',
+        action='store_true',
+        help="Always query DeepSeek instead of reusing cached extractions"
+    )
+    parser.add_argument(
+        '--worker',
+        action='store_true',
+        help="Run as a resident worker: load models once, then process jobs from the local job queue"
+    )
+    parser.add_argument(
+        '--queue_path',
+        type=str,
+        default=str(DEFAULT_QUEUE_PATH),
+        help="Worker mode: SQLite file holding the job queue (see job_queue.py)"
+    )
+    parser.add_argument(
+        '--poll_interval',
+        type=float,
+        default=WORKER_POLL_INTERVAL,
+        help=f"Worker mode: seconds between queue polls while idle (default: {WORKER_POLL_INTERVAL})"
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help="Reuse the spooled results of an interrupted run and skip runs that already completed"
+    )
+    parser.add_argument(
+        '--reprocess_seen',
+        action='store_true',
+        help="Process every submission found, even those already processed for the entity and unchanged since. "
+             "Topic/emotion pairs logged by earlier runs are still not logged again"
+    )
+    parser.add_argument(
+        '--no_spool',
+        action='store_true',
+        help="Keep stage results in memory only (the run cannot be resumed)"
     )
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if not (args.jobs_file or args.from_tracked_entities or args.worker) and not (args.entity_type and args.entity_name):
+        parser.error("--entity_type and --entity_name are required unless --jobs_file, "
+                     "--from_tracked_entities or --worker is given")
+    return args
+
+def date_range(start_date, end_date):
+    """Returns every YYYY-MM-DD date from start_date to end_date inclusive."""
+    start = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.datetime.strptime(end_date or start_date, "%Y-%m-%d").date()
+    return [(start + datetime.timedelta(days=n)).isoformat() for n in range((end - start).days + 1)]
+
+def is_valid_date(date_str):
+    """Returns True if date_str is a YYYY-MM-DD date."""
+    try:
+        datetime.datetime.strptime(date_str, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
 
-def main():
-    # Parse command-line arguments
-    args = parse_args()
-    print(f"[{datetime.datetime.now()}] Arguments parsed.")
+def load_batch_jobs(args):
+    """
+    Builds the (entity_type, entity_name, date) job list for batch mode.
 
-    # Load the topic name cache (optional if used)
-    load_topic_name_cache()
-    print(f"[{datetime.datetime.now()}] Topic name cache loaded.")
+    Jobs come from --jobs_file (CSV rows of entity_type,entity_name[,date]; blank lines, '#' comments
+    and an 'entity_type' header are ignored) and/or every row of the TrackedEntity table. Jobs without
+    a date are expanded over --start_date..--end_date, or use --date if no range is given.
+
+    Malformed rows, and jobs left without a valid date, are reported and skipped so the rest of the
+    batch still runs.
+    """
+    dates = []
+    if args.start_date:
+        start_date, end_date = args.start_date.strip(), args.end_date.strip()
+        if not is_valid_date(start_date) or (end_date and not is_valid_date(end_date)):
+            print(f"ERROR: invalid --start_date/--end_date '{start_date}'..'{end_date}' (expected YYYY-MM-DD); "
+                  f"only jobs with their own date will run.")
+        else:
+            dates = date_range(start_date, end_date)
+            if not dates:
+                print(f"ERROR: --end_date {end_date} is before --start_date {start_date}; "
+                      f"only jobs with their own date will run.")
+    elif args.date.strip() and not is_valid_date(args.date.strip()):
+        print(f"ERROR: invalid --date '{args.date.strip()}' (expected YYYY-MM-DD); "
+              f"only jobs with their own date will run.")
+    else:
+        dates = [args.date.strip()]
+
+    skipped = 0
+    entities = []  # (entity_type, entity_name, date or None)
+    if args.jobs_file:
+        with open(args.jobs_file, newline='') as f:
+            reader = csv.reader(f)
+            while True:
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    break
+                except csv.Error as e:
+                    print(f"Skipping {args.jobs_file} line {reader.line_num}: {e}.")
+                    skipped += 1
+                    continue
+                row = [field.strip() for field in row]
+                if not row or not row[0] or row[0].startswith('#') or row[0].lower() == 'entity_type':
+                    continue
+                job_date = row[2] if len(row) > 2 and row[2] else None
+                if len(row) < 2 or not row[1]:
+                    print(f"Skipping {args.jobs_file} line {reader.line_num}: expected "
+                          f"entity_type,entity_name[,date], got {row}.")
+                    skipped += 1
+                elif job_date and not is_valid_date(job_date):
+                    print(f"Skipping {args.jobs_file} line {reader.line_num}: invalid date '{job_date}' "
+                          f"(expected YYYY-MM-DD).")
+                    skipped += 1
+                else:
+                    entities.append((row[0], row[1], job_date))
+    if args.from_tracked_entities:
+        db_connection, db_cursor = get_db()
+        db_cursor.execute("SELECT entityType, name FROM TrackedEntity ORDER BY setID")
+        entities.extend((entity_type, name, None) for entity_type, name in db_cursor.fetchall())
+
+    jobs = []
+    for entity_type, entity_name, job_date in entities:
+        job_dates = [job_date] if job_date else dates
+        if not job_dates:
+            skipped += 1
+        for date_str in job_dates:
+            jobs.append((entity_type, entity_name, date_str))
+    if skipped:
+        print(f"[{datetime.datetime.now()}] Batch mode: skipped {skipped} invalid job rows or jobs without a valid date.")
+    return jobs
+
+def run_job(entity_type, entity_name, date_str, args, ollama_pool, llm_cache, spool, seen_index):
+    """
+    Collects, analyses and stores the posts of one entity for one date.
+
+    Models, caches and connections are shared with every other job in the process. Each stage's
+    results are spooled under the job's run ID, so with --resume an interrupted job only redoes the
+    work it had not finished.
+
+    Returns:
+        dict: Summary of the job (status, fetched, submissions, skipped_seen, threads, metric_logs).
+    """
+    summary = {'status': 'ok', 'fetched': 0, 'submissions': 0, 'skipped_seen': 0, 'threads': 0, 'metric_logs': 0}
 
-    entity_type = args.entity_type
-    entity_name = args.entity_name
-    date_str = args.date.strip()
+    # Validate entity types (TrackedEntity rows and job files are not checked by argparse)
+    entity_type = next((t for t in ENTITY_TYPES if t.lower() == entity_type.lower()), None)
+    if entity_type is None:
+        print(f"ERROR: unknown entity type. Valid: {ENTITY_TYPES}")
+        summary['status'] = 'invalid entity type'
+        return summary
 
     # Validate industries
     if entity_type.lower() == 'industry':
-        valid_industries = ["Agriculture", "Food", "Forestry", "Mining", "Oil and Gas", "Metal Production", "Chemical", 
-                            "Mechanical and Electrical Engineering", "Transport Equipment Manufacturing", "Clothing", "Commerce", 
-                            "Finance", "Tourism", "Media", "Telecommunications", "Postal", "Construction", "Education", "Healthcare", 
-                            "Public Service", "Utilities", "Waterway", "Transport", "Social Care", "Construction"]
-        if entity_name not in valid_industries:
-            print(f"ERROR: '{entity_name}' not recognized. Valid: {valid_industries}")
-            return
+        if entity_name not in VALID_INDUSTRIES:
+            print(f"ERROR: '{entity_name}' not recognized. Valid: {VALID_INDUSTRIES}")
+            summary['status'] = 'invalid industry'
+            return summary
     print(f"[{datetime.datetime.now()}] Industry validation completed.")
 
-    submissions = search_posts(entity_type, entity_name, date_str=date_str, limit=args.limit)  # Using the passed limit
-    print(f"[{datetime.datetime.now()}] Search completed; found {len(submissions)} submissions.")
-
-    if not submissions:
-        print("No posts found. Possibly increase limit or remove date filter.")
-        return
+    # Every stage's output is spooled as it is produced; with --resume, spooled work is reused
+    # Without a date the search covers the last 24 hours; rows are logged under today's date
+    log_date = date_str or datetime.datetime.now().strftime("%Y-%m-%d")
+    run_id = make_run_id(entity_type, entity_name, log_date)
+    if args.resume and spool.is_complete(run_id):
+        print(f"[{datetime.datetime.now()}] Run '{run_id}' already completed; skipping.")
+        summary['status'] = 'already completed'
+        return summary
+    kept = spool.begin(run_id, resume=args.resume)
+    if args.resume:
+        print(f"[{datetime.datetime.now()}] Resuming run '{run_id}' ({kept} spooled results).")
+
+    searched = spool.load(run_id, STAGE_SEARCH).get(run_id)
+    submissions_by_id = {}
+    if searched is None:
+        scan = WindowScan()
+        submissions = search_posts(entity_type, entity_name, date_str=date_str, limit=args.limit,
+                                   max_scanned=args.max_scanned, scan=scan)
+        submissions_by_id = {submission.id: submission for submission in submissions}
+        searched = {
+            'fetched': scan.fetched,
+            'posts': [{'id': s.id, 'title': s.title, 'url': s.url, 'num_comments': s.num_comments,
+                       'edited': s.edited, 'score': s.score} for s in submissions]
+        }
+        spool.put(run_id, STAGE_SEARCH, run_id, searched)
+    posts = searched['posts']
+    summary['submissions'] = len(posts)
+    summary['fetched'] = searched['fetched']
+    print(f"[{datetime.datetime.now()}] Search completed; found {len(posts)} submissions.")
+
+    if not posts:
+        print("No posts found. Possibly increase --max_scanned or check the date.")
+        summary['status'] = 'no posts'
+        return summary
+
+    # Skip threads already processed for this entity that have no new comments or edits since
+    seen_key = entity_key(entity_type, entity_name)
+    seen = seen_index.lookup(seen_key, [post['id'] for post in posts])
+    posts = [
+        post for post in posts
+        if args.reprocess_seen or post['id'] not in seen
+        or not seen[post['id']].is_current(post.get('num_comments'), post.get('edited'))
+    ]
+    summary['skipped_seen'] = summary['submissions'] - len(posts)
+    if summary['skipped_seen']:
+        print(f"[{datetime.datetime.now()}] Skipping {summary['skipped_seen']} already-processed submissions "
+              f"({len(posts)} new or changed).")
+    if not posts:
+        summary['status'] = 'no new posts'
+        return summary
 
     set_id = get_or_create_tracked_entity(entity_type, entity_name)
     print(f"[{datetime.datetime.now()}] Tracked entity obtained with set_id: {set_id}.")
 
     # Gather all full_texts
+    fetch_budget = FetchBudget(
+        max_comments=args.max_comments,
+        max_bytes=args.max_thread_bytes,
+        max_requests=args.max_comment_requests,
+        rank=args.comment_rank
+    )
+    threads = spool.load(run_id, STAGE_THREAD)
+    to_fetch = [post for post in posts if post['id'] not in threads]
+    # Submissions only known from the spool are loaded lazily by ID
+    reddit = registry.get("reddit") if to_fetch else None
+    to_fetch_submissions = [
+        submissions_by_id.get(post['id']) or reddit.submission(id=post['id']) for post in to_fetch
+    ]
+    # Expand comment trees for several submissions at once, under the shared rate limit
+    fetch_results = fetch_threads(to_fetch_submissions, fetch_budget, workers=args.fetch_workers)
+
+    posts_by_id = {post['id']: post for post in posts}
+    fetched_threads = []
+    for post, fetch_result in zip(to_fetch, fetch_results):
+        if fetch_result.error is not None:
+            # Not spooled, so a resumed run tries this thread again
+            print(f"Failed to fetch post {post['id']} '{post['title']}': {fetch_result.error}")
+            continue
+        print(f"Fetched post {post['id']} in {fetch_result.latency:.2f}s ({len(fetch_result.text)} chars).")
+        threads[post['id']] = {'title': post['title'], 'url': post['url'], 'full_text': fetch_result.text}
+        fetched_threads.append((post['id'], threads[post['id']]))
+    spool.put_many(run_id, STAGE_THREAD, fetched_threads)
+
+    thread_ids = []
     full_texts = []
     submission_details = []  # To keep track of each submission's details
-    for idx, submission in enumerate(submissions):
-        full_text = gather_full_thread_text(submission)
+    for idx, post in enumerate(posts):
+        thread = threads.get(post['id'])
+        if thread is None:
+            continue
         # Ensure that the full_text is not empty
-        if full_text.strip():
-            full_texts.append(full_text)
-            submission_details.append({
-                'title': submission.title,
-                'url': submission.url,
-                'full_text': full_text
-            })
+        if thread['full_text'].strip():
+            thread_ids.append(post['id'])
+            full_texts.append(thread['full_text'])
+            submission_details.append(thread)
         else:
-            print(f"Skipping post #{idx} due to empty content: '{submission.title}'")
-    print(f"[{datetime.datetime.now()}] Full texts gathered: {len(full_texts)} valid texts.")
+            print(f"Skipping post #{idx} due to empty content: '{post['title']}'")
+    summary['threads'] = len(full_texts)
+    total_latency = sum(result.latency for result in fetch_results)
+    print(f"[{datetime.datetime.now()}] Full texts gathered: {len(full_texts)} valid texts, "
+          f"{len(to_fetch)} fetched (sum of per-thread fetch latency {total_latency:.2f}s).")
+    if registry.is_loaded("rate_limiter"):
+        print(f"[{datetime.datetime.now()}] Reddit rate limiter: {registry.get('rate_limiter').stats()}.")
 
     if not full_texts:
         print("No valid texts to process after filtering.")
-        return
-
-    # Load existing topics from the database
-    existing_topics = load_existing_topics()
-    print(f"[{datetime.datetime.now()}] Existing topics loaded.")
-
-    # Perform topic extraction using DeepSeek
-    print("Performing topic extraction on the collected posts...")
-    print(f"[{datetime.datetime.now()}] Topic extraction started.")
-    metric_logs = []
-
-    for idx, text in enumerate(full_texts):
-        # Extract topics using DeepSeek
-        extracted_topics = extract_topics_deepseek(text, existing_topics)
-        for topic in extracted_topics:
+        summary['status'] = 'no valid texts'
+        return summary
+
+    # Classify the overall emotion of every thread in one batched stage
+    emotions = spool.load(run_id, STAGE_EMOTION)
+    pending = [idx for idx, thread_id in enumerate(thread_ids) if thread_id not in emotions]
+    if args.emotion_mode == EMOTION_MODE_WINDOWED:
+        pending_labels = get_top_emotions_windowed(
+            [full_texts[idx] for idx in pending], window_tokens=args.emotion_window_tokens,
+            max_windows=args.emotion_max_windows, max_batch_tokens=args.emotion_batch_tokens
+        )
+    else:
+        pending_labels = get_top_emotions([full_texts[idx] for idx in pending], batch_size=args.emotion_batch_size)
+    spool.put_many(run_id, STAGE_EMOTION, [(thread_ids[idx], label) for idx, label in zip(pending, pending_labels)])
+    emotions.update((thread_ids[idx], label) for idx, label in zip(pending, pending_labels))
+    emotion_labels = [emotions[thread_id] for thread_id in thread_ids]
+    print(f"[{datetime.datetime.now()}] Emotions classified for {len(pending)} texts "
+          f"({len(full_texts) - len(pending)} from the spool).")
+
+    # Perform topic extraction using DeepSeek on the threads not spooled yet
+    spooled_topics = {}
+    topic_tiers = {}  # thread ID -> extraction tier that produced its topics
+    for thread_id, payload in spool.load(run_id, STAGE_TOPICS).items():
+        spooled_topics[thread_id] = payload['topics']
+        topic_tiers[thread_id] = payload['tier']
+    extracted_ids = set(spooled_topics)  # Threads whose extraction succeeded (failures are retried later)
+    resumed_topic_ids = set(spooled_topics)  # Threads whose topics came from the spool, not this run
+    pending = [idx for idx, thread_id in enumerate(thread_ids) if thread_id not in spooled_topics]
+    if pending:
+        # Load existing topics from the database
+        existing_topics = TopicMatchIndex(load_existing_topics())
+        print(f"[{datetime.datetime.now()}] Existing topics loaded and indexed ({len(existing_topics)} topics).")
+
+        def _spool_topics(i, topics, tier):
+            spool.put(run_id, STAGE_TOPICS, thread_ids[pending[i]], {'topics': topics, 'tier': tier})
+            topic_tiers[thread_ids[pending[i]]] = tier
+            extracted_ids.add(thread_ids[pending[i]])
+
+        fast_path = None
+        if args.tiered_topics:
+            # Short or low-engagement threads get cheap RAKE keyphrases instead of DeepSeek topics
+            fast_path = []
+            for idx in pending:
+                post = posts_by_id[thread_ids[idx]]
+                engagement = (post.get('num_comments') or 0) + (post.get('score') or 0)
+                fast_path.append(len(full_texts[idx]) < args.fast_path_max_chars
+                                 or engagement < args.fast_path_min_engagement)
+            print(f"[{datetime.datetime.now()}] Tiered extraction: {sum(fast_path)} of {len(pending)} "
+                  f"threads take the RAKE fast path.")
+
+        print("Performing topic extraction on the collected posts...")
+        print(f"[{datetime.datetime.now()}] Topic extraction started.")
+        extracted = extract_topics_for_threads(
+            [full_texts[idx] for idx in pending], existing_topics, ollama_pool, cache=llm_cache,
+            # Spool each thread as soon as it succeeds, so a crash mid-stage keeps finished threads
+            on_result=_spool_topics,
+            fast_path=fast_path,
+            latency_budget=args.llm_latency_budget if args.tiered_topics else None,
+            chunk_tokens=args.chunk_tokens or None,
+            stream=({'max_think_tokens': args.max_think_tokens or None, 'deadline': args.stream_deadline or None}
+                    if args.ollama_stream else None)
+        )
+        spooled_topics.update((thread_ids[idx], topics) for idx, topics in zip(pending, extracted))
+        print(f"[{datetime.datetime.now()}] DeepSeek extraction finished: {ollama_pool.stats()}.")
+    topics_per_thread = [spooled_topics[thread_id] for thread_id in thread_ids]
+
+    # Only loaded if some topic misses the category cache
+    zero_shot_classifier = registry.lazy("zero_shot_classifier")
+
+    # Categorise every extracted topic first, so the Topic table is written in one batch
+    spooled_categories = spool.load(run_id, STAGE_CATEGORIES)
+    categorised_topics = []  # per thread: list of (topic, category)
+    for idx, thread_id in enumerate(thread_ids):
+        if thread_id not in extracted_ids:
+            # Extraction failed: nothing is spooled, so a retry extracts and categorises the thread again
+            categorised_topics.append([])
+            continue
+        # Categories are only reused together with the spooled topics they were computed from
+        if thread_id in spooled_categories and thread_id in resumed_topic_ids:
+            categorised_topics.append([tuple(pair) for pair in spooled_categories[thread_id]])
+            continue
+        thread_topics = []
+        for topic in topics_per_thread[idx]:
             # Assign a category to the topic using zero-shot classification
             category = assign_category_zero_shot(
                 topic, 
                 zero_shot_classifier, 
                 TOPIC_CATEGORIES, 
-                threshold=0.3  # Adjust threshold as needed
+                threshold=CATEGORY_THRESHOLD,  # Adjust threshold as needed
+                cache=topic_category_cache
             )
-            
-            # Insert or get topic
-            topic_id = get_or_create_topic(topic, category=category)
-            if not topic_id:
-                continue
+            thread_topics.append((topic, category))
+        categorised_topics.append(thread_topics)
+        spool.put(run_id, STAGE_CATEGORIES, thread_id, thread_topics)
+
+    # Insert or get all topics and adjectives in batches
+    dimensions = get_dimensions()
+    topic_ids = dimensions.resolve_topics([pair for pairs in categorised_topics for pair in pairs])
+    emotion_labels = [label or "neutral" for label in emotion_labels]
+    adjective_ids = dimensions.resolve_adjectives(sorted(set(emotion_labels)), "emotion")
+    print(f"[{datetime.datetime.now()}] Topics and adjectives resolved: {dimensions.stats()}.")
 
-            # Get emotion
-            emotion_label = get_top_emotion(text) or "neutral"
+    explanation = f"Topics & emotion from post+comments about {entity_name}"
+    severity = -1
 
-            # Insert or get adjective
-            adj_id = get_or_create_adjective(emotion_label, "emotion")
-            if not adj_id:
+    metric_logs = []
+    logged_pairs = {}  # thread ID -> (topicID, adjectiveID) pairs logged for it, in this or earlier runs
+    for idx, thread_topics in enumerate(categorised_topics):
+        # Emotion was classified once per thread above
+        emotion_label = emotion_labels[idx]
+        adj_id = adjective_ids[emotion_label]
+        thread_id = thread_ids[idx]
+        # Which extraction tier produced the topics, so tiers can be compared downstream
+        thread_explanation = f"{explanation} (topics: {topic_tiers.get(thread_id, TOPIC_TIER_LLM)})"
+        logged = logged_pairs[thread_id] = set(seen[thread_id].logged) if thread_id in seen else set()
+        for topic, category in thread_topics:
+            topic_id = topic_ids[topic]
+            if not topic_id or not adj_id:
+                continue
+            # A changed thread that was processed before only logs pairs it has not logged yet
+            if (topic_id, adj_id) in logged:
                 continue
+            logged.add((topic_id, adj_id))
 
             # Prepare metric log entry
-            date_str = args.date.strip() if args.date.strip() else datetime.datetime.now().strftime("%Y-%m-%d")
-            explanation = f"Topics & emotion from post+comments about {entity_name}"
-            severity = -1
-
             metric_logs.append((
                 set_id,
                 topic_id,
                 adj_id,
                 1,            # impressions
-                date_str,
+                log_date,
                 severity,
-                explanation
+                thread_explanation
             ))
 
             # For debugging:
@@ -753,18 +1601,209 @@ def main():
             print(f"Overall Emotion: {emotion_label}")
     print(f"[{datetime.datetime.now()}] Topic extraction completed; total metric logs: {len(metric_logs)}.")
 
-    # Batch insert all metric logs
+    # Batch insert all metric logs; a failed insert raises before the threads below are marked as done,
+    # so the job can be retried (with --resume, from the spooled stages)
     batch_insert_metric_logs(metric_logs)
     print(f"[{datetime.datetime.now()}] Metric logs batch inserted.")
 
-    # Save the updated topic name cache (optional if used)
-    save_topic_name_cache()
-    print(f"[{datetime.datetime.now()}] Topic name cache saved.")
+    # Record every thread that was fully processed, with its watermark, so later runs can skip it
+    processed_ids = [thread_id for thread_id in thread_ids if thread_id in extracted_ids]
+    processed_ids += [
+        post['id'] for post in posts
+        if post['id'] in threads and not threads[post['id']]['full_text'].strip()  # Nothing to extract
+    ]
+    seen_index.record(seen_key, [
+        (thread_id, posts_by_id[thread_id].get('num_comments'), posts_by_id[thread_id].get('edited'),
+         logged_pairs.get(thread_id, set(seen[thread_id].logged) if thread_id in seen else set()))
+        for thread_id in processed_ids
+    ])
+    spool.complete(run_id, len(metric_logs))
+    summary['metric_logs'] = len(metric_logs)
+    return summary
+
+def run_batch(jobs, args, ollama_pool, llm_cache, spool, seen_index):
+    """
+    Runs every job in this process, isolating failures so one bad job never stops the batch,
+    then prints a per-job throughput report.
+    """
+    results = []
+    batch_start = time.perf_counter()
+    for job_num, (entity_type, entity_name, date_str) in enumerate(jobs, start=1):
+        print(f"\n========== Job {job_num}/{len(jobs)}: {entity_type} '{entity_name}' "
+              f"{date_str or 'last 24 hours'} ==========")
+        job_start = time.perf_counter()
+        try:
+            summary = run_job(entity_type, entity_name, date_str, args, ollama_pool, llm_cache, spool, seen_index)
+        except Exception as e:
+            print(f"Job failed: {e!r}")
+            if registry.is_loaded("db"):
+                get_db()[0].rollback()
+            summary = {'status': f'failed: {e}', 'fetched': 0, 'submissions': 0, 'skipped_seen': 0, 'threads': 0,
+                       'metric_logs': 0}
+        summary.update({
+            'entity_type': entity_type,
+            'entity_name': entity_name,
+            'date': date_str,
+            'seconds': time.perf_counter() - job_start,
+        })
+        results.append(summary)
+        # Persist the category cache after every job so a later crash keeps the work done so far
+        topic_category_cache.save()
+
+    print(f"\n{'type':<12} {'entity':<30} {'date':<10} {'fetched':>7} {'posts':>5} {'seen':>5} {'threads':>7} {'logs':>5} "
+          f"{'secs':>7} {'threads/min':>11}  status")
+    for r in results:
+        rate = r['threads'] / r['seconds'] * 60 if r['seconds'] else 0.0
+        print(f"{r['entity_type']:<12} {r['entity_name'][:30]:<30} {r['date'] or '-':<10} {r['fetched']:>7} {r['submissions']:>5} {r['skipped_seen']:>5} "
+              f"{r['threads']:>7} {r['metric_logs']:>5} {r['seconds']:>7.1f} {rate:>11.1f}  {r['status']}")
+    total_seconds = time.perf_counter() - batch_start
+    total_threads = sum(r['threads'] for r in results)
+    failed = sum(1 for r in results if r['status'].startswith('failed'))
+    print(f"Batch finished: {len(results)} jobs ({failed} failed), "
+          f"{sum(r['fetched'] for r in results)} search results fetched, {total_threads} threads, "
+          f"{sum(r['metric_logs'] for r in results)} metric logs in {total_seconds:.1f}s.")
+    return results
 
-    print("\nDONE. Check MetricLog for aggregated topic/emotion rows.")
+def run_worker(args, ollama_pool, llm_cache, spool, seen_index):
+    """
+    Runs as a resident worker: loads every model and connection once, then takes jobs from the
+    local job queue until SIGINT/SIGTERM.
+
+    A stop signal lets the current job finish first (a second SIGINT exits immediately). A job that
+    raises is requeued until it runs out of attempts, and a retried job resumes from the stage spool.
+    While running, the worker heartbeats its state into the queue; `python job_queue.py status`
+    shows it.
+    """
+    queue = JobQueue(args.queue_path)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stop = threading.Event()
+    state = {'state': 'starting', 'current_job': None, 'jobs_done': 0, 'jobs_failed': 0}
+
+    def _request_stop(signum, frame):
+        print(f"[{datetime.datetime.now()}] Received signal {signum}; stopping after the current job.")
+        stop.set()
+        # A second Ctrl-C interrupts the current job
+        signal.signal(signal.SIGINT, signal.default_int_handler)
 
+    signal.signal(signal.SIGINT, _request_stop)
+    signal.signal(signal.SIGTERM, _request_stop)
+
+    stop_heartbeat = threading.Event()
+
+    def _heartbeat():
+        while not stop_heartbeat.wait(HEARTBEAT_INTERVAL):
+            queue.heartbeat(worker_id, **state)
+
+    queue.register_worker(worker_id)
+    requeued = queue.requeue_abandoned()
+    if requeued:
+        print(f"[{datetime.datetime.now()}] Requeued {requeued} jobs abandoned by stopped workers.")
+    heartbeat_thread = threading.Thread(target=_heartbeat, daemon=True)
+    heartbeat_thread.start()
+
+    try:
+        state['state'] = 'warming up'
+        for name in WORKER_WARM_RESOURCES:
+            registry.get(name)
+        print(f"[{datetime.datetime.now()}] Worker {worker_id} ready; polling {args.queue_path}.")
+
+        while not stop.is_set():
+            state.update({'state': 'idle', 'current_job': None})
+            job = queue.claim(worker_id)
+            if job is None:
+                stop.wait(args.poll_interval)
+                continue
+
+            state.update({'state': 'running', 'current_job': job['job_id']})
+            queue.heartbeat(worker_id, **state)
+            print(f"\n========== Job {job['job_id']} (attempt {job['attempts']}): {job['entity_type']} "
+                  f"'{job['entity_name']}' {job['date'] or '(last 24 hours)'} ==========")
+            job_start = time.perf_counter()
+            # A retried job picks up what its previous attempt spooled
+            job_args = argparse.Namespace(**{**vars(args), 'resume': args.resume or job['attempts'] > 1})
+            try:
+                # Idle connections may have been closed by the server since the last job
+                get_db()[0].ping(reconnect=True, attempts=3, delay=2)
+                summary = run_job(job['entity_type'], job['entity_name'], job['date'], job_args,
+                                  ollama_pool, llm_cache, spool, seen_index)
+            except Exception as e:
+                print(f"Job {job['job_id']} failed: {e!r}")
+                if registry.is_loaded("db"):
+                    get_db()[0].rollback()
+                queue.fail(job['job_id'], e)
+                state['jobs_failed'] += 1
+            else:
+                summary['seconds'] = time.perf_counter() - job_start
+                queue.finish(job['job_id'], summary)
+                state['jobs_done'] += 1
+                print(f"[{datetime.datetime.now()}] Job {job['job_id']} {summary['status']} in "
+                      f"{summary['seconds']:.1f}s ({summary['metric_logs']} metric logs).")
+            topic_category_cache.save()
+    finally:
+        stop_heartbeat.set()
+        heartbeat_thread.join()
+        state.update({'state': 'stopped', 'current_job': None})
+        queue.heartbeat(worker_id, **state)
+        queue.close()
+        print(f"[{datetime.datetime.now()}] Worker {worker_id} stopped: {state['jobs_done']} jobs done, "
+              f"{state['jobs_failed']} failed.")
+
+def main():
+    # Parse command-line arguments
+    global RATE_LIMIT_STATE_PATH, INFERENCE_BACKEND
+    args = parse_args()
+    RATE_LIMIT_STATE_PATH = args.rate_limit_state
+    INFERENCE_BACKEND = args.inference_backend
+    print(f"[{datetime.datetime.now()}] Arguments parsed.")
+
+    # Load the persistent topic -> category cache
+    topic_category_cache.load()
+    print(f"[{datetime.datetime.now()}] Topic category cache loaded ({len(topic_category_cache.entries)} entries).")
+
+    # Shared by every job: neither opens a connection until first used
+    ollama_pool = OllamaWorkerPool(
+        OLLAMA_MODEL,
+        host=OLLAMA_HOST,
+        concurrency=args.ollama_concurrency,
+        timeout=args.ollama_timeout,
+        max_retries=args.ollama_retries
+    )
+    llm_cache = None
+    if not args.no_llm_cache:
+        llm_cache = TopicExtractionCache(
+            LLM_CACHE_PATH, OLLAMA_MODEL, TOPIC_PROMPT_TEMPLATE, ttl_days=args.llm_cache_ttl_days
+        )
+    spool = StageSpool(':memory:' if args.no_spool else SPOOL_PATH)
+    seen_index = SeenSubmissionIndex(SEEN_INDEX_PATH)
+
+    try:
+        if args.worker:
+            run_worker(args, ollama_pool, llm_cache, spool, seen_index)
+        elif args.jobs_file or args.from_tracked_entities:
+            jobs = load_batch_jobs(args)
+            print(f"[{datetime.datetime.now()}] Batch mode: {len(jobs)} jobs loaded.")
+            run_batch(jobs, args, ollama_pool, llm_cache, spool, seen_index)
+        else:
+            run_job(args.entity_type, args.entity_name, args.date.strip(), args, ollama_pool, llm_cache, spool,
+                    seen_index)
+    finally:
+        if llm_cache is not None:
+            print(f"[{datetime.datetime.now()}] LLM extraction cache: {llm_cache.stats()}.")
+            llm_cache.close()
+        print(f"[{datetime.datetime.now()}] Stage spool: {spool.stats()}.")
+        spool.close()
+        seen_index.close()
+
+        # Save the updated topic -> category cache
+        topic_category_cache.save()
+        print(f"[{datetime.datetime.now()}] Topic category cache saved: {topic_category_cache.stats()}.")
+
+    print("\nDONE. Check MetricLog for aggregated topic/emotion rows.")
 
 
 # ---------------------------------------------------
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        report_run_stats()
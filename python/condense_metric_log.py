@@ -18,6 +18,8 @@ from mysql.connector import errorcode
 import argparse
 import logging
 import sys
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
@@ -27,6 +29,9 @@ from collections import Counter
 from dotenv import load_dotenv  # NEW: Import dotenv to load .env variables
 from pathlib import Path            # NEW: Import Path for path manipulations
 
+from embedding_store import EmbeddingStore
+from similarity_index import make_index, INDEX_TYPES, INDEX_EXACT, DEFAULT_NPROBE
+
 # ---------------------------------------------------
 # 0) Setup
 # ---------------------------------------------------
@@ -69,6 +74,15 @@ logger = logging.getLogger(__name__)
 # Similarity threshold for topic condensation
 SIMILARITY_THRESHOLD = 0.5  # Adjust as needed
 
+# Sentence transformer used to compare topics with CondensedTopics
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'  # Lightweight and efficient
+
+# Directory of the persistent CondensedTopic embedding store
+EMBEDDING_STORE_DIR = script_path.parent / 'condensed_embeddings'
+
+# Number of topics per batch when encoding topics with the sentence transformer
+ENCODE_BATCH_SIZE = 64
+
 # Predefined priority list for categories in case of a tie
 CATEGORY_PRIORITY = [
     "Customer Satisfaction",
@@ -88,6 +102,14 @@ def parse_arguments():
     parser = argparse.ArgumentParser(description="Condense MetricLog topics into MetricLogCondensed.")
     parser.add_argument('--setID', type=int, required=True, help='The setID of the TrackedEntity.')
     parser.add_argument('--date', type=str, required=True, help='The date in YYYY-MM-DD format.')
+    parser.add_argument('--embedding_store', type=str, default=str(EMBEDDING_STORE_DIR),
+                        help='Directory of the persistent CondensedTopic embedding store.')
+    parser.add_argument('--no_embedding_store', action='store_true',
+                        help='Re-encode every CondensedTopic instead of using the embedding store.')
+    parser.add_argument('--similarity_index', type=str, choices=INDEX_TYPES, default=INDEX_EXACT,
+                        help='Exact search, or an approximate IVF index for very many CondensedTopics.')
+    parser.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE,
+                        help=f'IVF clusters searched per topic (default: {DEFAULT_NPROBE}).')
     return parser.parse_args()
 
 def connect_to_db():
@@ -142,8 +164,13 @@ def fetch_metric_logs(conn, set_id, date_str):
     logger.info(f"Fetched {len(rows)} MetricLog entries for setID {set_id} on {date_str}.")
     return rows
 
-def fetch_existing_condensed_topics(conn, model):
-    """Fetch all existing CondensedTopics and compute their embeddings."""
+def fetch_existing_condensed_topics(conn, model, store=None):
+    """
+    Fetch all existing CondensedTopics and their embeddings.
+
+    With an EmbeddingStore, only CondensedTopics missing from the store are encoded (and added to it);
+    the returned dict is ordered like the rows of the returned embedding matrix.
+    """
     query = """
         SELECT condensedTopicID, condensedTopic FROM CondensedTopic
     """
@@ -151,6 +178,15 @@ def fetch_existing_condensed_topics(conn, model):
     cursor.execute(query)
     rows = cursor.fetchall()
     cursor.close()
+    if store is not None:
+        topics_by_id = {row['condensedTopicID']: row['condensedTopic'] for row in rows}
+        ids, embeddings = store.sync(
+            topics_by_id,
+            lambda texts: model.encode(texts, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True)
+        )
+        logger.info(f"Fetched {len(ids)} existing CondensedTopics; embedding store: {store.stats()}.")
+        return {condensed_id: topics_by_id[condensed_id] for condensed_id in ids}, embeddings
+
     topics = [row['condensedTopic'] for row in rows]
     ids = [row['condensedTopicID'] for row in rows]
     if topics:
@@ -160,19 +196,32 @@ def fetch_existing_condensed_topics(conn, model):
     logger.info(f"Fetched and embedded {len(topics)} existing CondensedTopics.")
     return dict(zip(ids, topics)), embeddings
 
-def compute_embedding(model, text):
-    """Compute the embedding for a given text."""
-    return model.encode([text], convert_to_tensor=True).cpu().detach().numpy()
+def encode_unique_topics(model, metric_logs):
+    """
+    Encode every distinct topic of the MetricLog entries in one batched call.
 
-def find_best_match(topic_embedding, condensed_embeddings, condensed_ids, threshold=SIMILARITY_THRESHOLD):
-    """Find the best matching condensedTopicID for a given topic embedding."""
-    if len(condensed_embeddings) == 0:
-        return None
-    similarities = cosine_similarity(topic_embedding, condensed_embeddings)[0]
-    best_idx = np.argmax(similarities)
-    best_score = similarities[best_idx]
-    if best_score >= threshold:
-        return condensed_ids[best_idx], best_score
+    Returns:
+        tuple: (list of unique topics in first-seen order, embedding matrix with one row per unique topic).
+    """
+    unique_topics = list(dict.fromkeys(log['topic'] for log in metric_logs))
+    embeddings = model.encode(unique_topics, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True)
+    logger.info(f"Encoded {len(unique_topics)} unique topics from {len(metric_logs)} MetricLog entries.")
+    return unique_topics, embeddings
+
+@contextmanager
+def timed_phase(timings, phase):
+    """Add the wall-clock time of the enclosed block to timings[phase]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+def find_best_match(topic_embedding, index, threshold=SIMILARITY_THRESHOLD):
+    """Find the best matching condensedTopicID for a given topic embedding in a similarity index."""
+    best_id, best_score = index.search(topic_embedding)
+    if best_id is not None and best_score >= threshold:
+        return best_id, best_score
     return None
 
 def create_condensed_topic(conn, topic, category):
@@ -338,61 +387,87 @@ def main():
 
     # Connect to database
     conn = connect_to_db()
+    # Seconds spent in each phase, logged at the end
+    timings = {}
 
     try:
         # Check for existing condensed entries
         check_existing_condensed(conn, set_id, date_str)
 
         # Fetch MetricLog entries
-        metric_logs = fetch_metric_logs(conn, set_id, date_str)
+        with timed_phase(timings, 'fetch'):
+            metric_logs = fetch_metric_logs(conn, set_id, date_str)
         if not metric_logs:
             logger.info("No MetricLog entries found for the given setID and date. Exiting.")
             sys.exit(0)
 
         # Load NLP model
         logger.info("Loading NLP model for sentence embeddings...")
-        model = SentenceTransformer('all-MiniLM-L6-v2')  # Lightweight and efficient
+        with timed_phase(timings, 'load model'):
+            model = SentenceTransformer(EMBEDDING_MODEL)
         logger.info("NLP model loaded.")
 
         # Fetch existing CondensedTopics and their embeddings
-        condensed_topics_dict, condensed_embeddings = fetch_existing_condensed_topics(conn, model)
-        condensed_ids = list(condensed_topics_dict.keys())
-
-        # Mapping from logID to condensedTopicID
-        condensed_mapping = {}
-
-        # Process each MetricLog entry
+        store = None if args.no_embedding_store else EmbeddingStore(args.embedding_store, EMBEDDING_MODEL)
+        with timed_phase(timings, 'existing topics'):
+            condensed_topics_dict, condensed_embeddings = fetch_existing_condensed_topics(conn, model, store)
+        # Similarity index over the CondensedTopics; new ones are added without copying the matrix
+        with timed_phase(timings, 'index'):
+            index = make_index(args.similarity_index, nprobe=args.nprobe)
+            if condensed_topics_dict:
+                index.add(list(condensed_topics_dict.keys()), condensed_embeddings)
+
+        # Many rows share a topic, so each distinct topic is embedded (and matched) once
+        with timed_phase(timings, 'encode'):
+            unique_topics, topic_embeddings = encode_unique_topics(model, metric_logs)
+
+        # The first row with a topic supplies the category of a new CondensedTopic
+        topic_categories = {}
         for log in metric_logs:
-            log_id = log['logID']
-            topic = log['topic']
-            category = log['category']
-            # Compute embedding for the topic
-            topic_embedding = compute_embedding(model, topic)
-            # Find best match
-            match = find_best_match(topic_embedding, condensed_embeddings, condensed_ids)
-            if match:
-                matched_id, score = match
-                condensed_mapping[log_id] = {'condensedTopicID': matched_id, 'score': score}
-                logger.debug(f"LogID {log_id}: Matched with CondensedTopicID {matched_id} (Score: {score:.2f})")
-            else:
-                # Create new CondensedTopic with the topic's category
-                new_condensed_id = create_condensed_topic(conn, topic, category)
-                # Update condensed_topics_dict and condensed_embeddings
-                condensed_topics_dict[new_condensed_id] = topic
-                # Compute and append new embedding
-                new_embedding = compute_embedding(model, topic)
-                if condensed_embeddings.size == 0:
-                    condensed_embeddings = new_embedding
+            topic_categories.setdefault(log['topic'], log['category'])
+
+        # Mapping from topic to condensedTopicID and match score
+        topic_matches = {}
+        # New CondensedTopics and their embeddings, added to the embedding store after matching
+        new_ids = []
+        new_embeddings = []
+
+        with timed_phase(timings, 'match'):
+            for topic, topic_embedding in zip(unique_topics, topic_embeddings):
+                # Find best match
+                match = find_best_match(topic_embedding, index)
+                if match:
+                    matched_id, score = match
+                    topic_matches[topic] = {'condensedTopicID': matched_id, 'score': score}
+                    logger.debug(f"Topic '{topic}': Matched with CondensedTopicID {matched_id} (Score: {score:.2f})")
                 else:
-                    condensed_embeddings = np.vstack([condensed_embeddings, new_embedding])
-                condensed_ids.append(new_condensed_id)
-                condensed_mapping[log_id] = {'condensedTopicID': new_condensed_id, 'score': None}
+                    # Create new CondensedTopic with the topic's category
+                    new_condensed_id = create_condensed_topic(conn, topic, topic_categories[topic])
+                    # Update condensed_topics_dict and the index, reusing the topic's embedding
+                    condensed_topics_dict[new_condensed_id] = topic
+                    index.add([new_condensed_id], topic_embedding)
+                    topic_matches[topic] = {'condensedTopicID': new_condensed_id, 'score': None}
+                    new_ids.append(new_condensed_id)
+                    new_embeddings.append(topic_embedding)
+
+        # If this run stops before here, the next run's sync() encodes the missing CondensedTopics
+        if store is not None and new_ids:
+            with timed_phase(timings, 'store'):
+                store.append(new_ids, np.vstack(new_embeddings))
+            logger.info(f"Added {len(new_ids)} new CondensedTopic embeddings to the store.")
+
+        # Mapping from logID to condensedTopicID
+        condensed_mapping = {log['logID']: topic_matches[log['topic']] for log in metric_logs}
 
         # Aggregate MetricLog entries
-        aggregation = aggregate_metric_logs(metric_logs, condensed_mapping)
+        with timed_phase(timings, 'aggregate'):
+            aggregation = aggregate_metric_logs(metric_logs, condensed_mapping)
 
         # Insert into MetricLogCondensed
-        insert_metric_log_condensed(conn, set_id, date_str, aggregation)
+        with timed_phase(timings, 'insert'):
+            insert_metric_log_condensed(conn, set_id, date_str, aggregation)
+
+        logger.info("Phase timings: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items()))
 
     finally:
         # Close the database connection
@@ -0,0 +1,242 @@
+"""
+dimension_resolver.py
+
+In-memory resolution of Topic, Adjective and TrackedEntity names to their IDs.
+
+Resolving names one at a time costs a SELECT (plus an UPDATE for topics) and a COMMIT per topic of
+every post. DimensionResolver instead preloads the name -> ID maps once, resolves a whole run's names
+from memory, inserts only the unseen ones in one batched INSERT ... ON DUPLICATE KEY UPDATE, updates a
+topic's category only when it actually changed, and commits once per batch.
+
+The maps are kept for the life of the process (a resident worker resolves many jobs with them), while
+the PHP site and other collectors keep adding rows. So names missing from the maps are looked up in the
+database before anything is inserted, and only names that are still missing are created.
+
+Names are matched case-insensitively and without trailing spaces, like MySQL's default collation.
+"""
+
+import mysql.connector
+
+# Maximum length of Topic.topic, Adjective.adjective and TrackedEntity.name
+MAX_NAME_LEN = 50
+
+# Rows per INSERT/SELECT statement when resolving large batches
+CHUNK_SIZE = 1000
+
+
+def _key(name):
+    return name.strip().lower()
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class DimensionResolver:
+    """
+    Caches dimension tables for one connection and resolves names to IDs in batches.
+
+    Args:
+        conn: A mysql.connector connection.
+        cursor: A cursor on that connection.
+    """
+
+    def __init__(self, conn, cursor):
+        self.conn = conn
+        self.cursor = cursor
+        self.topic_ids = {}         # normalised topic -> topicID
+        self.topic_categories = {}  # topicID -> category
+        self.topic_names = []       # every topic, in table order, then newly created ones
+        self.adjective_ids = {}     # normalised adjective -> adjectiveID
+        self.entity_ids = {}        # (entityType, normalised name) -> setID
+        self.inserted = 0
+        self.updated = 0
+
+    def preload(self):
+        """Loads the Topic, Adjective and TrackedEntity tables into memory."""
+        self.cursor.execute("SELECT topicID, topic, category FROM Topic")
+        for topic_id, topic, category in self.cursor.fetchall():
+            self.topic_ids.setdefault(_key(topic), topic_id)
+            self.topic_categories[topic_id] = category
+            self.topic_names.append(topic)
+
+        self.cursor.execute("SELECT adjectiveID, adjective FROM Adjective")
+        for adjective_id, adjective in self.cursor.fetchall():
+            self.adjective_ids.setdefault(_key(adjective), adjective_id)
+
+        self.cursor.execute("SELECT setID, entityType, name FROM TrackedEntity")
+        for set_id, entity_type, name in self.cursor.fetchall():
+            self.entity_ids.setdefault((entity_type.lower(), _key(name)), set_id)
+
+        print(f"Dimension cache loaded: {len(self.topic_ids)} topics, {len(self.adjective_ids)} adjectives, "
+              f"{len(self.entity_ids)} tracked entities.")
+        return self
+
+    def resolve_topics(self, topic_categories):
+        """
+        Resolves topics to topicIDs, creating missing topics and updating changed categories.
+
+        Args:
+            topic_categories (list): (topic, category) pairs. If a topic appears more than once,
+                the last category wins.
+
+        Returns:
+            dict: topic (as given) -> topicID, or None for empty/over-long topics.
+        """
+        wanted = {}  # normalised topic -> (topic, category)
+        result = {}
+        for topic, category in topic_categories:
+            stripped = topic.strip()
+            if not stripped:
+                result[topic] = None
+                continue
+            if len(stripped) > MAX_NAME_LEN:
+                print(f"Skipping topic '{stripped}' (exceeds {MAX_NAME_LEN} chars).")
+                result[topic] = None
+                continue
+            wanted[_key(stripped)] = (stripped, category)
+
+        # Topics created by someone else since the preload are picked up rather than duplicated
+        self._load_ids(
+            "SELECT topicID, topic, category FROM Topic WHERE topic IN ({placeholders})",
+            [name for key, (name, _) in wanted.items() if key not in self.topic_ids],
+            self._remember_topic
+        )
+
+        new_rows = [(name, category) for key, (name, category) in wanted.items() if key not in self.topic_ids]
+        changed_rows = [
+            (category, self.topic_ids[key])
+            for key, (_, category) in wanted.items()
+            if key in self.topic_ids and self.topic_categories.get(self.topic_ids[key]) != category
+        ]
+
+        if new_rows or changed_rows:
+            try:
+                for chunk in _chunks(new_rows):
+                    self._upsert(
+                        "INSERT INTO Topic (topic, category) VALUES {values} "
+                        "ON DUPLICATE KEY UPDATE category = VALUES(category)",
+                        chunk
+                    )
+                if changed_rows:
+                    self.cursor.executemany("UPDATE Topic SET category = %s WHERE topicID = %s", changed_rows)
+                self.conn.commit()
+            except mysql.connector.Error as err:
+                print(f"Error resolving topics: {err}")
+                self.conn.rollback()
+                raise
+
+            for category, topic_id in changed_rows:
+                self.topic_categories[topic_id] = category
+            self.updated += len(changed_rows)
+            self._load_ids(
+                "SELECT topicID, topic, category FROM Topic WHERE topic IN ({placeholders})",
+                [name for name, _ in new_rows],
+                self._remember_topic
+            )
+
+        for topic, category in topic_categories:
+            if topic not in result:
+                result[topic] = self.topic_ids.get(_key(topic))
+        return result
+
+    def resolve_adjectives(self, adjectives, sentiment_label="emotion"):
+        """
+        Resolves adjectives to adjectiveIDs, creating missing ones with the given sentiment label.
+
+        Returns:
+            dict: adjective (as given) -> adjectiveID, or None for empty/over-long adjectives.
+        """
+        result = {}
+        new_rows = {}
+        for adjective in adjectives:
+            stripped = adjective.strip()
+            if not stripped:
+                result[adjective] = None
+            elif len(stripped) > MAX_NAME_LEN:
+                print(f"Skipping adjective '{stripped}' (exceeds {MAX_NAME_LEN} characters).")
+                result[adjective] = None
+            elif _key(stripped) not in self.adjective_ids:
+                new_rows[_key(stripped)] = (stripped, sentiment_label)
+
+        # Adjectives created by someone else since the preload are picked up rather than duplicated
+        if new_rows:
+            self._load_ids(
+                "SELECT adjectiveID, adjective FROM Adjective WHERE adjective IN ({placeholders})",
+                [name for name, _ in new_rows.values()],
+                lambda row: self.adjective_ids.setdefault(_key(row[1]), row[0])
+            )
+            new_rows = {key: row for key, row in new_rows.items() if key not in self.adjective_ids}
+
+        if new_rows:
+            rows = list(new_rows.values())
+            try:
+                for chunk in _chunks(rows):
+                    self._upsert(
+                        "INSERT INTO Adjective (adjective, sentiment) VALUES {values} "
+                        "ON DUPLICATE KEY UPDATE adjectiveID = adjectiveID",
+                        chunk
+                    )
+                self.conn.commit()
+            except mysql.connector.Error as err:
+                print(f"Error resolving adjectives: {err}")
+                self.conn.rollback()
+                raise
+            self._load_ids(
+                "SELECT adjectiveID, adjective FROM Adjective WHERE adjective IN ({placeholders})",
+                [name for name, _ in rows],
+                lambda row: self.adjective_ids.setdefault(_key(row[1]), row[0])
+            )
+
+        for adjective in adjectives:
+            if adjective not in result:
+                result[adjective] = self.adjective_ids.get(_key(adjective))
+        return result
+
+    def resolve_tracked_entity(self, entity_type, entity_name):
+        """Returns the setID of a TrackedEntity, creating it if it does not exist."""
+        entity_name = entity_name[:MAX_NAME_LEN]
+        key = (entity_type.lower(), _key(entity_name))
+        if key in self.entity_ids:
+            return self.entity_ids[key]
+
+        # The entity may have been created (e.g. on the website) after the preload
+        self.cursor.execute(
+            "SELECT setID FROM TrackedEntity WHERE entityType = %s AND name = %s LIMIT 1",
+            (entity_type, entity_name)
+        )
+        row = self.cursor.fetchone()
+        if row:
+            self.entity_ids[key] = row[0]
+        else:
+            self.cursor.execute(
+                "INSERT INTO TrackedEntity (entityType, name) VALUES (%s, %s)", (entity_type, entity_name)
+            )
+            self.conn.commit()
+            self.entity_ids[key] = self.cursor.lastrowid
+            self.inserted += 1
+        return self.entity_ids[key]
+
+    def _upsert(self, query, rows):
+        placeholders = ", ".join(["(%s, %s)"] * len(rows))
+        params = [value for row in rows for value in row]
+        self.cursor.execute(query.format(values=placeholders), params)
+        self.inserted += len(rows)
+
+    def _load_ids(self, query, names, remember):
+        for chunk in _chunks(names):
+            placeholders = ", ".join(["%s"] * len(chunk))
+            self.cursor.execute(query.format(placeholders=placeholders), chunk)
+            for row in self.cursor.fetchall():
+                remember(row)
+
+    def _remember_topic(self, row):
+        topic_id, topic, category = row
+        if _key(topic) not in self.topic_ids:
+            self.topic_ids[_key(topic)] = topic_id
+            self.topic_names.append(topic)
+        self.topic_categories[topic_id] = category
+
+    def stats(self):
+        return f"{self.inserted} rows inserted, {self.updated} topic categories updated"
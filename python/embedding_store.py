@@ -0,0 +1,179 @@
+"""
+embedding_store.py
+
+Persistent on-disk store of CondensedTopic embeddings.
+
+condense_metric_log.py compares every topic against every CondensedTopic. Re-encoding all of them
+on every run costs more as the table grows, so their embeddings are kept on disk between runs. Each
+sentence transformer model gets its own directory, holding:
+  - embeddings.f32: a float32 matrix of shape (rows, dim), stored raw and row-major
+  - ids.i64: the condensedTopicID of each row, as int64
+  - meta.json: the model name, embedding dimension and file format version
+
+The matrix is memory-mapped when it is opened, so loading costs no copy and no encoding. New rows are
+appended to both files. Rows are written before their IDs, so after an interrupted append the store
+keeps the rows that have an ID and drops the rest. sync() is the consistency check: it encodes only
+the CondensedTopics that have no row yet.
+
+A store is meant to be written by one process at a time. Running condense_metric_log.py for several
+dates in sequence, as the README describes, satisfies this.
+"""
+
+import json
+import logging
+import re
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Version of the on-disk layout; a store with another version is rebuilt
+STORE_FORMAT = 1
+
+EMBEDDINGS_FILE = "embeddings.f32"
+IDS_FILE = "ids.i64"
+META_FILE = "meta.json"
+
+
+def model_slug(model_name):
+    """Turns a model name (which may contain '/') into a directory name."""
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', model_name)
+
+
+class EmbeddingStore:
+    """
+    Append-only store of embeddings keyed by integer ID, for one model.
+
+    Args:
+        directory (str): Parent directory; the store lives in a subdirectory named after the model.
+        model_name (str): Name (and, if it matters, version) of the model that produced the embeddings.
+            Embeddings from a different model are never mixed in.
+    """
+
+    def __init__(self, directory, model_name):
+        self.model_name = model_name
+        self.path = Path(directory) / model_slug(model_name)
+        self.dim = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.embeddings = np.empty((0, 0), dtype=np.float32)
+        self._positions = {}
+        self.appended = 0
+        self.encoded = 0
+        self._open()
+
+    def _open(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        meta_path = self.path / META_FILE
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+            if meta.get("format") != STORE_FORMAT or meta.get("model") != self.model_name:
+                logger.warning(f"Embedding store {self.path} was written by {meta}; rebuilding it.")
+                self._reset()
+                return
+            self.dim = meta["dim"]
+        self._load()
+
+    def _reset(self):
+        for name in (EMBEDDINGS_FILE, IDS_FILE, META_FILE):
+            (self.path / name).unlink(missing_ok=True)
+        self.dim = None
+        self._load()
+
+    def _load(self):
+        """Memory-maps the files, first trimming rows or IDs left over from an interrupted append."""
+        embeddings_path = self.path / EMBEDDINGS_FILE
+        ids_path = self.path / IDS_FILE
+        if self.dim is None or not embeddings_path.exists() or not ids_path.exists():
+            self.ids = np.empty(0, dtype=np.int64)
+            self.embeddings = np.empty((0, self.dim or 0), dtype=np.float32)
+            self._positions = {}
+            return
+
+        row_bytes = self.dim * 4
+        rows = min(embeddings_path.stat().st_size // row_bytes, ids_path.stat().st_size // 8)
+        for path, size in ((embeddings_path, rows * row_bytes), (ids_path, rows * 8)):
+            if path.stat().st_size != size:
+                logger.warning(f"Trimming {path} to {rows} rows after an interrupted append.")
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+        if rows == 0:
+            self.ids = np.empty(0, dtype=np.int64)
+            self.embeddings = np.empty((0, self.dim), dtype=np.float32)
+        else:
+            self.ids = np.fromfile(ids_path, dtype=np.int64)
+            self.embeddings = np.memmap(embeddings_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        self._positions = {int(item_id): pos for pos, item_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, item_id):
+        return item_id in self._positions
+
+    def missing(self, ids):
+        """Returns the IDs that have no stored embedding, in the given order."""
+        return [item_id for item_id in ids if item_id not in self._positions]
+
+    def append(self, ids, embeddings):
+        """
+        Appends embeddings for new IDs. IDs that are already stored are skipped.
+
+        Args:
+            ids (list): Integer IDs.
+            embeddings (array): Matrix with one row per ID.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        new = []
+        seen = set()
+        for pos, item_id in enumerate(ids):
+            # An ID repeated within one call is stored once
+            if item_id not in self._positions and item_id not in seen:
+                seen.add(item_id)
+                new.append(pos)
+        if not new:
+            return
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+            (self.path / META_FILE).write_text(json.dumps(
+                {"format": STORE_FORMAT, "model": self.model_name, "dim": self.dim}))
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {embeddings.shape[1]}.")
+
+        # Release the map before growing the file it maps
+        self.embeddings = None
+        # Rows first, then IDs: a row without an ID is dropped on the next load
+        with open(self.path / EMBEDDINGS_FILE, "ab") as f:
+            f.write(np.ascontiguousarray(embeddings[new]).tobytes())
+        with open(self.path / IDS_FILE, "ab") as f:
+            f.write(np.asarray([ids[pos] for pos in new], dtype=np.int64).tobytes())
+        self.appended += len(new)
+        self._load()
+
+    def sync(self, id_to_text, encode):
+        """
+        Makes sure every ID has an embedding, encoding only the missing ones.
+
+        Args:
+            id_to_text (dict): Every current ID and its text.
+            encode (callable): Maps a list of texts to a matrix with one embedding per text.
+
+        Returns:
+            tuple: (list of IDs, embedding matrix with one row per ID). If the store holds no other IDs,
+            the matrix is the memory map itself, in store order; otherwise only the rows of the given IDs
+            are copied out.
+        """
+        missing = self.missing(id_to_text)
+        if missing:
+            self.append(missing, encode([id_to_text[item_id] for item_id in missing]))
+            self.encoded += len(missing)
+        if len(self.ids) == len(id_to_text):
+            return [int(item_id) for item_id in self.ids], self.embeddings
+        # IDs that are no longer current (e.g. deleted CondensedTopics) are left out
+        ids = list(id_to_text)
+        return ids, np.asarray(self.embeddings[[self._positions[item_id] for item_id in ids]])
+
+    def stats(self):
+        return (f"{len(self)} embeddings of dimension {self.dim or 0} for {self.model_name}, "
+                f"{self.encoded} encoded and {self.appended} appended this run")
@@ -0,0 +1,165 @@
+"""
+emotion_windows.py
+
+Sliding-window emotion scoring of whole threads.
+
+The default emotion stage classifies the first EMOTION_MAX_CHARS characters of a thread, which on long
+threads is little more than the title. WindowedEmotionScorer instead tokenizes the full thread once,
+cuts the token IDs into overlapping windows that fit the model, and scores the windows of many threads
+together. Windows are sorted by length and packed into batches under a padded-token budget, so almost
+no compute is spent on padding. Each thread's label distribution is the mean of its windows' softmax
+scores, weighted by window length, and the scorer reports its cost per 1k tokens so the extra coverage
+can be budgeted.
+"""
+
+import time
+from dataclasses import dataclass
+
+# Default number of tokens per window, including the model's special tokens
+DEFAULT_WINDOW_TOKENS = 512
+
+# Default number of tokens shared by consecutive windows
+DEFAULT_WINDOW_OVERLAP = 64
+
+# Default maximum number of windows scored per thread (the rest of a very long thread is ignored)
+DEFAULT_MAX_WINDOWS = 32
+
+# Default budget of padded tokens per forward pass
+DEFAULT_BATCH_TOKENS = 8192
+
+
+def make_windows(token_ids, window_size, overlap=0, max_windows=None):
+    """
+    Splits token IDs into windows of at most window_size tokens, consecutive windows sharing `overlap`.
+
+    Returns:
+        list: The windows (lists of token IDs), in text order. An empty input gives no windows.
+    """
+    step = max(window_size - overlap, 1)
+    windows = []
+    for start in range(0, len(token_ids), step):
+        windows.append(token_ids[start:start + window_size])
+        if start + window_size >= len(token_ids):
+            break
+        if max_windows is not None and len(windows) >= max_windows:
+            break
+    return windows
+
+
+def pack_batches(lengths, max_batch_tokens, max_batch_size=None):
+    """
+    Groups items into length-sorted batches whose padded size (items x longest item) fits the budget.
+
+    Args:
+        lengths (list): Length of each item.
+        max_batch_tokens (int): Maximum padded tokens per batch. An item longer than this gets a batch of its own.
+        max_batch_size (int): Optional maximum number of items per batch.
+
+    Returns:
+        list: Batches, as lists of item indices.
+    """
+    order = sorted(range(len(lengths)), key=lambda idx: lengths[idx])
+    batches = []
+    batch = []
+    for idx in order:
+        # Items are sorted, so the new item is the longest of the batch
+        padded = lengths[idx] * (len(batch) + 1)
+        if batch and (padded > max_batch_tokens or (max_batch_size and len(batch) >= max_batch_size)):
+            batches.append(batch)
+            batch = []
+        batch.append(idx)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+@dataclass
+class WindowStats:
+    """Cost of one windowed scoring call."""
+    texts: int = 0
+    windows: int = 0
+    batches: int = 0
+    tokens: int = 0
+    padded_tokens: int = 0
+    seconds: float = 0.0
+
+    def summary(self):
+        per_1k = self.seconds / self.tokens * 1000 if self.tokens else 0.0
+        padding = (1 - self.tokens / self.padded_tokens) * 100 if self.padded_tokens else 0.0
+        return (f"{self.texts} texts, {self.windows} windows in {self.batches} batches, {self.tokens} tokens "
+                f"in {self.seconds:.2f}s ({per_1k * 1000:.1f} ms per 1k tokens, {padding:.1f}% padding)")
+
+
+class WindowedEmotionScorer:
+    """
+    Scores full texts with a sequence classification model through token windows.
+
+    Args:
+        tokenizer: A Hugging Face tokenizer.
+        model: A sequence classification model (PyTorch, quantized or ONNX Runtime) returning logits.
+        window_tokens (int): Tokens per window, including special tokens.
+        overlap (int): Tokens shared by consecutive windows.
+        max_windows (int): Maximum windows per text.
+        max_batch_tokens (int): Padded-token budget per forward pass.
+    """
+
+    def __init__(self, tokenizer, model, window_tokens=DEFAULT_WINDOW_TOKENS, overlap=DEFAULT_WINDOW_OVERLAP,
+                 max_windows=DEFAULT_MAX_WINDOWS, max_batch_tokens=DEFAULT_BATCH_TOKENS):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.content_tokens = window_tokens - tokenizer.num_special_tokens_to_add(pair=False)
+        self.overlap = min(overlap, self.content_tokens - 1)
+        self.max_windows = max_windows
+        self.max_batch_tokens = max_batch_tokens
+        self.labels = [model.config.id2label[i] for i in range(len(model.config.id2label))]
+
+    def score(self, texts):
+        """
+        Returns the emotion distribution of every text and the cost of computing them.
+
+        Returns:
+            tuple: (list of {label: score} dicts, or None for texts without tokens; WindowStats).
+        """
+        import torch
+
+        start = time.perf_counter()
+        stats = WindowStats(texts=len(texts))
+        encoded = self.tokenizer(list(texts), add_special_tokens=False, truncation=False)["input_ids"]
+
+        windows = []  # (text index, input IDs with special tokens)
+        for idx, token_ids in enumerate(encoded):
+            for window in make_windows(token_ids, self.content_tokens, self.overlap, self.max_windows):
+                windows.append((idx, self.tokenizer.build_inputs_with_special_tokens(window)))
+        stats.windows = len(windows)
+
+        sums = [None] * len(texts)
+        weights = [0] * len(texts)
+        pad_id = self.tokenizer.pad_token_id or 0
+        for batch in pack_batches([len(ids) for _, ids in windows], self.max_batch_tokens):
+            width = max(len(windows[w][1]) for w in batch)
+            input_ids = torch.full((len(batch), width), pad_id, dtype=torch.long)
+            attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+            for row, w in enumerate(batch):
+                ids = windows[w][1]
+                input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+                attention_mask[row, :len(ids)] = 1
+            with torch.no_grad():
+                logits = self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+            probs = torch.softmax(torch.as_tensor(logits, dtype=torch.float32), dim=-1)
+
+            for row, w in enumerate(batch):
+                idx, ids = windows[w]
+                # Longer windows carry more of the thread, so they weigh more
+                weighted = probs[row] * len(ids)
+                sums[idx] = weighted if sums[idx] is None else sums[idx] + weighted
+                weights[idx] += len(ids)
+            stats.batches += 1
+            stats.tokens += sum(len(windows[w][1]) for w in batch)
+            stats.padded_tokens += width * len(batch)
+
+        scores = [
+            None if total is None else dict(zip(self.labels, (total / weights[idx]).tolist()))
+            for idx, total in enumerate(sums)
+        ]
+        stats.seconds = time.perf_counter() - start
+        return scores, stats
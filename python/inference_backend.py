@@ -0,0 +1,97 @@
+"""
+inference_backend.py
+
+Selectable CPU inference backends for the collector's transformer classification pipelines.
+
+  torch  the Hugging Face model as published (fp32 PyTorch)
+  int8   the same model with every nn.Linear dynamically quantized to int8 (torch.quantization),
+         usually about 2x faster on CPU with a slightly smaller label agreement than fp32
+  onnx   the model exported to ONNX and run with ONNX Runtime (needs `pip install optimum[onnxruntime]`)
+
+ONNX exports are written once to a local cache directory and reused on later runs. Dynamic
+quantization only takes a few seconds and is applied at load time. Every backend returns an ordinary
+transformers pipeline, so callers do not change. If onnxruntime/optimum are not installed, the onnx
+backend falls back to torch with a warning.
+
+Use benchmarks/bench_inference_backends.py to check that a backend's labels agree with torch and to
+measure its throughput.
+"""
+
+import re
+from pathlib import Path
+
+BACKEND_TORCH = "torch"
+BACKEND_INT8 = "int8"
+BACKEND_ONNX = "onnx"
+BACKENDS = [BACKEND_TORCH, BACKEND_INT8, BACKEND_ONNX]
+
+# Default directory for exported ONNX models
+DEFAULT_EXPORT_DIR = Path(__file__).resolve().parent / "model_exports"
+
+
+def _export_path(export_dir, model_name):
+    return Path(export_dir) / re.sub(r'[^A-Za-z0-9_.-]', '__', model_name) / BACKEND_ONNX
+
+
+def _load_onnx_model(model_name, export_dir):
+    """Loads the ONNX export of a model, exporting and caching it first if needed."""
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+
+    path = _export_path(export_dir, model_name)
+    if (path / "model.onnx").exists():
+        return ORTModelForSequenceClassification.from_pretrained(path)
+    print(f"Exporting '{model_name}' to ONNX in {path} (first use only)...")
+    model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+    model.save_pretrained(path)
+    return model
+
+
+def load_sequence_classifier(model_name, backend=BACKEND_TORCH, export_dir=DEFAULT_EXPORT_DIR):
+    """
+    Loads a sequence classification model for the given backend.
+
+    Args:
+        model_name (str): Hugging Face model name.
+        backend (str): One of BACKENDS.
+        export_dir (str): Where ONNX exports are cached.
+
+    Returns:
+        tuple: (model, tokenizer, backend actually used).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}'. Valid: {BACKENDS}")
+
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if backend == BACKEND_ONNX:
+        try:
+            return _load_onnx_model(model_name, export_dir), tokenizer, BACKEND_ONNX
+        except ImportError:
+            print("ONNX backend needs `pip install optimum[onnxruntime]`; falling back to torch.")
+            backend = BACKEND_TORCH
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    if backend == BACKEND_INT8:
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model, tokenizer, backend
+
+
+def load_pipeline(task, model_name, backend=BACKEND_TORCH, export_dir=DEFAULT_EXPORT_DIR, **pipeline_kwargs):
+    """
+    Returns a transformers pipeline for task backed by the chosen inference backend.
+
+    Args:
+        task (str): Pipeline task, e.g. "text-classification" or "zero-shot-classification".
+        model_name (str): Hugging Face model name.
+        backend (str): One of BACKENDS.
+        export_dir (str): Where ONNX exports are cached.
+        **pipeline_kwargs: Passed to transformers.pipeline (e.g. top_k=None).
+    """
+    from transformers import pipeline
+
+    model, tokenizer, used = load_sequence_classifier(model_name, backend, export_dir)
+    print(f"Loaded '{model_name}' for {task} with the {used} backend.")
+    return pipeline(task, model=model, tokenizer=tokenizer, **pipeline_kwargs)
@@ -0,0 +1,240 @@
+"""
+job_queue.py
+
+Local SQLite job queue for the resident collector worker (collect-reddit-data.py --worker).
+
+Jobs are (entity_type, entity_name, date) collections, the same as the collector's batch mode. Any
+process can enqueue one with a single INSERT, so adding work costs milliseconds: the worker already
+has its models and connections loaded. Workers claim jobs atomically, record a heartbeat while they
+run, and a job whose worker stops heartbeating is put back on the queue.
+
+This module only needs the standard library, so it can also be used from the command line:
+
+    python job_queue.py enqueue --entity_type Organisation --entity_name "Tesla" --date 2025-01-31
+    python job_queue.py status
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Default location of the queue, next to the collector
+DEFAULT_QUEUE_PATH = Path(__file__).resolve().parent / 'collector_queue.sqlite3'
+
+# Seconds between worker heartbeats
+HEARTBEAT_INTERVAL = 15
+
+# A worker that has not heartbeated for this many seconds is considered dead
+WORKER_LEASE_SECONDS = 120
+
+# Default number of attempts before a failing job is left as failed
+DEFAULT_MAX_ATTEMPTS = 3
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Queue of collector jobs shared by every process that opens the same SQLite file.
+
+    Args:
+        filepath (str): Path of the SQLite database file.
+        max_attempts (int): Attempts before a failing job is marked failed instead of requeued.
+    """
+
+    def __init__(self, filepath=DEFAULT_QUEUE_PATH, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.filepath = Path(filepath)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.filepath), timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS job (
+                job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                entity_type TEXT NOT NULL,
+                entity_name TEXT NOT NULL,
+                date TEXT NOT NULL DEFAULT '',
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker_id TEXT,
+                enqueued_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                result TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_job_status ON job (status, job_id)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS worker (
+                worker_id TEXT PRIMARY KEY,
+                pid INTEGER NOT NULL,
+                host TEXT NOT NULL,
+                state TEXT NOT NULL,
+                current_job INTEGER,
+                jobs_done INTEGER NOT NULL DEFAULT 0,
+                jobs_failed INTEGER NOT NULL DEFAULT 0,
+                started_at REAL NOT NULL,
+                heartbeat_at REAL NOT NULL
+            )
+        """)
+
+    def enqueue(self, entity_type, entity_name, date_str=""):
+        """Adds a job and returns its job_id."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO job (entity_type, entity_name, date, enqueued_at) VALUES (?, ?, ?, ?)",
+                (entity_type, entity_name, date_str or "", time.time())
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker_id):
+        """
+        Atomically takes the oldest queued job for a worker.
+
+        Returns:
+            dict: The job (job_id, entity_type, entity_name, date, attempts), or None if the queue is empty.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT job_id, entity_type, entity_name, date, attempts FROM job "
+                    "WHERE status = ? ORDER BY job_id LIMIT 1",
+                    (STATUS_QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE job SET status = ?, attempts = attempts + 1, worker_id = ?, started_at = ? "
+                        "WHERE job_id = ?",
+                        (STATUS_RUNNING, worker_id, time.time(), row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job_id, entity_type, entity_name, date_str, attempts = row
+        return {'job_id': job_id, 'entity_type': entity_type, 'entity_name': entity_name,
+                'date': date_str, 'attempts': attempts + 1}
+
+    def finish(self, job_id, result):
+        """Marks a job done, storing its summary dict."""
+        self._set_finished(job_id, STATUS_DONE, result)
+
+    def fail(self, job_id, error):
+        """Requeues a failed job, or marks it failed once it has used max_attempts."""
+        with self._lock:
+            attempts = self._conn.execute("SELECT attempts FROM job WHERE job_id = ?", (job_id,)).fetchone()[0]
+        if attempts < self.max_attempts:
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE job SET status = ?, worker_id = NULL, result = ? WHERE job_id = ?",
+                    (STATUS_QUEUED, json.dumps({'error': str(error)}), job_id)
+                )
+        else:
+            self._set_finished(job_id, STATUS_FAILED, {'error': str(error)})
+
+    def _set_finished(self, job_id, status, result):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE job SET status = ?, finished_at = ?, result = ? WHERE job_id = ?",
+                (status, time.time(), json.dumps(result, default=str), job_id)
+            )
+
+    def register_worker(self, worker_id):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO worker (worker_id, pid, host, state, started_at, heartbeat_at) "
+                "VALUES (?, ?, ?, 'starting', ?, ?)",
+                (worker_id, os.getpid(), socket.gethostname(), now, now)
+            )
+
+    def heartbeat(self, worker_id, state, current_job=None, jobs_done=0, jobs_failed=0):
+        """Records that a worker is alive, what it is doing and how many jobs it has run."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE worker SET state = ?, current_job = ?, jobs_done = ?, jobs_failed = ?, heartbeat_at = ? "
+                "WHERE worker_id = ?",
+                (state, current_job, jobs_done, jobs_failed, time.time(), worker_id)
+            )
+
+    def requeue_abandoned(self, lease_seconds=WORKER_LEASE_SECONDS):
+        """
+        Puts back on the queue every running job whose worker stopped heartbeating (e.g. was killed).
+
+        Returns:
+            int: The number of jobs requeued.
+        """
+        cutoff = time.time() - lease_seconds
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE job SET status = ?, worker_id = NULL WHERE status = ? AND worker_id NOT IN "
+                "(SELECT worker_id FROM worker WHERE heartbeat_at >= ? AND state != 'stopped')",
+                (STATUS_QUEUED, STATUS_RUNNING, cutoff)
+            )
+            return cursor.rowcount
+
+    def status(self):
+        """Returns job counts per status and the state of every known worker."""
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM job GROUP BY status").fetchall())
+            workers = self._conn.execute(
+                "SELECT worker_id, pid, host, state, current_job, jobs_done, jobs_failed, started_at, heartbeat_at "
+                "FROM worker ORDER BY started_at"
+            ).fetchall()
+        return {
+            'jobs': {status: counts.get(status, 0)
+                     for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED)},
+            'workers': [
+                {
+                    'worker_id': worker_id, 'pid': pid, 'host': host, 'state': state,
+                    'current_job': current_job, 'jobs_done': done, 'jobs_failed': failed,
+                    'uptime_seconds': round(now - started_at, 1),
+                    'seconds_since_heartbeat': round(now - heartbeat_at, 1),
+                }
+                for worker_id, pid, host, state, current_job, done, failed, started_at, heartbeat_at in workers
+            ],
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enqueue collector jobs or show the queue status.")
+    parser.add_argument('--queue_path', type=str, default=str(DEFAULT_QUEUE_PATH),
+                        help="SQLite file holding the job queue")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    enqueue_parser = subparsers.add_parser('enqueue', help="Add a collection job")
+    enqueue_parser.add_argument('--entity_type', type=str, required=True)
+    enqueue_parser.add_argument('--entity_name', type=str, required=True)
+    enqueue_parser.add_argument('--date', type=str, default="", help="YYYY-MM-DD (default: last 24 hours)")
+    subparsers.add_parser('status', help="Print job counts and worker health as JSON")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.queue_path)
+    try:
+        if args.command == 'enqueue':
+            job_id = queue.enqueue(args.entity_type, args.entity_name, args.date.strip())
+            print(json.dumps({'job_id': job_id}))
+        else:
+            print(json.dumps(queue.status(), indent=2))
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+llm_cache.py
+
+Content-addressed on-disk cache of LLM topic extraction results.
+
+Entries are keyed by a SHA-256 of the prompt template, the model name and the thread text, so
+re-running the collector over the same date and entity never sends identical text back through
+the LLM. Each entry stores the raw model response and the cleaned topic list (before matching
+against the Topic table, which changes between runs).
+
+Entries expire after a TTL, the table is trimmed least-recently-used first to a maximum size, and
+entries produced by a different model or prompt template are purged when the cache is opened.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Default time-to-live of a cached extraction, in days
+DEFAULT_TTL_DAYS = 30
+
+# Default upper bound on the number of cached extractions
+DEFAULT_MAX_ENTRIES = 100000
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")  # Separator so ("ab", "c") and ("a", "bc") differ
+    return digest.hexdigest()
+
+
+class TopicExtractionCache:
+    """
+    SQLite-backed cache of topic extraction results for one model and prompt template.
+
+    Safe to share between the threads of the Ollama worker pool.
+
+    Args:
+        filepath (str): Path of the SQLite database file.
+        model (str): The LLM model name.
+        prompt_template (str): The prompt template the text is interpolated into.
+        ttl_days (float): Entries older than this are ignored and evicted.
+        max_entries (int): Maximum number of entries kept.
+    """
+
+    def __init__(self, filepath, model, prompt_template, ttl_days=DEFAULT_TTL_DAYS,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.filepath = Path(filepath)
+        self.model = model
+        self.prompt_hash = _sha256(prompt_template)
+        self.ttl_seconds = ttl_days * 86400
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.filepath), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS topic_extraction (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                raw_response TEXT NOT NULL,
+                topics TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_topic_extraction_last_used ON topic_extraction (last_used)"
+        )
+        self._conn.commit()
+        self.invalidate_stale()
+        self.evict()
+
+    def key_for(self, text):
+        return _sha256(self.prompt_hash, self.model, text)
+
+    def get(self, text):
+        """
+        Returns the cached topic list for text, or None on a miss or expired entry.
+        """
+        key = self.key_for(text)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT topics FROM topic_extraction WHERE cache_key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE topic_extraction SET last_used = ? WHERE cache_key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, text, raw_response, topics):
+        """Stores the raw response and cleaned topic list for text."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO topic_extraction
+                (cache_key, model, prompt_hash, raw_response, topics, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (self.key_for(text), self.model, self.prompt_hash, raw_response,
+                 json.dumps(topics), now, now)
+            )
+            self._conn.commit()
+
+    def invalidate_stale(self):
+        """Deletes entries produced by a different model or prompt template. Returns the number deleted."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM topic_extraction WHERE model != ? OR prompt_hash != ?",
+                (self.model, self.prompt_hash)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def evict(self):
+        """Deletes expired entries, then the least recently used beyond max_entries. Returns the number deleted."""
+        with self._lock:
+            expired = self._conn.execute(
+                "DELETE FROM topic_extraction WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,)
+            ).rowcount
+            overflow = self._conn.execute(
+                """
+                DELETE FROM topic_extraction WHERE cache_key IN (
+                    SELECT cache_key FROM topic_extraction
+                    ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            ).rowcount
+            self._conn.commit()
+            return expired + overflow
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM topic_extraction")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = (self.hits / lookups * 100) if lookups else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)"
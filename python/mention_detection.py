@@ -0,0 +1,109 @@
+"""
+mention_detection.py
+
+Batched detection of meaningful organisation mentions in Reddit posts.
+
+OrganisationMentionDetector applies the collector's three-tier check to many posts at once:
+  1. A regex requiring every token of the organisation name, as whole words, in order.
+  2. spaCy NER: an ORG/GPE entity whose token_sort_ratio against the name is above 80.
+  3. A sentence whose token_sort_ratio against the name is above 80 and that contains both a verb
+     and a noun.
+
+The regex is compiled once per organisation. Each tier only sees the posts that earlier tiers did not
+accept, and runs through nlp.pipe with batching and only the spaCy components it needs (NER for tier 2,
+the tagger for tier 3). The spaCy model and sentence tokenizer are only requested if a post reaches
+the tier that needs them. Results are identical to running the tiers one post at a time.
+"""
+
+import re
+
+from rapidfuzz.fuzz import token_sort_ratio
+
+# Score an entity or sentence must exceed to count as a mention
+MENTION_THRESHOLD = 80
+
+# Default number of texts per nlp.pipe batch
+DEFAULT_BATCH_SIZE = 64
+
+ENTITY_LABELS = ("ORG", "GPE")
+
+
+def _components_for(nlp, targets):
+    """Returns the pipeline components to disable so only `targets` (and what they listen to) run."""
+    keep = set(targets)
+    for name in nlp.pipe_names:
+        component = nlp.get_pipe(name)
+        # A shared tok2vec must stay enabled if any kept component listens to it
+        if set(getattr(component, "listening_components", []) or []) & set(targets):
+            keep.add(name)
+    return [name for name in nlp.pipe_names if name not in keep]
+
+
+class OrganisationMentionDetector:
+    """
+    Decides whether posts mention an organisation in a meaningful way.
+
+    Args:
+        organisation_name (str): The organisation (or industry) name.
+        get_nlp (callable): Returns the loaded spaCy pipeline; only called if tier 2 is reached.
+        get_sent_tokenize (callable): Returns a sentence tokenizer; only called if tier 3 is reached.
+        batch_size (int): Texts per nlp.pipe batch.
+    """
+
+    def __init__(self, organisation_name, get_nlp, get_sent_tokenize, batch_size=DEFAULT_BATCH_SIZE):
+        self.org_lower = organisation_name.lower()
+        self.get_nlp = get_nlp
+        self.get_sent_tokenize = get_sent_tokenize
+        self.batch_size = batch_size
+
+        # 1. Regex-based whole-word matching for all tokens of the name
+        org_tokens = self.org_lower.split()
+        self.pattern = re.compile(r'\b' + r'\b.*\b'.join(re.escape(token) for token in org_tokens) + r'\b')
+
+    def is_mentioned(self, text):
+        return self.detect_many([text])[0]
+
+    def detect_many(self, texts):
+        """
+        Returns, for each text, whether it meaningfully mentions the organisation.
+        """
+        mentioned = [bool(self.pattern.search(text.lower())) for text in texts]
+        pending = [idx for idx, found in enumerate(mentioned) if not found]
+        if not pending:
+            return mentioned
+
+        # 2. spaCy NER (only the NER component runs) with fuzzy matching against the name
+        nlp = self.get_nlp()
+        ner_disabled = _components_for(nlp, ["ner"])
+        docs = nlp.pipe((texts[idx] for idx in pending), batch_size=self.batch_size, disable=ner_disabled)
+        still_pending = []
+        for idx, doc in zip(pending, docs):
+            if any(ent.label_ in ENTITY_LABELS and token_sort_ratio(self.org_lower, ent.text.lower()) > MENTION_THRESHOLD
+                   for ent in doc.ents):
+                mentioned[idx] = True
+            else:
+                still_pending.append(idx)
+        if not still_pending:
+            return mentioned
+
+        # 3. Sentences that fuzzy-match the name must contain a verb and a noun (tagger only)
+        sent_tokenize = self.get_sent_tokenize()
+        candidates = []  # (text index, sentence)
+        for idx in still_pending:
+            for sentence in sent_tokenize(texts[idx]):
+                if token_sort_ratio(self.org_lower, sentence.lower()) > MENTION_THRESHOLD:
+                    candidates.append((idx, sentence))
+        if not candidates:
+            return mentioned
+
+        pos_targets = [name for name in ("tagger", "morphologizer", "attribute_ruler") if name in nlp.pipe_names]
+        pos_disabled = _components_for(nlp, pos_targets)
+        docs = nlp.pipe((sentence for _, sentence in candidates), batch_size=self.batch_size, disable=pos_disabled)
+        for (idx, _), doc in zip(candidates, docs):
+            if mentioned[idx]:
+                continue
+            has_verb = any(token.pos_ == "VERB" for token in doc)
+            has_noun = any(token.pos_ == "NOUN" for token in doc)
+            if has_verb and has_noun:
+                mentioned[idx] = True
+        return mentioned
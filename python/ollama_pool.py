@@ -0,0 +1,351 @@
+"""
+ollama_pool.py
+
+Bounded, concurrent client for Ollama generate calls.
+
+Each generate call blocks for seconds while the LLM server works, so the collector keeps several
+requests in flight at once. The pool caps the number of concurrent requests (across every thread that
+uses it, including nested fan-outs such as chunked prompts), applies a per-request timeout, retries
+transient failures with exponential backoff and returns results in input order.
+
+generate_streaming() streams a response instead: it parses DeepSeek-R1's <think> block as tokens
+arrive, stops the request once a think-token or wall-clock budget is spent or as soon as the answer
+line is complete, and records time to first answer token and tokens generated per request.
+
+The server address defaults to the OLLAMA_HOST environment variable (as the ollama library does),
+so the pool can be pointed at a local fake server for testing and benchmarking.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ollama
+
+# Default number of generate requests kept in flight at once
+DEFAULT_CONCURRENCY = 4
+
+# Default per-request timeout in seconds (DeepSeek-R1 can think for a long time)
+DEFAULT_TIMEOUT = 300.0
+
+# Default number of retries after the first failed attempt
+DEFAULT_MAX_RETRIES = 2
+
+# Base delay in seconds for exponential backoff between retries
+DEFAULT_BACKOFF = 1.0
+
+# Weight of the newest request in the moving average of latency
+LATENCY_EWMA_ALPHA = 0.3
+
+# Default maximum number of tokens a streamed request may spend inside its <think> block
+DEFAULT_MAX_THINK_TOKENS = 1024
+
+# Default wall-clock budget in seconds of one streamed request
+DEFAULT_STREAM_DEADLINE = 120.0
+
+# Maximum answer tokens of the no-thinking request sent after the think budget is exhausted
+FALLBACK_MAX_TOKENS = 128
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+CUTOFF_COMPLETE = "complete"           # Stopped early: the answer line was finished
+CUTOFF_THINK_BUDGET = "think_budget"   # Stopped inside the <think> block
+CUTOFF_DEADLINE = "deadline"           # Stopped by the wall-clock budget
+CUTOFF_NONE = "none"                   # The model finished on its own
+
+
+def is_retryable(error):
+    """Client errors (bad request, unknown model) are permanent; everything else may be transient."""
+    if isinstance(error, ollama.ResponseError):
+        status = getattr(error, "status_code", None)
+        return status is None or status == 429 or status >= 500
+    return True
+
+
+class ThinkStreamParser:
+    """
+    Incrementally splits a streamed DeepSeek-R1 response into its <think> block and its answer.
+
+    Thinking may arrive inline in the response text (between <think> tags) or, on Ollama versions that
+    separate it, in the chunks' `thinking` field; both are counted as think tokens.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.thinking_tokens = 0
+        self.answer_tokens = 0
+        self._state = "start"      # start -> think -> answer, or start -> answer
+        self._answer_start = 0
+        self._search_from = 0      # Where to look for </think> next
+
+    def feed(self, text, thinking=""):
+        """Adds one streamed chunk (usually one token)."""
+        if thinking:
+            self.thinking_tokens += 1
+        if not text:
+            return
+        self.text += text
+
+        if self._state == "start":
+            head = self.text.lstrip()
+            if not head or THINK_OPEN.startswith(head):
+                return  # Could still be the start of "<think>"
+            if head.startswith(THINK_OPEN):
+                self._state = "think"
+            else:
+                self._state = "answer"
+                self._answer_start = len(self.text) - len(head)
+
+        if self._state == "think":
+            self.thinking_tokens += 1
+            close = self.text.find(THINK_CLOSE, self._search_from)
+            if close == -1:
+                self._search_from = max(0, len(self.text) - len(THINK_CLOSE))
+                return
+            self._state = "answer"
+            self._answer_start = close + len(THINK_CLOSE)
+        elif self._state == "answer":
+            self.answer_tokens += 1
+
+    def in_think(self):
+        return self._state == "think"
+
+    def answer(self):
+        """Returns the answer text received so far (everything after the think block)."""
+        if self._state != "answer":
+            return ""
+        return self.text[self._answer_start:].lstrip()
+
+    def answer_line(self):
+        """Returns the first line of the answer once it is terminated by a newline, else None."""
+        answer = self.answer()
+        if "\n" not in answer:
+            return None
+        return answer.split("\n", 1)[0].strip()
+
+
+class OllamaWorkerPool:
+    """
+    Runs Ollama generate requests on a bounded thread pool.
+
+    Args:
+        model (str): The Ollama model name.
+        host (str): Ollama server URL; None uses OLLAMA_HOST or the library default.
+        concurrency (int): Maximum number of requests in flight.
+        timeout (float): Per-request timeout in seconds.
+        max_retries (int): Retries after the first failed attempt.
+        backoff (float): Base delay for exponential backoff between retries.
+    """
+
+    def __init__(self, model, host=None, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF):
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.client = ollama.Client(host=host, timeout=timeout)
+
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self._recent_latency = None
+        self._last_recorded = 0.0  # time.monotonic() of the last finished request or claimed probe
+        self.streamed = 0
+        self.total_tokens = 0
+        self.total_first_token = 0.0
+        self.first_token_count = 0
+        self.cutoffs = {}
+        # Bounds in-flight requests even when several map() calls run at once
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+
+    def generate(self, prompt, **options):
+        """
+        Sends one generate request, retrying transient failures with exponential backoff.
+
+        Returns:
+            str: The model's response text.
+
+        Raises:
+            The last error if every attempt fails.
+        """
+        return self.generate_detailed(prompt, **options)["response"]
+
+    def generate_detailed(self, prompt, **options):
+        """
+        Like generate(), but also returns Ollama's token counts and the request latency.
+
+        Returns:
+            dict: response (str), prompt_eval_count and eval_count (int or None), latency (seconds).
+        """
+        def _request():
+            response = self.client.generate(model=self.model, prompt=prompt, **options)
+            return {
+                "response": response["response"],
+                "prompt_eval_count": response.get("prompt_eval_count"),
+                "eval_count": response.get("eval_count"),
+            }
+        return self._with_retries(_request)
+
+    def generate_streaming(self, prompt, max_think_tokens=DEFAULT_MAX_THINK_TOKENS,
+                           deadline=DEFAULT_STREAM_DEADLINE, stop_after_answer_line=True, **options):
+        """
+        Streams one generate request, cutting it off early where possible.
+
+        Generation stops (and the connection is closed, which makes Ollama abandon the request) when:
+          - the answer's first line is complete (a comma-separated topic list ends at a newline),
+          - more than max_think_tokens tokens are spent inside <think>: the request is then re-sent
+            once with thinking disabled and at most FALLBACK_MAX_TOKENS answer tokens,
+          - the wall-clock deadline passes: the topics that arrived complete are returned, i.e. the
+            answer up to its last comma; a topic still being streamed (or a lone, unfinished one) is
+            dropped rather than returned truncated.
+
+        Returns:
+            dict: Like generate_detailed() (token counts are None when the stream was stopped before
+            Ollama reported them), with the answer (without the think block) as response, plus
+            think_tokens, tokens (all tokens received), first_token (seconds to the first answer token,
+            or None) and cutoff (one of the CUTOFF_* values).
+        """
+        def _request():
+            start = time.perf_counter()
+            parser = ThinkStreamParser()
+            first_token = None
+            cutoff = CUTOFF_NONE
+            # Only the final chunk carries Ollama's counts; a stream stopped early reports None
+            counts = {"prompt_eval_count": None, "eval_count": None}
+            stream = self.client.generate(model=self.model, prompt=prompt, stream=True, **options)
+            try:
+                for chunk in stream:
+                    parser.feed(chunk.get("response") or "", chunk.get("thinking") or "")
+                    if first_token is None and parser.answer():
+                        first_token = time.perf_counter() - start
+                    if chunk.get("done"):
+                        counts = {"prompt_eval_count": chunk.get("prompt_eval_count"),
+                                  "eval_count": chunk.get("eval_count")}
+                        break
+                    if stop_after_answer_line and parser.answer_line():
+                        cutoff = CUTOFF_COMPLETE
+                        break
+                    if (max_think_tokens is not None and parser.thinking_tokens > max_think_tokens
+                            and not parser.answer()):
+                        cutoff = CUTOFF_THINK_BUDGET
+                        break
+                    if deadline is not None and time.perf_counter() - start > deadline:
+                        cutoff = CUTOFF_DEADLINE
+                        break
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+
+            answer = parser.answer_line() or parser.answer().strip()
+            if cutoff == CUTOFF_DEADLINE and parser.answer_line() is None:
+                # Only topics followed by a comma are known to be complete
+                answer = answer.rpartition(",")[0].strip()
+            tokens = parser.thinking_tokens + parser.answer_tokens
+            if cutoff == CUTOFF_THINK_BUDGET:
+                fallback_options = dict(options.get("options") or {}, num_predict=FALLBACK_MAX_TOKENS)
+                response = self.client.generate(model=self.model, prompt=prompt, think=False,
+                                                **dict(options, options=fallback_options))
+                answer = response["response"].split(THINK_CLOSE)[-1].strip().split("\n", 1)[0].strip()
+                tokens += response.get("eval_count") or 0
+                counts = {"prompt_eval_count": response.get("prompt_eval_count"),
+                          "eval_count": response.get("eval_count")}
+                if first_token is None and answer:
+                    first_token = time.perf_counter() - start
+
+            self._record_stream(tokens, first_token, cutoff)
+            return dict(counts, response=answer, think_tokens=parser.thinking_tokens, tokens=tokens,
+                        first_token=first_token, cutoff=cutoff)
+        return self._with_retries(_request)
+
+    def _with_retries(self, request):
+        """Runs request() in a concurrency slot, retrying transient failures, and adds its latency."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._slots:
+                    # Latency excludes time spent waiting for a free slot
+                    start = time.perf_counter()
+                    try:
+                        result = request()
+                    finally:
+                        latency = time.perf_counter() - start
+                        self._record(latency)
+                result["latency"] = latency
+                return result
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    with self._stats_lock:
+                        self.failures += 1
+                    raise
+                delay = self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+                print(f"Ollama request failed ({e}); retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 2}/{self.max_retries + 1}).")
+                with self._stats_lock:
+                    self.retries += 1
+                time.sleep(delay)
+
+    def map(self, fn, items):
+        """
+        Applies fn to every item with at most `concurrency` calls running at once.
+
+        Returns:
+            list: fn(item) for each item, in the same order as items.
+        """
+        items = list(items)
+        if self.concurrency == 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(items))) as executor:
+            return list(executor.map(fn, items))
+
+    def _record(self, latency):
+        with self._stats_lock:
+            self.requests += 1
+            self.total_latency += latency
+            self._last_recorded = time.monotonic()
+            if self._recent_latency is None:
+                self._recent_latency = latency
+            else:
+                self._recent_latency += LATENCY_EWMA_ALPHA * (latency - self._recent_latency)
+
+    def _record_stream(self, tokens, first_token, cutoff):
+        with self._stats_lock:
+            self.streamed += 1
+            self.total_tokens += tokens
+            if first_token is not None:
+                self.total_first_token += first_token
+                self.first_token_count += 1
+            self.cutoffs[cutoff] = self.cutoffs.get(cutoff, 0) + 1
+
+    def recent_latency(self):
+        """Returns an exponential moving average of recent request latencies in seconds, or None before any request."""
+        with self._stats_lock:
+            return self._recent_latency
+
+    def claim_probe(self, interval):
+        """
+        Returns True if no request has finished, and no probe been claimed, for `interval` seconds.
+
+        Callers that route work away from the pool while its latency is too high use this to let one
+        request through now and then, so recent_latency() keeps tracking the server.
+        """
+        with self._stats_lock:
+            now = time.monotonic()
+            if now - self._last_recorded < interval:
+                return False
+            self._last_recorded = now
+            return True
+
+    def stats(self):
+        avg = (self.total_latency / self.requests) if self.requests else 0.0
+        summary = (f"{self.requests} requests, {self.retries} retries, {self.failures} failures, "
+                   f"avg latency {avg:.2f}s at concurrency {self.concurrency}")
+        if self.streamed:
+            avg_first = (self.total_first_token / self.first_token_count) if self.first_token_count else 0.0
+            cutoffs = ", ".join(f"{name} {count}" for name, count in sorted(self.cutoffs.items()))
+            summary += (f"; streamed {self.streamed}: avg {self.total_tokens / self.streamed:.0f} tokens, "
+                        f"avg time to first topic {avg_first:.2f}s, stops: {cutoffs}")
+        return summary
@@ -0,0 +1,96 @@
+"""
+prompt_chunking.py
+
+Helpers for map-reduce topic extraction over long threads.
+
+A whole thread in one prompt can exceed the model's context window, and prompt processing time grows
+with its length. split_into_chunks() cuts a thread into chunks that fit a token budget, at sentence
+boundaries where possible, so each chunk can be sent to the LLM on its own (the map step).
+merge_topics() is the cheap reduce step: it merges the chunks' topic lists without another LLM call,
+dropping near-duplicate topics and ranking topics found in more chunks first.
+
+Token counts are estimated from character counts (about 4 characters per token for English text),
+since the DeepSeek tokenizer is not available locally. Ollama reports exact prompt token counts in
+its responses, which the collector logs for tuning.
+"""
+
+import re
+
+from rapidfuzz.fuzz import token_sort_ratio
+
+# Average characters per token used to estimate prompt sizes
+CHARS_PER_TOKEN = 4
+
+# Default maximum estimated tokens of thread text per chunk
+DEFAULT_CHUNK_TOKENS = 1500
+
+# Topics at least this similar (token_sort_ratio) are merged into one
+DUPLICATE_THRESHOLD = 90
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_into_chunks(text, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """
+    Splits text into chunks of at most max_tokens estimated tokens.
+
+    Sentences are kept whole when they fit; a sentence longer than a chunk is split at whitespace
+    (or, failing that, hard-split).
+
+    Returns:
+        list: The chunks, in text order. Text that fits in one chunk is returned unchanged.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def merge_topics(topic_lists, threshold=DUPLICATE_THRESHOLD):
+    """
+    Merges the topic lists of a thread's chunks into one deduplicated list.
+
+    Topics that match case-insensitively, or whose token_sort_ratio is at least threshold, count as
+    one topic (spelled as first seen). Topics found in more chunks come first; ties keep first-seen order.
+
+    Returns:
+        list: The merged topics.
+    """
+    merged = []   # [topic, lowercased topic, number of chunks]
+    for topics in topic_lists:
+        seen_in_chunk = set()
+        for topic in topics:
+            lowered = topic.lower()
+            for pos, (_, existing, _) in enumerate(merged):
+                if lowered == existing or token_sort_ratio(lowered, existing) >= threshold:
+                    break
+            else:
+                pos = len(merged)
+                merged.append([topic, lowered, 0])
+            if pos not in seen_in_chunk:
+                seen_in_chunk.add(pos)
+                merged[pos][2] += 1
+    order = sorted(range(len(merged)), key=lambda pos: (-merged[pos][2], pos))
+    return [merged[pos][0] for pos in order]
@@ -0,0 +1,151 @@
+"""
+rate_limiter.py
+
+Token-bucket rate limiter for Reddit API requests.
+
+The limiter is thread-safe and can optionally keep its bucket in a small SQLite file, so several
+collector processes on one machine share a single request budget. It adapts its refill rate to the
+X-Ratelimit-Remaining / X-Ratelimit-Reset headers Reddit returns on every response.
+
+make_rate_limited_requestor() wraps prawcore's Requestor so every HTTP request PRAW makes (search
+pages, submission fetches, "load more comments" expansions, token refreshes) waits for a token.
+"""
+
+import sqlite3
+import threading
+import time
+
+# Reddit allows 100 OAuth requests per minute per client
+DEFAULT_RATE = 100 / 60.0
+
+# Maximum burst of back-to-back requests
+DEFAULT_CAPACITY = 10
+
+
+class TokenBucketRateLimiter:
+    """
+    Blocks callers so that requests never exceed the configured (or server-reported) rate.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum tokens the bucket holds (the allowed burst).
+        state_path (str): Optional SQLite file shared by every process using the same path.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=DEFAULT_CAPACITY, state_path=None):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._conn = None
+        self._tokens = capacity
+        self._rate = rate
+        self._updated_at = time.time()
+        self.total_wait = 0.0
+        self.requests = 0
+
+        if state_path:
+            self._conn = sqlite3.connect(str(state_path), timeout=30, check_same_thread=False,
+                                         isolation_level=None)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS bucket (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    tokens REAL NOT NULL,
+                    rate REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO bucket (id, tokens, rate, updated_at) VALUES (1, ?, ?, ?)",
+                (capacity, rate, time.time())
+            )
+
+    # State is read and written inside one transaction when shared through SQLite
+    def _begin(self):
+        if self._conn is not None:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._tokens, self._rate, self._updated_at = self._conn.execute(
+                "SELECT tokens, rate, updated_at FROM bucket WHERE id = 1"
+            ).fetchone()
+
+    def _commit(self):
+        if self._conn is not None:
+            self._conn.execute(
+                "UPDATE bucket SET tokens = ?, rate = ?, updated_at = ? WHERE id = 1",
+                (self._tokens, self._rate, self._updated_at)
+            )
+            self._conn.execute("COMMIT")
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._updated_at)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self._rate)
+        self._updated_at = now
+
+    def _try_take(self, tokens):
+        """Takes tokens if available. Returns 0, or the seconds to wait before trying again."""
+        with self._lock:
+            self._begin()
+            try:
+                self._refill(time.time())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    wait = 0.0
+                else:
+                    wait = (tokens - self._tokens) / self._rate
+            finally:
+                self._commit()
+        return wait
+
+    def acquire(self, tokens=1):
+        """Blocks until tokens are available, then takes them."""
+        while True:
+            wait = self._try_take(tokens)
+            if wait <= 0:
+                with self._lock:
+                    self.requests += 1
+                return
+            if wait > 1:
+                print(f"Rate limit approached, sleeping for {wait:.2f} seconds.")
+            with self._lock:
+                self.total_wait += wait
+            time.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """
+        Adapts the bucket to Reddit's X-Ratelimit-Remaining/-Reset response headers.
+
+        The refill rate becomes the remaining requests spread over the seconds until the window
+        resets, and the bucket never holds more tokens than the server says remain.
+        """
+        try:
+            remaining = float(headers["x-ratelimit-remaining"])
+            reset = float(headers["x-ratelimit-reset"])
+        except (KeyError, TypeError, ValueError):
+            return  # e.g. token requests, which carry no rate-limit headers
+        with self._lock:
+            self._begin()
+            try:
+                self._refill(time.time())
+                self._rate = max(remaining, 1.0) / max(reset, 1.0)
+                self._tokens = min(self._tokens, remaining)
+            finally:
+                self._commit()
+
+    def stats(self):
+        return f"{self.requests} requests, {self.total_wait:.1f}s spent waiting, current rate {self._rate * 60:.0f}/min"
+
+
+def make_rate_limited_requestor(limiter):
+    """
+    Returns a prawcore Requestor subclass that routes every request through the limiter.
+
+    Pass it to praw.Reddit(requestor_class=...).
+    """
+    import prawcore
+
+    class RateLimitedRequestor(prawcore.Requestor):
+        def request(self, *args, **kwargs):
+            limiter.acquire()
+            response = super().request(*args, **kwargs)
+            limiter.update_from_headers(response.headers)
+            return response
+
+    return RateLimitedRequestor
@@ -0,0 +1,230 @@
+"""
+reddit_fetch.py
+
+Bounded, streaming retrieval of Reddit thread text.
+
+Expanding a thread with submission.comments.replace_more(limit=None) costs one API request per
+"load more comments" link, which means hundreds of sequential requests and a very large string on
+viral threads. iter_thread_text() instead walks the comment tree best-first (by score or by depth),
+expands "load more" links only while a request budget remains, and yields text piece by piece
+until a comment or byte budget is reached, so per-thread latency and memory are capped and callers
+can stop consuming early. fetch_threads() runs that for several submissions at once.
+"""
+
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# Default maximum number of comments read per thread
+DEFAULT_MAX_COMMENTS = 500
+
+# Default maximum number of bytes of text (title, body and comments) read per thread
+DEFAULT_MAX_BYTES = 200000
+
+# Default maximum number of API requests spent expanding "load more comments" links per thread
+DEFAULT_MAX_REQUESTS = 32
+
+RANK_BY_SCORE = "score"
+RANK_BY_DEPTH = "depth"
+
+
+@dataclass
+class FetchBudget:
+    """Per-thread limits on how much of a comment tree is read. None disables a limit."""
+    max_comments: int = DEFAULT_MAX_COMMENTS
+    max_bytes: int = DEFAULT_MAX_BYTES
+    max_requests: int = DEFAULT_MAX_REQUESTS
+    rank: str = RANK_BY_SCORE
+
+
+def _is_more_comments(item):
+    # Avoids importing praw here so the module can be driven by stub objects
+    return type(item).__name__ == "MoreComments"
+
+
+def iter_thread_text(submission, budget=None, on_request=None):
+    """
+    Yields the text of a thread incrementally: the title, the body, then comment bodies
+    best-first, until the budget is exhausted or the tree is fully read.
+
+    Comments are ranked by score (highest first) or by depth (top-level first, then by score).
+    Already-loaded comments are always read before a "load more comments" link is expanded.
+
+    Args:
+        submission: A praw Submission.
+        budget (FetchBudget): Limits on comments, bytes and expansion requests.
+        on_request (callable): Called before every API request this function triggers,
+            e.g. to apply rate limiting.
+
+    Yields:
+        str: The title, the body, then one comment body at a time.
+    """
+    budget = budget or FetchBudget()
+    remaining_bytes = budget.max_bytes
+
+    def _take(text):
+        nonlocal remaining_bytes
+        if remaining_bytes is None:
+            return text
+        encoded = text.encode("utf-8")[:max(remaining_bytes, 0)]
+        remaining_bytes -= len(encoded)
+        return encoded.decode("utf-8", errors="ignore")
+
+    for text in (submission.title or "", submission.selftext or ""):
+        yield _take(text)
+        if remaining_bytes is not None and remaining_bytes <= 0:
+            return
+
+    if budget.max_comments == 0:
+        return
+
+    # Accessing .comments on a lazily loaded submission fetches it (one request)
+    if on_request is not None and not getattr(submission, "_fetched", True):
+        on_request()
+    forest = submission.comments
+
+    counter = itertools.count()  # Tie-breaker so the heap never compares comment objects
+
+    def _priority(item, depth):
+        if _is_more_comments(item):
+            # Expand "load more" links only once every loaded comment has been read
+            return (1, depth, -getattr(item, "count", 0), next(counter))
+        score = getattr(item, "score", 0) or 0
+        if budget.rank == RANK_BY_DEPTH:
+            return (0, depth, -score, next(counter))
+        return (0, -score, depth, next(counter))
+
+    heap = []
+    for item in forest:
+        heapq.heappush(heap, (_priority(item, 0), 0, item))
+
+    comments_read = 0
+    requests_made = 0
+    while heap:
+        _, depth, item = heapq.heappop(heap)
+
+        if _is_more_comments(item):
+            if budget.max_requests is not None and requests_made >= budget.max_requests:
+                continue
+            if on_request is not None:
+                on_request()
+            requests_made += 1
+            for child in item.comments():
+                heapq.heappush(heap, (_priority(child, depth), depth, child))
+            continue
+
+        yield _take(item.body or "")
+        comments_read += 1
+        if budget.max_comments is not None and comments_read >= budget.max_comments:
+            return
+        if remaining_bytes is not None and remaining_bytes <= 0:
+            return
+
+        for reply in getattr(item, "replies", None) or []:
+            heapq.heappush(heap, (_priority(reply, depth + 1), depth + 1, reply))
+
+
+# Default number of submissions whose comment trees are fetched concurrently
+DEFAULT_FETCH_WORKERS = 4
+
+
+@dataclass
+class FetchResult:
+    """Outcome of fetching one thread: its text, how long it took, and the error if it failed."""
+    text: str
+    latency: float
+    error: Exception = None
+
+
+def fetch_threads(submissions, budget=None, workers=DEFAULT_FETCH_WORKERS, on_request=None):
+    """
+    Fetches the text of several threads concurrently on a thread pool.
+
+    Network round-trips dominate each fetch, so overlapping them cuts the stage's latency from the
+    sum of all threads to roughly the slowest few. Requests still go through PRAW's (shared)
+    rate-limited requestor, so the global rate limit holds.
+
+    Args:
+        submissions (list): praw Submissions.
+        budget (FetchBudget): Per-thread limits, see iter_thread_text().
+        workers (int): Maximum number of threads fetched at once.
+        on_request (callable): Passed through to iter_thread_text().
+
+    Returns:
+        list: A FetchResult per submission, in submission order. A failed fetch has empty text.
+    """
+    def _fetch(submission):
+        start = time.perf_counter()
+        try:
+            text = " ".join(iter_thread_text(submission, budget, on_request=on_request))
+            return FetchResult(text, time.perf_counter() - start)
+        except Exception as e:
+            return FetchResult("", time.perf_counter() - start, e)
+
+    submissions = list(submissions)
+    if workers <= 1 or len(submissions) <= 1:
+        return [_fetch(submission) for submission in submissions]
+    with ThreadPoolExecutor(max_workers=min(workers, len(submissions))) as executor:
+        return list(executor.map(_fetch, submissions))
+
+
+# Default maximum number of search results scanned per query (Reddit listings stop at about 1000)
+DEFAULT_MAX_SCANNED = 1000
+
+
+@dataclass
+class WindowScan:
+    """Counts for one date-window search: results fetched from Reddit, results in the window, results kept."""
+    fetched: int = 0
+    in_window: int = 0
+    kept: int = 0
+    stopped_early: bool = False
+    hit_limit: bool = False
+
+    def summary(self):
+        if self.stopped_early:
+            reason = "reached posts older than the window"
+        elif self.hit_limit:
+            reason = "reached the post limit"
+        else:
+            reason = "search results exhausted"
+        return (f"{self.fetched} results fetched, {self.in_window} in window, {self.kept} kept "
+                f"({reason})")
+
+
+def iter_date_window(listing, start_ts, end_ts, max_results=None, scan=None):
+    """
+    Yields the submissions of a newest-first listing whose created_utc falls in [start_ts, end_ts).
+
+    PRAW listings fetch one page (up to 100 results) at a time as they are iterated, so stopping
+    here stops paging: posts newer than the window are skipped without being kept, and iteration
+    ends at the first post older than start_ts, or once max_results posts in the window were yielded.
+
+    Args:
+        listing: Iterable of submissions sorted by 'new', e.g. subreddit.search(..., sort='new', limit=None).
+        start_ts (float): Window start, as a UTC timestamp (inclusive).
+        end_ts (float): Window end, as a UTC timestamp (exclusive).
+        max_results (int): Maximum number of in-window submissions to yield. None means no limit.
+        scan (WindowScan): Optional counters, updated as the listing is consumed.
+
+    Yields:
+        Submissions inside the window, newest first.
+    """
+    scan = scan if scan is not None else WindowScan()
+    if max_results is not None and max_results <= 0:
+        return
+    for submission in listing:
+        scan.fetched += 1
+        created = submission.created_utc
+        if created >= end_ts:
+            continue
+        if created < start_ts:
+            scan.stopped_early = True
+            return
+        scan.in_window += 1
+        yield submission
+        if max_results is not None and scan.in_window >= max_results:
+            scan.hit_limit = True
+            return
@@ -0,0 +1,114 @@
+"""
+seen_index.py
+
+Persistent index of the Reddit submissions the collector has already processed, per tracked entity.
+
+Without it, overlapping runs (the same entity collected twice, or a re-run after a partial failure)
+re-fetch every comment tree, re-run the LLM and insert duplicate MetricLog rows. Each entry records a
+watermark of the thread (its comment count and edit time, both present in search results, so checking
+it costs no API request) and the (topicID, adjectiveID) pairs already logged for it. A thread whose
+watermark is unchanged is skipped outright; a changed thread is processed again, but only pairs it has
+not logged before become new MetricLog rows.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+def entity_key(entity_type, entity_name):
+    """Returns the index key of a tracked entity, e.g. 'organisation/tesla'."""
+    return f"{entity_type.lower()}/{entity_name.strip().lower()}"
+
+
+def watermark(num_comments, edited):
+    """Normalises a submission's num_comments and edited (False or a timestamp) into a comparable pair."""
+    return int(num_comments or 0), float(edited or 0)
+
+
+class SeenEntry:
+    """What the index knows about one processed submission."""
+
+    def __init__(self, num_comments, edited, logged):
+        self.watermark = (num_comments, edited)
+        self.logged = {tuple(pair) for pair in logged}
+
+    def is_current(self, num_comments, edited):
+        """Returns True if the thread has neither new comments nor a newer edit since it was processed."""
+        seen_comments, seen_edited = self.watermark
+        current_comments, current_edited = watermark(num_comments, edited)
+        return current_comments <= seen_comments and current_edited <= seen_edited
+
+
+class SeenSubmissionIndex:
+    """
+    SQLite-backed index of processed submissions, keyed by entity key and submission ID.
+
+    Args:
+        filepath (str): Path of the SQLite database file.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = Path(filepath)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.filepath), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen_submission (
+                entity_key TEXT NOT NULL,
+                submission_id TEXT NOT NULL,
+                num_comments INTEGER NOT NULL,
+                edited REAL NOT NULL,
+                logged TEXT NOT NULL,
+                processed_at REAL NOT NULL,
+                PRIMARY KEY (entity_key, submission_id)
+            )
+        """)
+        self._conn.commit()
+
+    def lookup(self, key, submission_ids):
+        """
+        Returns {submission_id: SeenEntry} for the given submissions that were processed for the entity.
+        """
+        submission_ids = list(submission_ids)
+        entries = {}
+        with self._lock:
+            for start in range(0, len(submission_ids), 500):
+                chunk = submission_ids[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT submission_id, num_comments, edited, logged FROM seen_submission "
+                    f"WHERE entity_key = ? AND submission_id IN ({placeholders})",
+                    [key] + chunk
+                ).fetchall()
+                for submission_id, num_comments, edited, logged in rows:
+                    entries[submission_id] = SeenEntry(num_comments, edited, json.loads(logged))
+        return entries
+
+    def record(self, key, processed):
+        """
+        Records processed submissions.
+
+        Args:
+            key (str): The entity key, see entity_key().
+            processed (list): (submission_id, num_comments, edited, logged pairs) tuples. The logged
+                pairs should include those logged by earlier runs.
+        """
+        now = time.time()
+        rows = [
+            (key, submission_id, *watermark(num_comments, edited), json.dumps(sorted(logged)), now)
+            for submission_id, num_comments, edited, logged in processed
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO seen_submission "
+                "(entity_key, submission_id, num_comments, edited, logged, processed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
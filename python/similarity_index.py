@@ -0,0 +1,229 @@
+"""
+similarity_index.py
+
+Cosine-similarity indexes for matching topic embeddings against CondensedTopics.
+
+Vectors are L2-normalised when added, so cosine similarity is a dot product. They are kept in a
+preallocated float32 matrix that doubles its capacity when full, so adding a CondensedTopic does not
+copy the whole matrix the way np.vstack does.
+
+Two indexes share that interface:
+  - ExactIndex scans every vector. It is the baseline and gives the same matches as
+    sklearn's cosine_similarity.
+  - IVFIndex is an approximate inverted-file index. Spherical k-means splits the vectors into about
+    sqrt(n) clusters, and a query is only compared with the vectors of its nprobe nearest clusters.
+    New vectors join their nearest cluster, and the clusters are retrained whenever the index has
+    doubled in size since it was last trained. Below min_train_size vectors it searches exactly.
+
+benchmarks/bench_similarity_index.py measures the recall and latency of IVFIndex against ExactIndex.
+"""
+
+import math
+
+import numpy as np
+
+INDEX_EXACT = "exact"
+INDEX_IVF = "ivf"
+INDEX_TYPES = [INDEX_EXACT, INDEX_IVF]
+
+# Initial number of rows allocated for vectors
+DEFAULT_CAPACITY = 1024
+
+# Default number of IVF clusters searched per query
+DEFAULT_NPROBE = 8
+
+# IVF indexes smaller than this are searched exactly
+DEFAULT_MIN_TRAIN_SIZE = 2048
+
+# Spherical k-means iterations when (re)training an IVF index
+KMEANS_ITERATIONS = 10
+
+# Maximum training sample per cluster, to bound k-means time on large indexes
+KMEANS_SAMPLE_PER_CLUSTER = 256
+
+# Rows per block when assigning many vectors to clusters
+ASSIGN_BLOCK_ROWS = 65536
+
+
+def l2_normalize(vectors):
+    """Returns float32 copies of the row vectors scaled to unit length (zero rows stay zero)."""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class ExactIndex:
+    """
+    Exact cosine-similarity search over a growable matrix of normalised vectors.
+
+    Args:
+        dim (int): Vector dimension; None takes it from the first vectors added.
+        capacity (int): Initial number of rows allocated.
+    """
+
+    def __init__(self, dim=None, capacity=DEFAULT_CAPACITY):
+        self.dim = dim
+        self.ids = []
+        self.size = 0
+        self._capacity = max(1, capacity)
+        self._matrix = None if dim is None else np.empty((self._capacity, dim), dtype=np.float32)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def vectors(self):
+        """The normalised vectors, one row per ID (a view, not a copy)."""
+        if self._matrix is None:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return self._matrix[:self.size]
+
+    def _reserve(self, rows):
+        if self._matrix is None:
+            self._matrix = np.empty((max(self._capacity, rows), self.dim), dtype=np.float32)
+        elif rows > len(self._matrix):
+            # Doubling keeps the cost of growing amortised O(1) per vector
+            grown = np.empty((max(rows, 2 * len(self._matrix)), self.dim), dtype=np.float32)
+            grown[:self.size] = self._matrix[:self.size]
+            self._matrix = grown
+
+    def add(self, ids, vectors):
+        """
+        Adds vectors under the given IDs.
+
+        Returns:
+            int: Row position of the first added vector.
+        """
+        vectors = l2_normalize(vectors)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"Expected {len(ids)} vectors of dimension {self.dim}, got shape {vectors.shape}.")
+        start = self.size
+        self._reserve(start + len(ids))
+        self._matrix[start:start + len(ids)] = vectors
+        self.ids.extend(ids)
+        self.size += len(ids)
+        return start
+
+    def search(self, vector):
+        """
+        Finds the most similar vector.
+
+        Returns:
+            tuple: (ID, cosine similarity), or (None, -1.0) if the index is empty.
+        """
+        if self.size == 0:
+            return None, -1.0
+        scores = self.vectors @ l2_normalize(vector)[0]
+        best = int(np.argmax(scores))
+        return self.ids[best], float(scores[best])
+
+    def search_many(self, vectors):
+        """Returns search() results for each row vector."""
+        if self.size == 0:
+            return [(None, -1.0)] * len(vectors)
+        scores = l2_normalize(vectors) @ self.vectors.T
+        best = np.argmax(scores, axis=1)
+        return [(self.ids[pos], float(scores[row, pos])) for row, pos in enumerate(best)]
+
+
+class IVFIndex(ExactIndex):
+    """
+    Approximate cosine-similarity search with an inverted-file (IVF) index.
+
+    Args:
+        dim (int): Vector dimension; None takes it from the first vectors added.
+        nlist (int): Number of clusters; None uses about sqrt(n) at each training.
+        nprobe (int): Clusters searched per query. More is slower and closer to exact.
+        min_train_size (int): Vectors needed before clustering; smaller indexes are searched exactly.
+        seed (int): Seed of the k-means initialisation.
+    """
+
+    def __init__(self, dim=None, nlist=None, nprobe=DEFAULT_NPROBE, min_train_size=DEFAULT_MIN_TRAIN_SIZE,
+                 capacity=DEFAULT_CAPACITY, seed=0):
+        super().__init__(dim, capacity)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = max(1, min_train_size)
+        self.centroids = None
+        self.trained_size = 0
+        self.trainings = 0
+        self._lists = []          # Row positions per cluster
+        self._list_arrays = []    # Cached np.array of each list, None after an insert
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, ids, vectors):
+        start = super().add(ids, vectors)
+        if self.size >= self.min_train_size and self.size >= 2 * self.trained_size:
+            self.train()
+        elif self.centroids is not None:
+            self._insert(np.arange(start, self.size))
+        return start
+
+    def train(self):
+        """Clusters all vectors with spherical k-means and rebuilds the inverted lists."""
+        vectors = self.vectors
+        nlist = min(self.nlist or max(1, int(math.sqrt(self.size))), self.size)
+        sample_size = min(self.size, nlist * KMEANS_SAMPLE_PER_CLUSTER)
+        sample = vectors[self._rng.choice(self.size, sample_size, replace=False)]
+        centroids = sample[self._rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~sums.any(axis=1)
+            # An empty cluster keeps its centroid rather than collapsing to zero
+            sums[empty] = centroids[empty]
+            centroids = l2_normalize(sums)
+
+        self.centroids = centroids
+        self.trained_size = self.size
+        self.trainings += 1
+        self._lists = [[] for _ in range(nlist)]
+        self._list_arrays = [None] * nlist
+        self._insert(np.arange(self.size))
+
+    def _insert(self, positions):
+        for block in range(0, len(positions), ASSIGN_BLOCK_ROWS):
+            rows = positions[block:block + ASSIGN_BLOCK_ROWS]
+            for pos, cluster in zip(rows.tolist(), np.argmax(self._matrix[rows] @ self.centroids.T, axis=1).tolist()):
+                self._lists[cluster].append(pos)
+                self._list_arrays[cluster] = None
+
+    def _candidates(self, query):
+        cluster_scores = self.centroids @ query
+        nprobe = min(self.nprobe, len(cluster_scores))
+        probe = np.argpartition(-cluster_scores, nprobe - 1)[:nprobe]
+        arrays = []
+        for cluster in probe:
+            if self._list_arrays[cluster] is None:
+                self._list_arrays[cluster] = np.array(self._lists[cluster], dtype=np.int64)
+            arrays.append(self._list_arrays[cluster])
+        return np.concatenate(arrays)
+
+    def search(self, vector):
+        if self.centroids is None:
+            return super().search(vector)
+        query = l2_normalize(vector)[0]
+        candidates = self._candidates(query)
+        if len(candidates) == 0:
+            return None, -1.0
+        scores = self._matrix[candidates] @ query
+        best = int(np.argmax(scores))
+        return self.ids[candidates[best]], float(scores[best])
+
+    def search_many(self, vectors):
+        if self.centroids is None:
+            return super().search_many(vectors)
+        return [self.search(vector) for vector in vectors]
+
+
+def make_index(kind=INDEX_EXACT, dim=None, **options):
+    """Creates an empty index of the given kind (one of INDEX_TYPES); options only apply to IVFIndex."""
+    if kind == INDEX_EXACT:
+        return ExactIndex(dim)
+    if kind == INDEX_IVF:
+        return IVFIndex(dim, **options)
+    raise ValueError(f"Unknown similarity index '{kind}'; expected one of {INDEX_TYPES}.")
@@ -0,0 +1,158 @@
+"""
+stage_spool.py
+
+Local checkpoint spool for the collector's pipeline stages.
+
+The collector used to keep every intermediate result in memory until the final MetricLog insert, so a
+crash during topic extraction lost the Reddit fetches and every LLM call made so far. StageSpool
+records each stage's output as soon as it is produced, keyed by run ID, stage and submission ID:
+
+  search      the in-window submissions kept by search_posts (one entry per run)
+  thread      the fetched title, URL and thread text of a submission
+  emotion     the thread's overall emotion label
+  topics      the topics DeepSeek extracted from the thread
+  categories  the (topic, category) pairs of the thread
+
+A run resumed with the same run ID reloads what is already spooled and only redoes the missing
+work. Once its MetricLog rows are inserted the run is marked complete and its stage entries are
+dropped, so the spool only holds unfinished work.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+STAGE_SEARCH = "search"
+STAGE_THREAD = "thread"
+STAGE_EMOTION = "emotion"
+STAGE_TOPICS = "topics"
+STAGE_CATEGORIES = "categories"
+
+STATUS_RUNNING = "running"
+STATUS_COMPLETE = "complete"
+
+
+def make_run_id(entity_type, entity_name, date_str):
+    """Returns the run ID of one collector job, e.g. 'organisation/Tesla/2025-01-31'."""
+    return f"{entity_type.lower()}/{entity_name.strip()}/{date_str}"
+
+
+class StageSpool:
+    """
+    SQLite-backed store of per-stage, per-submission results.
+
+    Safe to share between the threads of the fetch and Ollama worker pools.
+
+    Args:
+        filepath (str): Path of the SQLite database file. ':memory:' keeps a spool that lives only as
+            long as the process (nothing can be resumed).
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.reused = 0
+        self.written = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(filepath), check_same_thread=False)
+        if str(filepath) != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS spool_run (
+                run_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                metric_logs INTEGER
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS spool_item (
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (run_id, stage, item_id)
+            )
+        """)
+        self._conn.commit()
+
+    def is_complete(self, run_id):
+        """Returns True if the run already inserted its MetricLog rows."""
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM spool_run WHERE run_id = ?", (run_id,)).fetchone()
+        return row is not None and row[0] == STATUS_COMPLETE
+
+    def begin(self, run_id, resume=False):
+        """
+        Starts (or restarts) a run.
+
+        Args:
+            run_id (str): The run ID, see make_run_id().
+            resume (bool): Keep the run's spooled results instead of discarding them.
+
+        Returns:
+            int: The number of spooled results kept for the run.
+        """
+        with self._lock:
+            if not resume:
+                self._conn.execute("DELETE FROM spool_item WHERE run_id = ?", (run_id,))
+            self._conn.execute(
+                """
+                INSERT INTO spool_run (run_id, status, started_at) VALUES (?, ?, ?)
+                ON CONFLICT (run_id) DO UPDATE SET status = excluded.status, started_at = excluded.started_at,
+                    finished_at = NULL, metric_logs = NULL
+                """,
+                (run_id, STATUS_RUNNING, time.time())
+            )
+            self._conn.commit()
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM spool_item WHERE run_id = ?", (run_id,)
+            ).fetchone()[0]
+
+    def load(self, run_id, stage):
+        """Returns {item_id: payload} for everything spooled for a stage of a run."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_id, payload FROM spool_item WHERE run_id = ? AND stage = ?", (run_id, stage)
+            ).fetchall()
+            self.reused += len(rows)
+        return {item_id: json.loads(payload) for item_id, payload in rows}
+
+    def put(self, run_id, stage, item_id, payload):
+        """Spools one JSON-serialisable result."""
+        self.put_many(run_id, stage, [(item_id, payload)])
+
+    def put_many(self, run_id, stage, items):
+        """Spools (item_id, payload) pairs in one transaction."""
+        now = time.time()
+        rows = [(run_id, stage, str(item_id), json.dumps(payload), now) for item_id, payload in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO spool_item (run_id, stage, item_id, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            self.written += len(rows)
+
+    def complete(self, run_id, metric_logs):
+        """Marks the run complete and drops its spooled results."""
+        with self._lock:
+            self._conn.execute("DELETE FROM spool_item WHERE run_id = ?", (run_id,))
+            self._conn.execute(
+                "UPDATE spool_run SET status = ?, finished_at = ?, metric_logs = ? WHERE run_id = ?",
+                (STATUS_COMPLETE, time.time(), metric_logs, run_id)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        return f"{self.reused} results reused, {self.written} results spooled"
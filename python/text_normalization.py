@@ -0,0 +1,185 @@
+"""
+text_normalization.py
+
+Compiled text normalisation used by the collector: URL/punctuation cleaning, expansion of internet
+slang and spam keyword detection.
+
+Every pattern is compiled once at import time. The slang map becomes a single alternation regex whose
+matches are replaced through a dict lookup (one pass instead of one re.sub per entry), clean_text()
+runs two compiled passes instead of four ad-hoc ones, and spam keywords go through KeywordMatcher.
+Outputs are identical to the original per-entry implementations. Batch helpers apply each function
+over a list of texts.
+"""
+
+import re
+from functools import lru_cache
+
+try:
+    import ahocorasick  # Optional: pip install pyahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Define a dictionary for rephrasing internet abbreviations and slang
+REPHRASE_MAPPING = {
+    "u": "you",
+    "ur": "your",
+    "r": "are",
+    "lol": "laughing out loud",
+    "idk": "I do not know",
+    "imho": "in my humble opinion",
+    "btw": "by the way",
+    "tbh": "to be honest",
+    "omg": "oh my god",
+    "thx": "thanks",
+    "pls": "please",
+    "plz": "please",
+    "gr8": "great",
+    "b4": "before",
+    "lmao": "laughing my ass off",
+    "rofl": "rolling on the floor laughing",
+    "brb": "be right back",
+    "afk": "away from keyboard",
+    "smh": "shaking my head",
+    "nvm": "never mind",
+    "ttyl": "talk to you later",
+    "fyi": "for your information",
+    "jk": "just kidding",
+    "wtf": "what the fuck",
+    "bff": "best friends forever",
+    "ftw": "for the win",
+    "tmi": "too much information",
+    "sry": "sorry",
+    "omw": "on my way",
+    "bae": "before anyone else",
+    "goat": "greatest of all time",
+    "lit": "exciting",
+    "salty": "bitter",
+    "savage": "fierce",
+    "sksksk": "laughter or excitement",
+    "stan": "an extremely devoted fan",
+    # Add more mappings as needed
+}
+
+SPAM_INDICATORS = ["free", "trial", "buy", "offer", "discount",
+                   "promo", "sale", "best", "cheap", "guarantee"]
+
+# Keyword sets at least this large use the Aho-Corasick automaton (if pyahocorasick is installed);
+# smaller sets are faster as a handful of C substring searches
+AHO_CORASICK_MIN_KEYWORDS = 32
+
+# Removes URLs and every character that is not an ASCII letter or whitespace. Digits are
+# non-letters, so this also covers the original separate number-stripping pass.
+_URL_AND_NON_LETTERS = re.compile(r'http\S+|[^A-Za-z\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def clean_text(text):
+    """
+    Cleans the input text by removing URLs, punctuation, numbers, special characters, and extra whitespace.
+    Converts text to lowercase.
+    """
+    text = _URL_AND_NON_LETTERS.sub('', text).lower()
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class SlangExpander:
+    """
+    Expands whole-word abbreviations from a mapping in a single regex pass.
+
+    If an expansion itself contains another key as a whole word, the original sequential passes
+    could expand it again; in that case the expander falls back to one compiled pass per entry
+    so results stay identical.
+    """
+
+    def __init__(self, mapping):
+        self.mapping = dict(mapping)
+        self._patterns = [
+            (re.compile(r'\b' + re.escape(abbr) + r'\b'), full) for abbr, full in self.mapping.items()
+        ]
+        # Longest keys first so alternation prefers the full word
+        keys = sorted(self.mapping, key=len, reverse=True)
+        self._combined = re.compile(r'\b(?:' + '|'.join(re.escape(k) for k in keys) + r')\b') if keys else None
+        self._chained = any(
+            pattern.search(full) for pattern, _ in self._patterns for full in self.mapping.values()
+        )
+
+    def expand(self, text):
+        if self._combined is None:
+            return text
+        if self._chained:
+            for pattern, full in self._patterns:
+                text = pattern.sub(full, text)
+            return text
+        return self._combined.sub(lambda match: self.mapping[match.group(0)], text)
+
+
+_default_expander = SlangExpander(REPHRASE_MAPPING)
+
+
+@lru_cache(maxsize=16)
+def _expander_for(items):
+    return SlangExpander(dict(items))
+
+
+def rephrase_text_mapping(text, mapping=REPHRASE_MAPPING):
+    """
+    Rephrases the input text by expanding internet abbreviations and slang based on a predefined mapping.
+
+    Args:
+        text (str): The input text to rephrase.
+        mapping (dict): A dictionary mapping abbreviations/slang to their standard forms.
+
+    Returns:
+        str: The rephrased text.
+    """
+    if mapping is REPHRASE_MAPPING and _default_expander.mapping == REPHRASE_MAPPING:
+        return _default_expander.expand(text)
+    return _expander_for(tuple(mapping.items())).expand(text)
+
+
+class KeywordMatcher:
+    """
+    Tests whether any of a set of keywords occurs as a substring of a text.
+
+    Large keyword sets use an Aho-Corasick automaton (one pass over the text regardless of the
+    number of keywords); small sets use C substring search per keyword, which is faster for them.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = tuple(keywords)
+        self._automaton = None
+        if ahocorasick is not None and len(self.keywords) >= AHO_CORASICK_MIN_KEYWORDS:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+
+    def search(self, text):
+        if self._automaton is not None:
+            return next(self._automaton.iter(text), None) is not None
+        for keyword in self.keywords:
+            if keyword in text:
+                return True
+        return False
+
+
+_spam_matcher = KeywordMatcher(SPAM_INDICATORS)
+
+
+def filter_spam(text):
+    return _spam_matcher.search(text.lower())
+
+
+def clean_texts(texts):
+    """Applies clean_text() to every text in a list."""
+    return [clean_text(text) for text in texts]
+
+
+def rephrase_texts(texts, mapping=REPHRASE_MAPPING):
+    """Applies rephrase_text_mapping() to every text in a list."""
+    return [rephrase_text_mapping(text, mapping) for text in texts]
+
+
+def filter_spam_batch(texts):
+    """Returns filter_spam() for every text in a list."""
+    return [filter_spam(text) for text in texts]
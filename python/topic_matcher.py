@@ -0,0 +1,102 @@
+"""
+topic_matcher.py
+
+Index for matching extracted topics against the existing Topic table.
+
+The collector keeps an extracted topic's existing spelling when it fuzzy-matches a topic already in
+the database: the first existing topic (in table order) whose partial_ratio score is above 80 wins.
+Doing that with a Python loop costs one scorer call per existing topic per extracted topic, which
+grows every day with the Topic table.
+
+TopicMatchIndex lowercases the existing topics once per run and scores queries against them with
+rapidfuzz's vectorised, multi-threaded cdist. Existing topics are scanned in growing blocks so a query
+stops as soon as a block contains a match, and results are memoised so a topic repeated across threads
+is only scored once. Matching semantics are identical to the original loop.
+"""
+
+import numpy as np
+from rapidfuzz import process
+from rapidfuzz.fuzz import partial_ratio
+
+# Score a topic must exceed to be treated as a match for an existing topic
+MATCH_THRESHOLD = 80
+
+# Existing topics scored by the first cdist call; each later block doubles in size up to
+# DEFAULT_BLOCK_SIZE, so common topics that match early never pay for a full scan
+INITIAL_BLOCK_SIZE = 1024
+
+# Maximum number of existing topics scored per cdist call
+DEFAULT_BLOCK_SIZE = 65536
+
+
+class TopicMatchIndex:
+    """
+    Finds the first existing topic whose partial_ratio score against a query is above the threshold.
+
+    Args:
+        existing_topics (list): Existing topics, in the order they should be tried.
+        threshold (float): Score that must be exceeded for a match.
+        block_size (int): Existing topics scored per vectorised call.
+        workers (int): Threads used by rapidfuzz (-1 uses all cores).
+    """
+
+    def __init__(self, existing_topics, threshold=MATCH_THRESHOLD, block_size=DEFAULT_BLOCK_SIZE, workers=-1):
+        self.topics = list(existing_topics)
+        self._lowered = [topic.lower() for topic in self.topics]
+        self.threshold = threshold
+        self.block_size = block_size
+        self.workers = workers
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.topics)
+
+    def match(self, topic):
+        """Returns the matching existing topic, or topic itself if none matches."""
+        return self.match_many([topic])[0]
+
+    def match_many(self, topics):
+        """
+        Matches a list of topics in one pass over the index.
+
+        Returns:
+            list: For each topic, the first matching existing topic or the topic itself.
+        """
+        queries = [topic.lower() for topic in topics]
+        pending = list(dict.fromkeys(q for q in queries if q not in self._memo))
+        if pending:
+            self._memo.update(zip(pending, self._first_matches(pending)))
+
+        results = []
+        for topic, query in zip(topics, queries):
+            match_idx = self._memo[query]
+            results.append(self.topics[match_idx] if match_idx is not None else topic)
+        return results
+
+    def _first_matches(self, queries):
+        """Returns, for each query, the index of its first existing topic scoring above the threshold."""
+        first = [None] * len(queries)
+        remaining = list(range(len(queries)))
+        start = 0
+        block_size = min(INITIAL_BLOCK_SIZE, self.block_size)
+        while remaining and start < len(self._lowered):
+            block = self._lowered[start:start + block_size]
+            scores = process.cdist(
+                [queries[i] for i in remaining],
+                block,
+                scorer=partial_ratio,
+                score_cutoff=self.threshold,
+                dtype=np.float64,
+                workers=self.workers
+            )
+            still_remaining = []
+            for row, query_idx in zip(scores, remaining):
+                hits = np.flatnonzero(row > self.threshold)
+                if hits.size:
+                    first[query_idx] = start + int(hits[0])
+                else:
+                    still_remaining.append(query_idx)
+            remaining = still_remaining
+            start += len(block)
+            block_size = min(block_size * 2, self.block_size)
+        return first